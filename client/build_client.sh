@@ -52,6 +52,19 @@ fi
 
 cd "$DIR"
 
+# The emote sprite sheets are generated instead of being committed to the repository
+# (the script only redraws the sheets that changed, so this is fast after the first build)
+# Pillow is not required to build the client, so the sheets are skipped if it is not installed
+if command -v python3 > /dev/null && python3 -c "import PIL" 2> /dev/null; then
+  echo "Packing the emotes into sprite sheets..."
+  echo
+  python3 "$DIR/../scripts/python/emotes/build_emote_atlas.py"
+  echo
+else
+  echo "Skipping the emote sprite sheets, since Pillow is not installed."
+  echo
+fi
+
 # The client is written in TypeScript and spread out across many files
 # We need to pack it into one JavaScript file before sending it to end-users
 echo "Packing the TypeScript using WebPack..."
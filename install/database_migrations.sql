@@ -0,0 +1,37 @@
+/*
+ * Notes:
+ * - These are the changes to "database_schema.sql" that have to be applied to an existing database
+ *   (installing the schema from scratch drops every table)
+ * - They are run with the "install_database_migrations.sh" script
+ * - Every statement can be run more than once, so the whole file is run every time
+ * - The indexes are created with "CONCURRENTLY" so that the server can keep writing to the table;
+ *   if a build fails, drop the invalid index that it leaves behind before running the file again
+ */
+
+SET client_min_messages TO WARNING;
+
+/* The index of the "user_id" column of "game_participants" (from October 2026) */
+CREATE INDEX CONCURRENTLY IF NOT EXISTS game_participants_index_user_id ON game_participants (user_id);
+
+/*
+ * The "seed_stats" and "user_variant_max_scores" rollup tables and the index that is used to count
+ * the games that are newer than the rollup (from October 2026)
+ * The tables are filled by running "scripts/python/rollup_stats.py --full"
+ */
+CREATE TABLE IF NOT EXISTS seed_stats (
+    seed                TEXT       NOT NULL  PRIMARY KEY,
+    num_games           INTEGER    NOT NULL  DEFAULT 0,
+    best_score          SMALLINT   NOT NULL  DEFAULT 0,
+    num_max_scores      INTEGER    NOT NULL  DEFAULT 0,
+    max_score_user_ids  INTEGER[]  NOT NULL  DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS user_variant_max_scores (
+    user_id         INTEGER   NOT NULL,
+    num_players     SMALLINT  NOT NULL,
+    max_scores      BYTEA     NOT NULL,
+    num_max_scores  INTEGER   NOT NULL  DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, num_players)
+);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS games_index_seed_id ON games (seed, id);
+DROP INDEX CONCURRENTLY IF EXISTS games_index_seed;
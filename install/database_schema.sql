@@ -151,7 +151,11 @@ CREATE TABLE games (
 );
 CREATE INDEX games_index_num_players ON games (num_players);
 CREATE INDEX games_index_variant     ON games (variant);
-CREATE INDEX games_index_seed        ON games (seed);
+/*
+ * The ID is part of the seed index so that the games of a seed that are newer than the
+ * "seed_stats" rollup can be counted from the index alone
+ */
+CREATE INDEX games_index_seed_id     ON games (seed, id);
 
 DROP TABLE IF EXISTS game_participants CASCADE;
 CREATE TABLE game_participants (
@@ -165,6 +169,12 @@ CREATE TABLE game_participants (
     FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
     CONSTRAINT game_participants_unique UNIQUE (game_id, user_id)
 );
+/*
+ * The unique constraint above starts with "game_id", so it cannot be used to find the games of a
+ * user (e.g. when a user is deleted and the cascade has to find their rows)
+ * Added to existing databases by "database_migrations.sql"
+ */
+CREATE INDEX game_participants_index_user_id ON game_participants (user_id);
 
 DROP TABLE IF EXISTS game_participant_notes CASCADE;
 CREATE TABLE game_participant_notes (
@@ -227,6 +237,34 @@ CREATE TABLE variant_stats (
     num_strikeouts  INTEGER   NOT NULL  DEFAULT 0
 );
 
+/*
+ * The "seed_stats" and "user_variant_max_scores" tables are rollups of the "games" and
+ * "game_participants" tables, which are maintained by the "scripts/python/rollup_stats.py" script
+ */
+DROP TABLE IF EXISTS seed_stats CASCADE;
+CREATE TABLE seed_stats (
+    seed                TEXT       NOT NULL  PRIMARY KEY, /* e.g. "p2v0s1" */
+    num_games           INTEGER    NOT NULL  DEFAULT 0,
+    best_score          SMALLINT   NOT NULL  DEFAULT 0,
+    num_max_scores      INTEGER    NOT NULL  DEFAULT 0,
+    /* The IDs of every user that has a max score on this seed, in ascending order */
+    max_score_user_ids  INTEGER[]  NOT NULL  DEFAULT '{}'
+);
+
+DROP TABLE IF EXISTS user_variant_max_scores CASCADE;
+CREATE TABLE user_variant_max_scores (
+    user_id         INTEGER   NOT NULL,
+    num_players     SMALLINT  NOT NULL,
+    /*
+     * A bitset of the variant IDs that this user has a max score on for this player count
+     * (the variant with an ID of "n" is "get_bit(max_scores, n)")
+     */
+    max_scores      BYTEA     NOT NULL,
+    num_max_scores  INTEGER   NOT NULL  DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+    PRIMARY KEY (user_id, num_players)
+);
+
 DROP TABLE IF EXISTS chat_log CASCADE;
 CREATE TABLE chat_log (
     id             SERIAL       PRIMARY KEY,
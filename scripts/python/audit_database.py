@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+# This script checks that the stored games are internally consistent
+# Each of the "games", "game_participants", and "game_actions" tables is streamed exactly once in
+# "game_id" order and summarized into compact arrays; the invariants are then checked in a single
+# merge pass over the three summaries
+# The violations are written as JSON lines, and the games with extra trailing actions are written in
+# the "game_ids.txt" format that is read by the "delete_final_action.py" script
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import array
+import json
+import os
+import time
+import database
+
+# Constants
+# These match the values in "constants.go"
+ACTION_TYPE_END_GAME = 4
+END_CONDITION_TIMEOUT = 3
+END_CONDITION_TERMINATED = 4
+END_CONDITION_IDLE_TIMEOUT = 6
+# These are the only end conditions that the server records an "end game" action for
+# (see the "commandActionEndGame()" function)
+END_GAME_ACTION_END_CONDITIONS = [
+    END_CONDITION_TIMEOUT,
+    END_CONDITION_TERMINATED,
+    END_CONDITION_IDLE_TIMEOUT,
+]
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    variant_ids = load_variant_ids()
+
+    conn = database.connect()
+    cursor = conn.cursor()
+    # All three streams must see the same snapshot of the database
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+    games = read_games(cursor)
+    print("Read " + str(len(games.ids)) + " games.", flush=True)
+    participants = read_participant_counts(cursor)
+    print(
+        "Read participants for " + str(len(participants.game_ids)) + " games.",
+        flush=True,
+    )
+    actions = read_action_summaries(cursor)
+    print("Read actions for " + str(len(actions.game_ids)) + " games.", flush=True)
+    cursor.close()
+    conn.rollback()
+    conn.close()
+
+    violations = check_invariants(games, participants, actions, variant_ids)
+
+    # Write the machine-readable report
+    if args.output == "-":
+        output_file = sys.stdout
+    else:
+        output_file = open(args.output, "w", newline="\n")
+    for violation in violations:
+        output_file.write(json.dumps(violation) + "\n")
+    if output_file is not sys.stdout:
+        output_file.close()
+
+    # Write the input for the "delete_final_action.py" script
+    if args.delete_final_action_file is not None:
+        with open(args.delete_final_action_file, "w", newline="\n") as f:
+            for violation in violations:
+                if violation["violation"] == "extra_actions":
+                    num_extra_actions = violation["actual"] - violation["expected"]
+                    f.write(
+                        str(violation["game_id"]) + "," + str(num_extra_actions) + "\n"
+                    )
+
+    # Print a summary to standard error so that it does not mix with the report
+    violation_counts = {}
+    for violation in violations:
+        name = violation["violation"]
+        violation_counts[name] = violation_counts.get(name, 0) + 1
+    for [name, count] in sorted(violation_counts.items()):
+        print(name + ":", count, file=sys.stderr)
+    print("Total violations:", len(violations), file=sys.stderr)
+    print(
+        "Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds",
+        file=sys.stderr,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Check the games, participants, and actions for consistency."
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="the file to write the violations to as JSON lines (default: standard output)",
+    )
+    parser.add_argument(
+        "--delete-final-action-file",
+        metavar="PATH",
+        help='write the games with extra trailing actions to PATH in the "game_ids.txt" format',
+    )
+    return parser.parse_args()
+
+
+def load_variant_ids():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    variants_path = os.path.join(dir_path, "..", "..", "data", "variants.json")
+    with open(variants_path, "r") as variants_file:
+        variants = json.load(variants_file)
+
+    variant_ids = set()
+    for variant in variants.values():
+        variant_ids.add(variant["id"])
+
+    return variant_ids
+
+
+class GameColumns:
+    def __init__(self):
+        self.ids = array.array("i")
+        self.num_players = array.array("b")
+        self.variants = array.array("h")
+        self.num_turns = array.array("h")
+        self.end_conditions = array.array("b")
+        self.detrimental_characters = array.array("b")
+
+
+def read_games(cursor):
+    games = GameColumns()
+
+    def handle_row(fields):
+        games.ids.append(int(fields[0]))
+        games.num_players.append(int(fields[1]))
+        games.variants.append(int(fields[2]))
+        games.num_turns.append(int(fields[3]))
+        games.end_conditions.append(int(fields[4]))
+        games.detrimental_characters.append(1 if fields[5] == "t" else 0)
+
+    database.copy_query_rows(
+        cursor,
+        """
+        SELECT id, num_players, variant, num_turns, end_condition, detrimental_characters
+        FROM games
+        ORDER BY id
+        """,
+        handle_row,
+    )
+
+    return games
+
+
+class ParticipantCounts:
+    def __init__(self):
+        self.game_ids = array.array("i")
+        self.counts = array.array("h")
+
+
+# Participants are counted by collapsing consecutive rows with the same game ID,
+# which uses the "game_participants_unique (game_id, user_id)" index for the ordering
+def read_participant_counts(cursor):
+    participants = ParticipantCounts()
+
+    def handle_row(fields):
+        game_id = int(fields[0])
+        if len(participants.game_ids) > 0 and participants.game_ids[-1] == game_id:
+            participants.counts[-1] += 1
+        else:
+            participants.game_ids.append(game_id)
+            participants.counts.append(1)
+
+    database.copy_query_rows(
+        cursor, "SELECT game_id FROM game_participants ORDER BY game_id", handle_row
+    )
+
+    return participants
+
+
+class ActionSummaries:
+    def __init__(self):
+        self.game_ids = array.array("i")
+        self.num_actions = array.array("i")
+        # Whether the turns are exactly 0, 1, 2, and so forth
+        self.contiguous = array.array("b")
+        self.last_types = array.array("b")
+        self.last_values = array.array("h")
+        # Whether an "end game" action occurs before the final action
+        self.early_end_game = array.array("b")
+
+
+# Each action is folded into the summary of its game as it arrives,
+# so the full "game_actions" table is never held in memory
+def read_action_summaries(cursor):
+    actions = ActionSummaries()
+
+    def handle_row(fields):
+        game_id = int(fields[0])
+        turn = int(fields[1])
+        action_type = int(fields[2])
+        value = int(fields[3])
+
+        if len(actions.game_ids) == 0 or actions.game_ids[-1] != game_id:
+            actions.game_ids.append(game_id)
+            actions.num_actions.append(1)
+            actions.contiguous.append(1 if turn == 0 else 0)
+            actions.last_types.append(action_type)
+            actions.last_values.append(value)
+            actions.early_end_game.append(0)
+            return
+
+        # The actions are ordered by turn, so the expected turn is the number of previous actions
+        if turn != actions.num_actions[-1]:
+            actions.contiguous[-1] = 0
+        if actions.last_types[-1] == ACTION_TYPE_END_GAME:
+            actions.early_end_game[-1] = 1
+        actions.num_actions[-1] += 1
+        actions.last_types[-1] = action_type
+        actions.last_values[-1] = value
+
+    database.copy_query_rows(
+        cursor,
+        "SELECT game_id, turn, type, value FROM game_actions ORDER BY game_id, turn",
+        handle_row,
+    )
+
+    return actions
+
+
+# Merge the three summaries (which are all sorted by game ID) and check every invariant
+def check_invariants(games, participants, actions, variant_ids):
+    violations = []
+
+    def add(game_id, name, expected=None, actual=None):
+        violation = {"game_id": game_id, "violation": name}
+        if expected is not None:
+            violation["expected"] = expected
+        if actual is not None:
+            violation["actual"] = actual
+        violations.append(violation)
+
+    participant_index = 0
+    action_index = 0
+    for i in range(len(games.ids)):
+        game_id = games.ids[i]
+
+        # Rows in the child tables without a game cannot exist because of the foreign keys,
+        # but skip past them anyway so that the merge stays aligned
+        while (
+            participant_index < len(participants.game_ids)
+            and participants.game_ids[participant_index] < game_id
+        ):
+            participant_index += 1
+        while (
+            action_index < len(actions.game_ids)
+            and actions.game_ids[action_index] < game_id
+        ):
+            action_index += 1
+
+        # Check the participants
+        num_participants = 0
+        if (
+            participant_index < len(participants.game_ids)
+            and participants.game_ids[participant_index] == game_id
+        ):
+            num_participants = participants.counts[participant_index]
+        if num_participants != games.num_players[i]:
+            add(game_id, "num_players_mismatch", games.num_players[i], num_participants)
+
+        # Check the variant
+        if games.variants[i] not in variant_ids:
+            add(game_id, "unknown_variant", actual=games.variants[i])
+
+        # Check the actions
+        if (
+            action_index >= len(actions.game_ids)
+            or actions.game_ids[action_index] != game_id
+        ):
+            add(game_id, "no_actions")
+            continue
+
+        num_actions = actions.num_actions[action_index]
+        if not actions.contiguous[action_index]:
+            add(game_id, "turns_not_contiguous")
+        if actions.early_end_game[action_index]:
+            add(game_id, "end_game_action_not_last")
+
+        is_end_game_action = actions.last_types[action_index] == ACTION_TYPE_END_GAME
+        end_condition = games.end_conditions[i]
+        if end_condition in END_GAME_ACTION_END_CONDITIONS:
+            if not is_end_game_action:
+                add(game_id, "missing_end_game_action", end_condition)
+            elif actions.last_values[action_index] != end_condition:
+                add(
+                    game_id,
+                    "end_condition_mismatch",
+                    end_condition,
+                    actions.last_values[action_index],
+                )
+
+        # Characters that take two turns in a row do not increment the turn counter,
+        # so the number of actions only matches the number of turns without characters
+        if not games.detrimental_characters[i] and num_actions != games.num_turns[i]:
+            if num_actions > games.num_turns[i]:
+                add(game_id, "extra_actions", games.num_turns[i], num_actions)
+            else:
+                add(game_id, "missing_actions", games.num_turns[i], num_actions)
+
+    return violations
+
+
+if __name__ == "__main__":
+    main()
@@ -8,28 +8,10 @@ if sys.version_info < (3, 0):
     sys.exit(1)
 
 # Imports
-import os
-import dotenv
-import psycopg2
-
-# Import environment variables
-dotenv.load_dotenv(dotenv.find_dotenv())
-
-# Variables
-user = os.getenv("DB_USER")
-password = os.getenv("DB_PASS")
-host = os.getenv("DB_HOST")
-if host == "":
-    host = "localhost"
-port = os.getenv("DB_PORT")
-if port == "":
-    port = "5432"
-database = os.getenv("DB_NAME")
+import database
 
 # Connect to the PostgreSQL database
-conn = psycopg2.connect(
-    host=host, port=port, user=user, password=password, database=database,
-)
+conn = database.connect()
 
 # Prompt for the username
 username = input("Enter the username: ")
@@ -0,0 +1,664 @@
+#!/usr/bin/env python3
+
+# This script builds (and this module reads) an on-disk inverted index of the "chat_log" and
+# "chat_log_pm" tables, so that moderators can search the chat with the "search_chat.py" script
+# instead of running "ILIKE" queries (which are full sequential scans) on the production database
+# Every message is split into lowercase words, and every word maps to the sorted list of the IDs of
+# the messages that contain it (the "postings")
+# The sender of every message (and the room, or the recipient of a private message) is indexed as
+# a "facet" in the same way, so that a search can be filtered by user without a scan
+# (the messages from Discord are sent by user 0, so their sender is indexed by the Discord name)
+#
+# The index is made up of append-only segments, with one directory for each table; each run adds
+# segments with the messages that have an ID higher than the last indexed one
+# The messages that were sent in the last "database.SETTLE_INTERVAL" are left for the next run,
+# since a message with a lower ID could still be committed after them
+# Messages that are deleted afterwards (e.g. by the "prune_chat_log.py" script) are kept in the
+# index
+#
+# Segment file layout (all integers are little-endian, and every section starts on 8 bytes):
+# - An 80 byte header: the magic bytes, the format version, the range of message IDs, the number
+#   of messages and terms, and the sizes of the 4 blobs
+# - The ID, the time sent (in microseconds since the epoch), the sender, and the "target" (the table
+#   ID, -1 for the lobby, or the recipient ID for a private message) of every message
+# - The text of every message: one 8 byte offset per message plus a final end offset, followed by
+#   the UTF-8 blob
+# - The Discord name of every message (empty for the other messages), in the same way as the text
+# - The terms, sorted by their UTF-8 bytes: the offsets, followed by the UTF-8 blob
+# - The postings of every term: the offsets, followed by the blob; the message IDs are delta-encoded
+#   (the first one is relative to the first ID of the segment) and stored as LEB128 varints
+#
+# The reader memory-maps the segments, so a search only decodes the postings of the words in it:
+#   index = ChatIndex("/path/to/index", "chat_log")
+#   for message in index.search(tokenize("good game"), [user_facet(123)]):
+#       message["id"], message["user_id"], message["discord_name"], message["text"]
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import array
+import datetime
+import json
+import mmap
+import os
+import re
+import struct
+import time
+import numpy
+import database
+
+# Constants
+MAGIC = b"HLCHATIX"  # cspell:disable-line
+FORMAT_VERSION = 2
+# Magic, version, padding, first message ID, last message ID, number of messages, number of terms,
+# size of the text blob, size of the Discord name blob, size of the term blob, and size of the
+# postings blob
+HEADER_FORMAT = "<8sI4xqqQQQQQQ"  # cspell:disable-line
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+OFFSET_DTYPE = numpy.dtype("<u8")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".bin"
+USERS_FILE_NAME = "users.json"
+TABLES = ["chat_log", "chat_log_pm"]
+# The "target" of a message in the lobby (table rooms use the table ID)
+LOBBY_TARGET = -1
+TOKEN_REGEX = re.compile(r"\w+")
+# Facets cannot collide with words, since the tokenizer never produces a control character
+USER_FACET_PREFIX = "\x01u"
+DISCORD_USER_FACET_PREFIX = "\x01d"
+TARGET_FACET_PREFIX = "\x01t"
+# The number of messages in a segment (a segment is built in memory before it is written)
+DEFAULT_SEGMENT_SIZE = 1000000
+DEFAULT_CHUNK_SIZE = 10000
+QUERIES = {
+    "chat_log": """
+        SELECT
+            id,
+            (EXTRACT(EPOCH FROM datetime_sent) * 1000000)::BIGINT,
+            user_id,
+            COALESCE(discord_name, ''),
+            CASE
+                WHEN room = 'lobby' THEN -1
+                WHEN room ~ '^table[0-9]+$' THEN SUBSTRING(room FROM 6)::INTEGER
+                ELSE -2
+            END,
+            message
+        FROM chat_log
+        WHERE id > %s AND id <= %s
+        ORDER BY id
+    """,
+    "chat_log_pm": """
+        SELECT
+            id,
+            (EXTRACT(EPOCH FROM datetime_sent) * 1000000)::BIGINT,
+            user_id,
+            '',
+            recipient_id,
+            message
+        FROM chat_log_pm
+        WHERE id > %s AND id <= %s
+        ORDER BY id
+    """,
+}
+
+
+# Split a message into the lowercase words that are indexed
+def tokenize(message):
+    return TOKEN_REGEX.findall(message.lower())
+
+
+def user_facet(user_id):
+    return USER_FACET_PREFIX + str(user_id)
+
+
+# Discord names are not unique like usernames, so they are matched case-insensitively
+def discord_user_facet(discord_name):
+    return DISCORD_USER_FACET_PREFIX + discord_name.lower()
+
+
+def target_facet(target):
+    return TARGET_FACET_PREFIX + str(target)
+
+
+# Returns the "target" of a room name (e.g. "table123" is 123), or None if it is not a valid room
+def get_room_target(room):
+    if room == "lobby":
+        return LOBBY_TARGET
+    match = re.fullmatch(r"table([0-9]+)", room)
+    if not match:
+        return None
+    return int(match.group(1))
+
+
+def get_room_name(target):
+    if target == LOBBY_TARGET:
+        return "lobby"
+    if target < 0:
+        return "unknown"
+    return "table" + str(target)
+
+
+# Encode unsigned integers as LEB128 varints (7 bits per byte, with the high bit set on every byte
+# but the last one)
+# Returns the bytes and the number of bytes of every value
+def encode_varints(values):
+    values = values.astype(numpy.uint64)
+    lengths = numpy.ones(len(values), dtype=numpy.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= (numpy.uint64(1) << numpy.uint64(shift))
+    ends = numpy.cumsum(lengths)
+    starts = ends - lengths
+    encoded = numpy.zeros(int(ends[-1]) if len(ends) > 0 else 0, dtype=numpy.uint8)
+    for i in range(int(lengths.max()) if len(lengths) > 0 else 0):
+        mask = lengths > i
+        chunk = (values[mask] >> numpy.uint64(7 * i)) & numpy.uint64(0x7F)
+        continuation = numpy.where(lengths[mask] > i + 1, 0x80, 0).astype(numpy.uint64)
+        encoded[starts[mask] + i] = (chunk | continuation).astype(numpy.uint8)
+
+    return encoded, lengths
+
+
+# The opposite of "encode_varints()"
+def decode_varints(encoded):
+    if len(encoded) == 0:
+        return numpy.zeros(0, dtype=numpy.uint64)
+
+    is_end = encoded < 0x80
+    ends = numpy.flatnonzero(is_end)
+    starts = numpy.concatenate(([0], ends[:-1] + 1))
+    # The index of the value that every byte belongs to
+    value_indexes = numpy.cumsum(is_end) - is_end
+    shifts = (numpy.arange(len(encoded)) - starts[value_indexes]) * 7
+    chunks = (encoded & 0x7F).astype(numpy.uint64) << shifts.astype(numpy.uint64)
+    # The chunks of a value never overlap, so adding them is the same as combining their bits
+    return numpy.add.reduceat(chunks, starts)
+
+
+def align(size):
+    return (size + 7) // 8 * 8
+
+
+class ChatIndexSegment:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        [
+            magic,
+            version,
+            first_id,
+            last_id,
+            num_messages,
+            num_terms,
+            text_size,
+            discord_name_size,
+            term_size,
+            postings_size,
+        ] = struct.unpack_from(HEADER_FORMAT, self.mmap)
+        if magic != MAGIC:
+            raise ValueError('"' + path + '" is not a valid chat index segment.')
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                '"'
+                + path
+                + '" is from an older version of the chat index. '
+                + "(Delete the index directory and build it again.)"
+            )
+
+        self.first_id = first_id
+        self.last_id = last_id
+        offset = HEADER_SIZE
+        [self.ids, offset] = self.read_array("<i8", num_messages, offset)
+        [self.datetimes, offset] = self.read_array("<i8", num_messages, offset)
+        [self.user_ids, offset] = self.read_array("<i4", num_messages, offset)
+        [self.targets, offset] = self.read_array("<i4", num_messages, offset)
+        [self.text_offsets, offset] = self.read_array(
+            OFFSET_DTYPE, num_messages + 1, offset
+        )
+        self.text_start = offset
+        offset = align(offset + text_size)
+        [self.discord_name_offsets, offset] = self.read_array(
+            OFFSET_DTYPE, num_messages + 1, offset
+        )
+        self.discord_name_start = offset
+        offset = align(offset + discord_name_size)
+        [self.term_offsets, offset] = self.read_array(
+            OFFSET_DTYPE, num_terms + 1, offset
+        )
+        self.term_start = offset
+        offset = align(offset + term_size)
+        [self.postings_offsets, offset] = self.read_array(
+            OFFSET_DTYPE, num_terms + 1, offset
+        )
+        self.postings = numpy.frombuffer(
+            self.mmap, dtype=numpy.uint8, count=postings_size, offset=offset
+        )
+        self.num_terms = num_terms
+
+    def read_array(self, dtype, count, offset):
+        values = numpy.frombuffer(self.mmap, dtype=dtype, count=count, offset=offset)
+        return values, align(offset + values.nbytes)
+
+    def get_term(self, i):
+        start = self.term_start + int(self.term_offsets[i])
+        end = self.term_start + int(self.term_offsets[i + 1])
+        return self.mmap[start:end]
+
+    # Binary search the sorted terms; returns the index of the term, or None if it is not in the
+    # segment
+    def find_term(self, term):
+        term = term.encode("utf-8")
+        low = 0
+        high = self.num_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.num_terms and self.get_term(low) == term:
+            return low
+        return None
+
+    # Returns the sorted IDs of the messages that have a term (a word or a facet)
+    def get_postings(self, term):
+        i = self.find_term(term)
+        if i is None:
+            return numpy.zeros(0, dtype=numpy.int64)
+
+        start = int(self.postings_offsets[i])
+        end = int(self.postings_offsets[i + 1])
+        deltas = decode_varints(self.postings[start:end])
+        return numpy.cumsum(deltas.astype(numpy.int64)) + self.first_id
+
+    def get_message(self, message_id):
+        i = int(numpy.searchsorted(self.ids, message_id))
+        if i >= len(self.ids) or self.ids[i] != message_id:
+            return None
+
+        start = self.text_start + int(self.text_offsets[i])
+        end = self.text_start + int(self.text_offsets[i + 1])
+        discord_name_start = self.discord_name_start + int(self.discord_name_offsets[i])
+        discord_name_end = self.discord_name_start + int(
+            self.discord_name_offsets[i + 1]
+        )
+        return {
+            "id": message_id,
+            "datetime_sent": datetime.datetime.fromtimestamp(
+                int(self.datetimes[i]) / 1000000, datetime.timezone.utc
+            ),
+            "user_id": int(self.user_ids[i]),
+            "discord_name": self.mmap[discord_name_start:discord_name_end].decode(
+                "utf-8"
+            ),
+            "target": int(self.targets[i]),
+            "text": self.mmap[start:end].decode("utf-8"),
+        }
+
+    def close(self):
+        self.ids = None
+        self.datetimes = None
+        self.user_ids = None
+        self.targets = None
+        self.text_offsets = None
+        self.discord_name_offsets = None
+        self.term_offsets = None
+        self.postings_offsets = None
+        self.postings = None
+        self.file.close()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # A caller is still holding a view of the segment,
+            # so the memory map will be released once that view is garbage collected
+            pass
+
+
+class ChatIndex:
+    def __init__(self, index_dir, table):
+        self.segments = []
+        table_dir = os.path.join(index_dir, table)
+        if os.path.exists(table_dir):
+            for file_name in sorted(os.listdir(table_dir)):
+                if file_name.startswith(SEGMENT_PREFIX) and file_name.endswith(
+                    SEGMENT_SUFFIX
+                ):
+                    self.segments.append(
+                        ChatIndexSegment(os.path.join(table_dir, file_name))
+                    )
+        self.segments.sort(key=lambda segment: segment.first_id)
+
+    # The last message ID that was indexed
+    @property
+    def last_id(self):
+        if len(self.segments) == 0:
+            return 0
+        return self.segments[-1].last_id
+
+    # Yield the messages that contain the words as a phrase (in the same order and next to each
+    # other) and that have every facet, from the newest to the oldest
+    # With no words and no facets, every message matches
+    def search(self, words, facets=()):
+        terms = sorted(set(words)) + list(facets)
+        for segment in reversed(self.segments):
+            if len(terms) == 0:
+                candidates = segment.ids
+            else:
+                # Start from the shortest postings, so that every intersection is as small as
+                # possible
+                postings = sorted(
+                    [segment.get_postings(term) for term in terms], key=len
+                )
+                candidates = postings[0]
+                for other_postings in postings[1:]:
+                    if len(candidates) == 0:
+                        break
+                    candidates = numpy.intersect1d(
+                        candidates, other_postings, assume_unique=True
+                    )
+
+            for message_id in candidates[::-1].tolist():
+                message = segment.get_message(message_id)
+                # The postings only say that every word is in the message,
+                # so check the order of the words against the text
+                if len(words) > 1 and not has_phrase(tokenize(message["text"]), words):
+                    continue
+                yield message
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+def has_phrase(tokens, words):
+    for i in range(len(tokens) - len(words) + 1):
+        if tokens[i : i + len(words)] == words:
+            return True
+    return False
+
+
+# Accumulates the messages of a segment in memory until it is written
+class SegmentBuilder:
+    def __init__(self):
+        self.ids = array.array("q")
+        self.datetimes = array.array("q")
+        self.user_ids = array.array("i")
+        self.targets = array.array("i")
+        self.text_offsets = array.array("Q", [0])
+        self.text = bytearray()
+        self.discord_name_offsets = array.array("Q", [0])
+        self.discord_names = bytearray()
+        # Every term gets a number in the order that it was first seen
+        self.term_numbers = {}
+        # One entry for every (term, message) pair
+        self.pair_term_numbers = array.array("i")
+        self.pair_ids = array.array("q")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, message_id, datetime_sent, user_id, discord_name, target, message):
+        self.ids.append(message_id)
+        self.datetimes.append(datetime_sent)
+        self.user_ids.append(user_id)
+        self.targets.append(target)
+        self.text += message.encode("utf-8")
+        self.text_offsets.append(len(self.text))
+        self.discord_names += discord_name.encode("utf-8")
+        self.discord_name_offsets.append(len(self.discord_names))
+
+        terms = set(tokenize(message))
+        terms.add(user_facet(user_id))
+        if discord_name != "":
+            terms.add(discord_user_facet(discord_name))
+        terms.add(target_facet(target))
+        for term in terms:
+            term_number = self.term_numbers.get(term)
+            if term_number is None:
+                term_number = len(self.term_numbers)
+                self.term_numbers[term] = term_number
+            self.pair_term_numbers.append(term_number)
+            self.pair_ids.append(message_id)
+
+    # The segment is written to a temporary file first, so a partial segment is never visible
+    def write(self, path, first_id, last_id):
+        encoded_terms = [term.encode("utf-8") for term in self.term_numbers]
+        term_order = sorted(range(len(encoded_terms)), key=encoded_terms.__getitem__)
+        term_ranks = numpy.zeros(len(term_order), dtype=numpy.int32)
+        term_ranks[term_order] = numpy.arange(len(term_order), dtype=numpy.int32)
+        sorted_terms = [encoded_terms[i] for i in term_order]
+
+        # Sort the pairs by term; the messages were added in ID order,
+        # so a stable sort keeps the postings of every term sorted
+        pair_terms = term_ranks[numpy.frombuffer(self.pair_term_numbers, numpy.int32)]
+        order = numpy.argsort(pair_terms, kind="stable")
+        pair_terms = pair_terms[order]
+        pair_ids = numpy.frombuffer(self.pair_ids, numpy.int64)[order]
+
+        term_starts = numpy.flatnonzero(
+            numpy.concatenate(([True], pair_terms[1:] != pair_terms[:-1]))
+        )
+        deltas = numpy.diff(pair_ids, prepend=first_id)
+        deltas[term_starts] = pair_ids[term_starts] - first_id
+        [postings, lengths] = encode_varints(deltas)
+        postings_offsets = numpy.zeros(len(sorted_terms) + 1, dtype=OFFSET_DTYPE)
+        if len(sorted_terms) > 0:
+            numpy.cumsum(
+                numpy.add.reduceat(lengths, term_starts), out=postings_offsets[1:]
+            )
+
+        term_offsets = numpy.zeros(len(sorted_terms) + 1, dtype=OFFSET_DTYPE)
+        numpy.cumsum([len(term) for term in sorted_terms], out=term_offsets[1:])
+        term_blob = b"".join(sorted_terms)
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as segment_file:
+            segment_file.write(
+                struct.pack(
+                    HEADER_FORMAT,
+                    MAGIC,
+                    FORMAT_VERSION,
+                    first_id,
+                    last_id,
+                    len(self.ids),
+                    len(sorted_terms),
+                    len(self.text),
+                    len(self.discord_names),
+                    len(term_blob),
+                    len(postings),
+                )
+            )
+            for section in [
+                numpy.frombuffer(self.ids, numpy.int64).astype("<i8").tobytes(),
+                numpy.frombuffer(self.datetimes, numpy.int64).astype("<i8").tobytes(),
+                numpy.frombuffer(self.user_ids, numpy.int32).astype("<i4").tobytes(),
+                numpy.frombuffer(self.targets, numpy.int32).astype("<i4").tobytes(),
+                numpy.frombuffer(self.text_offsets, numpy.uint64)
+                .astype(OFFSET_DTYPE)
+                .tobytes(),
+                bytes(self.text),
+                numpy.frombuffer(self.discord_name_offsets, numpy.uint64)
+                .astype(OFFSET_DTYPE)
+                .tobytes(),
+                bytes(self.discord_names),
+                term_offsets.tobytes(),
+                term_blob,
+                postings_offsets.tobytes(),
+                postings.tobytes(),
+            ]:
+                segment_file.write(section)
+                segment_file.write(b"\0" * (align(len(section)) - len(section)))
+
+        os.replace(temp_path, path)
+        return os.path.getsize(path)
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    conn = database.connect()
+    # The messages that are still being written could be skipped by the next run if a message with
+    # a higher ID was indexed first
+    settled_ids = {}
+    for table in TABLES:
+        settled_ids[table] = database.get_settled_max_id(conn, table, "datetime_sent")
+    cursor = conn.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+
+    write_users(cursor, args.index_dir)
+    totals = {}
+    for table in TABLES:
+        totals[table] = index_table(
+            conn,
+            args.index_dir,
+            table,
+            settled_ids[table],
+            args.segment_size,
+            args.chunk_size,
+        )
+
+    cursor.close()
+    conn.rollback()
+    conn.close()
+
+    for table in TABLES:
+        print("Total " + table + " messages indexed:", totals[table])
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Add the new chat messages to the chat search index."
+    )
+    parser.add_argument("index_dir", help="the directory of the chat index")
+    parser.add_argument(
+        "--segment-size",
+        type=int,
+        default=DEFAULT_SEGMENT_SIZE,
+        help="the maximum number of messages in a segment (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="the number of messages to read at a time (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.segment_size <= 0:
+        print("The segment size must be a positive number.")
+        sys.exit(1)
+    if args.chunk_size <= 0:
+        print("The chunk size must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+# The search script looks up usernames in a snapshot of the "users" table, so that it never has to
+# connect to the database
+def write_users(cursor, index_dir):
+    cursor.execute("SELECT id, username FROM users")
+    users = {}
+    for [user_id, username] in cursor.fetchall():
+        users[str(user_id)] = username
+
+    if not os.path.exists(index_dir):
+        os.makedirs(index_dir)
+    path = os.path.join(index_dir, USERS_FILE_NAME)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="\n") as users_file:
+        json.dump(users, users_file, sort_keys=True)
+        users_file.write("\n")
+    os.replace(temp_path, path)
+
+
+def read_users(index_dir):
+    path = os.path.join(index_dir, USERS_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as users_file:
+        users = json.load(users_file)
+    return {int(user_id): username for [user_id, username] in users.items()}
+
+
+# Stream the messages after the last indexed one (up to "settled_id") into new segments
+# Returns the number of messages that were indexed
+def index_table(conn, index_dir, table, settled_id, segment_size, chunk_size):
+    table_start_time = time.monotonic()
+    table_dir = os.path.join(index_dir, table)
+    if not os.path.exists(table_dir):
+        os.makedirs(table_dir)
+    index = ChatIndex(index_dir, table)
+    last_id = index.last_id
+    index.close()
+    print(
+        "Indexing the "
+        + table
+        + " messages after ID "
+        + str(last_id)
+        + " (up to ID "
+        + str(settled_id)
+        + ").",
+        flush=True,
+    )
+
+    num_messages = 0
+    builder = SegmentBuilder()
+    first_id = last_id + 1
+    for row in database.stream(conn, QUERIES[table], (last_id, settled_id), chunk_size):
+        builder.add(*row)
+        last_id = row[0]
+        if len(builder) >= segment_size:
+            num_messages += write_segment(table_dir, builder, first_id, last_id)
+            builder = SegmentBuilder()
+            first_id = last_id + 1
+    if len(builder) > 0:
+        num_messages += write_segment(table_dir, builder, first_id, last_id)
+
+    elapsed = time.monotonic() - table_start_time
+    messages_per_second = num_messages / elapsed if elapsed > 0 else 0
+    print(
+        "Indexed "
+        + str(num_messages)
+        + " "
+        + table
+        + " messages ("
+        + "{:.0f}".format(messages_per_second)
+        + " messages/sec)",
+        flush=True,
+    )
+    return num_messages
+
+
+def write_segment(table_dir, builder, first_id, last_id):
+    path = os.path.join(
+        table_dir,
+        SEGMENT_PREFIX
+        + str(first_id).zfill(10)
+        + "-"
+        + str(last_id).zfill(10)
+        + SEGMENT_SUFFIX,
+    )
+    size = builder.write(path, first_id, last_id)
+    print(
+        "Wrote "
+        + str(len(builder))
+        + " messages ("
+        + str(size)
+        + " bytes) to: "
+        + path,
+        flush=True,
+    )
+    return len(builder)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 # This script generates a new "variants.json" file
 # Note that we must preserve the variant IDs between versions of "variants.json" because it is used
 # in the seed string (e.g. "p2v5s1")
+# The variants are described by the families in "VARIANT_FAMILIES" below; to add a new kind of
+# variant, add a new family to the end of the list (the position of a family determines the order
+# of its variants in the output files)
 
 import sys
 
@@ -9,23 +12,347 @@ if sys.version_info < (3, 0):
     sys.exit(1)
 
 # Imports
+import argparse
+import hashlib
+import heapq
 import json
 import os
-import sys
+import variant_efficiency
+import variant_tables
+import variants_binary
 
 # Constants
 SUIT_REVERSED_SUFFIX = " Reversed"
+SPECIAL_PROPERTIES = ["allClueColors", "allClueRanks", "noClueColors", "noClueRanks"]
+# It would be too difficult to have a 4 suit variant or a 3 suits variant with a one-of-each suit
+ONE_OF_EACH_MIN_SUITS = 5
+# The generated variants of each family are cached here between runs
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), ".create_variants_json_cache.json"
+)
+# New variants that require more efficiency than this (in any player count) are not created
+# (the most difficult existing variant is "Clue Starved (5 Suits)" at 1.79 in 5-player)
+DEFAULT_MAX_EFFICIENCY = 1.8
+
+# The basic suits for each number of suits
+# Green is inserted before Blue and Yellow is inserted before Green to keep the colors in "rainbow"
+# order
+VARIANT_SUITS = {
+    1: ["Red"],
+    2: ["Red", "Blue"],
+    3: ["Red", "Green", "Blue"],
+    4: ["Red", "Yellow", "Green", "Blue"],
+    5: ["Red", "Yellow", "Green", "Blue", "Purple"],
+    6: ["Red", "Yellow", "Green", "Blue", "Purple", "Teal"],
+}
+# The "Teal" versions of the "Reversed" variants (without any special suits)
+REVERSED_SUITS = {
+    suit_num: suits[:-1] + [suits[-1] + SUIT_REVERSED_SUFFIX]
+    for [suit_num, suits] in VARIANT_SUITS.items()
+}
+AMBIGUOUS_SUITS = {
+    2: ["Tomato", "Mahogany"],
+    4: ["Tomato", "Mahogany", "Sky", "Navy"],
+    6: ["Tomato", "Mahogany", "Lime", "Forest", "Sky", "Navy"],
+}
+EXTREMELY_AMBIGUOUS_SUITS = {
+    3: ["Sky VA", "Berry VA", "Navy VA"],
+    4: ["Ice EA", "Sapphire EA", "Sky EA", "Berry EA"],
+    5: ["Ice EA", "Sapphire EA", "Sky EA", "Berry EA", "Navy EA"],
+    6: ["Ice EA", "Sapphire EA", "Sky EA", "Berry EA", "Navy EA", "Ocean EA"],
+}
+DUAL_COLOR_SUITS = {
+    3: ["Orange D2", "Purple D", "Green D"],
+    5: ["Orange D2", "Lime D", "Teal D", "Indigo D", "Cardinal D"],
+    6: ["Orange D", "Purple D", "Mahogany D", "Green D", "Tan D", "Navy D"],
+}
+
+# Every family has a "name" and a "type":
+# - "fixed" families list their variants explicitly in "variants"
+# - "suits" families have:
+#   - "base_name" and "base_suit_nums" for the variants without a special suit
+#     (e.g. "Alternating Clues (6 Suits)"), which use the suits in "base_suits"
+#   - "special_name" and "special_suit_nums" for the variants with each special suit
+#     (e.g. "Alternating Clues & Rainbow (6 Suits)"), which use the base suits with one less suit
+#     followed by the special suit
+#   - "one_of_each", which is false if the special suit cannot be a one-of-each suit at all
+#   - "rank_attributes", which is false if the special suit cannot have a rank attribute
+#   - "special_suit_suffix", which is appended to the name of the special suit
+#   - "properties", which are added to every variant of the family
+# - "special_suit_combinations" and "special_ranks" families have their own rules
+#   (see the functions below)
+VARIANT_FAMILIES = [
+    {
+        "name": "Basic",
+        "type": "fixed",
+        "variants": [
+            {"name": "No Variant", "suits": VARIANT_SUITS[5]},
+            {"name": "6 Suits", "suits": VARIANT_SUITS[6]},
+            {"name": "4 Suits", "suits": VARIANT_SUITS[4]},
+            {"name": "3 Suits", "suits": VARIANT_SUITS[3]},
+        ],
+    },
+    {
+        "name": "Special Suits",
+        "type": "suits",
+        "special_name": "{suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4, 3],
+    },
+    {
+        "name": "Special Suit Combinations",
+        "type": "special_suit_combinations",
+    },
+    {
+        "name": "Special Ones",
+        "type": "special_ranks",
+        "special_rank": 1,
+        "word": "Ones",
+    },
+    {
+        "name": "Special Fives",
+        "type": "special_ranks",
+        "special_rank": 5,
+        "word": "Fives",
+    },
+    {
+        "name": "Ambiguous",
+        "type": "suits",
+        "base_name": "Ambiguous ({num} Suits)",
+        "base_suits": AMBIGUOUS_SUITS,
+        "base_suit_nums": [6, 4],
+        "special_name": "Ambiguous & {suit} ({num} Suits)",
+        "special_suit_nums": [5, 3],
+        "properties": {"showSuitNames": True},
+    },
+    {
+        "name": "Very Ambiguous",
+        "type": "fixed",
+        "variants": [
+            {
+                "name": "Very Ambiguous (6 Suits)",
+                "suits": [
+                    "Tomato VA",
+                    "Ruby VA",
+                    "Mahogany VA",
+                    "Sky VA",
+                    "Berry VA",
+                    "Navy VA",
+                ],
+                "properties": {"showSuitNames": True},
+            },
+        ],
+    },
+    {
+        "name": "Extremely Ambiguous",
+        "type": "suits",
+        "base_name": "Extremely Ambiguous ({num} Suits)",
+        "base_suits": EXTREMELY_AMBIGUOUS_SUITS,
+        "base_suit_nums": [6, 5, 4, 3],
+        "special_name": "Extremely Ambiguous & {suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4],
+        "properties": {"showSuitNames": True},
+    },
+    {
+        "name": "Dual-Color",
+        "type": "suits",
+        "base_name": "Dual-Color ({num} Suits)",
+        "base_suits": DUAL_COLOR_SUITS,
+        "base_suit_nums": [6, 5, 3],
+        "special_name": "Dual-Color & {suit} ({num} Suits)",
+        "special_suit_nums": [6, 4],
+        "properties": {"showSuitNames": True},
+    },
+    {
+        "name": "Mixes",
+        "type": "fixed",
+        "variants": [
+            {
+                "name": "Special Mix (5 Suits)",
+                "suits": ["Black", "Rainbow", "Pink", "White", "Brown"],
+            },
+            {
+                "name": "Special Mix (6 Suits)",
+                "suits": ["Black", "Rainbow", "Pink", "White", "Brown", "Null"],
+            },
+            {
+                "name": "Ambiguous Mix",
+                "suits": ["Tomato", "Mahogany", "Sky", "Navy", "Black", "White"],
+                "properties": {"showSuitNames": True},
+            },
+            {
+                "name": "Dual-Color Mix",
+                "suits": [
+                    "Orange D2",
+                    "Purple D",
+                    "Green D",
+                    "Black",
+                    "Rainbow",
+                    "White",
+                ],
+            },
+            {
+                "name": "Ambiguous & Dual-Color",
+                "suits": [
+                    "Tangelo AD",
+                    "Peach AD",
+                    "Orchid AD",
+                    "Violet AD",
+                    "Lime AD",
+                    "Forest AD",
+                ],
+                "properties": {"showSuitNames": True},
+            },
+        ],
+    },
+    {
+        "name": "Color Blind",
+        "type": "suits",
+        "base_name": "Color Blind ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "properties": {"colorCluesTouchNothing": True},
+    },
+    {
+        "name": "Number Blind",
+        "type": "suits",
+        "base_name": "Number Blind ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "properties": {"rankCluesTouchNothing": True},
+    },
+    {
+        "name": "Totally Blind",
+        "type": "suits",
+        "base_name": "Totally Blind ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "properties": {"colorCluesTouchNothing": True, "rankCluesTouchNothing": True},
+    },
+    {
+        "name": "Color Mute",
+        "type": "suits",
+        "base_name": "Color Mute ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "properties": {"clueColors": []},
+    },
+    {
+        "name": "Number Mute",
+        "type": "suits",
+        "base_name": "Number Mute ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "properties": {"clueRanks": []},
+    },
+    {
+        "name": "Alternating Clues",
+        "type": "suits",
+        "base_name": "Alternating Clues ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "special_name": "Alternating Clues & {suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4, 3],
+    },
+    {
+        # The 4 suit and 3 suit variants and the variants with a one-of-each suit are rejected by the
+        # maximum efficiency (e.g. "Clue Starved (4 Suits)" requires 1.82 efficiency in 5-player)
+        "name": "Clue Starved",
+        "type": "suits",
+        "base_name": "Clue Starved ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "special_name": "Clue Starved & {suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4, 3],
+    },
+    {
+        "name": "Cow & Pig",
+        "type": "suits",
+        "base_name": "Cow & Pig ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+    },
+    {
+        "name": "Duck",
+        "type": "suits",
+        "base_name": "Duck ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+    },
+    {
+        # The 3 suit variants are rejected by the maximum efficiency (e.g. "Throw It in a Hole
+        # (3 Suits)" requires 1.88 efficiency in 5-player)
+        # The one-of-each suits are excluded by hand, since the efficiency formula does not account
+        # for the plays being hidden (e.g. "Throw It in a Hole & Black (6 Suits)" would only require
+        # 1.67 efficiency in 5-player)
+        "name": "Throw It in a Hole",
+        "type": "suits",
+        "base_name": "Throw It in a Hole ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "special_name": "Throw It in a Hole & {suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4, 3],
+        "one_of_each": False,
+    },
+    {
+        "name": "Reversed",
+        "type": "suits",
+        "base_name": "Reversed ({num} Suits)",
+        "base_suits": REVERSED_SUITS,
+        "base_suit_nums": [6, 5, 4, 3],
+    },
+    {
+        # Reversed suits with rank attributes would be identical to the normal versions
+        "name": "Reversed Special Suits",
+        "type": "suits",
+        "special_name": "{suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4, 3],
+        "special_suit_suffix": SUIT_REVERSED_SUFFIX,
+        "rank_attributes": False,
+    },
+    {
+        # The 4 suit and 3 suit variants are rejected by the maximum efficiency (e.g. "Up or Down
+        # (4 Suits)" requires 1.82 efficiency in 5-player)
+        # The one-of-each suits are excluded by hand, since the efficiency formula does not account
+        # for the direction of the suits being unknown (e.g. "Up or Down & Black (6 Suits)" would
+        # only require 1.67 efficiency in 5-player)
+        "name": "Up or Down",
+        "type": "suits",
+        "base_name": "Up or Down ({num} Suits)",
+        "base_suit_nums": [6, 5, 4, 3],
+        "special_name": "Up or Down & {suit} ({num} Suits)",
+        "special_suit_nums": [6, 5, 4, 3],
+        "one_of_each": False,
+        "properties": {"showSuitNames": True},
+    },
+]
+
+
+class VariantIDAllocator:
+    # Existing variants keep their IDs and new variants get the lowest unused IDs
+    # The unused IDs below the highest existing ID are precomputed into a heap,
+    # so each new ID is found in logarithmic time instead of by scanning every old variant
+    def __init__(self, old_variants):
+        self.old_ids = {}
+        for [variant_name, variant] in old_variants.items():
+            self.old_ids[variant_name] = variant["id"]
+
+        used_ids = set(self.old_ids.values())
+        self.next_id = max(used_ids) + 1 if len(used_ids) > 0 else 0
+        self.free_ids = [i for i in range(self.next_id) if i not in used_ids]
+        heapq.heapify(self.free_ids)
+
+    def get(self, variant_name):
+        if variant_name in self.old_ids:
+            return self.old_ids[variant_name]
+
+        if len(self.free_ids) > 0:
+            return heapq.heappop(self.free_ids)
+
+        variant_id = self.next_id
+        self.next_id += 1
+        return variant_id
 
 
 def main():
-    global old_variants
-    global current_variant_id
+    args = parse_args()
 
     # Read the old "variants.json" file and the "suits.json" file
     dir_path = os.path.dirname(os.path.realpath(__file__))
     data_path = os.path.join(dir_path, "..", "..", "data")
     suits_path = os.path.join(data_path, "suits.json")
     variants_path = os.path.join(data_path, "variants.json")
+    variants_txt_path = os.path.join(data_path, "variants.txt")
+    colors_path = os.path.join(data_path, "colors.json")
 
     with open(variants_path, "r") as variants_file:
         variants_string = variants_file.read()
@@ -35,6 +362,9 @@ def main():
         suits_string = suits_file.read()
         suits = json.loads(suits_string)
 
+    with open(colors_path, "r") as colors_file:
+        colors = json.load(colors_file)
+
     # Validate that the old variants file has unique ID numbers for every variant
     old_variant_id_map = {}
     for [variant_name, variant] in old_variants.items():
@@ -48,109 +378,228 @@ def main():
         # Track that we have "seen" this ID
         old_variant_id_map[variant["id"]] = True
 
-    # Add default values for each suit
-    for suit in suits.values():
-        if "createVariants" not in suit:
-            suit["createVariants"] = False
-        if "oneOfEach" not in suit:
-            suit["oneOfEach"] = False
-        if "allClueColors" not in suit:
-            suit["allClueColors"] = False
-        if "allClueRanks" not in suit:
-            suit["allClueRanks"] = False
-        if "noClueColors" not in suit:
-            suit["noClueColors"] = False
-        if "noClueRanks" not in suit:
-            suit["noClueRanks"] = False
-
-    # Start to build all of the variants
-    variants = {}
-    current_variant_id = -1
-
-    # First, start with the basic variants
-    variant_suits = {}
-    variant_suits[1] = ["Red"]
-    variant_suits[2] = variant_suits[1] + ["Blue"]
-    variant_suits[3] = variant_suits[2].copy()
-    # Green is inserted before Blue to keep the colors in "rainbow" order
-    variant_suits[3].insert(1, "Green")
-    variant_suits[4] = variant_suits[3].copy()
-    # Yellow is inserted before Green to keep the colors in "rainbow" order
-    variant_suits[4].insert(1, "Yellow")
-    variant_suits[5] = variant_suits[4] + ["Purple"]
-    variant_suits[6] = variant_suits[5] + ["Teal"]
-
-    variants["No Variant"] = {
-        "id": get_variant_id("No Variant"),
-        "suits": variant_suits[5],
-    }
-    variants["6 Suits"] = {
-        "id": get_variant_id("6 Suits"),
-        "suits": variant_suits[6],
-    }
-    variants["4 Suits"] = {
-        "id": get_variant_id("4 Suits"),
-        "suits": variant_suits[4],
-    }
-    variants["3 Suits"] = {
-        "id": get_variant_id("3 Suits"),
-        "suits": variant_suits[3],
+    add_suit_defaults(suits)
+
+    # Only the families that depend on a changed suit (or that are not in the cache) are
+    # regenerated; every other family reuses its variants from the previous run
+    suit_hashes = get_suit_hashes(suits)
+    cache = None if args.full else read_cache(args.cache)
+    if cache is None:
+        cache = {"script_hash": "", "suits": {}, "families": {}}
+    print_changed_suits(cache["suits"], suit_hashes)
+    new_cache = {
+        "script_hash": get_script_hash(),
+        "suits": suit_hashes,
+        "families": {},
     }
+    regenerated_families = []
+    for family in VARIANT_FAMILIES:
+        dependency_hash = get_family_dependency_hash(family, suits, suit_hashes)
+        cached_family = cache["families"].get(family["name"])
+        if (
+            cache["script_hash"] == new_cache["script_hash"]
+            and cached_family is not None
+            and cached_family["dependency_hash"] == dependency_hash
+        ):
+            family_variants = cached_family["variants"]
+        else:
+            family_variants = list(generate_family(family, suits))
+            regenerated_families.append(family["name"])
+        new_cache["families"][family["name"]] = {
+            "dependency_hash": dependency_hash,
+            "variants": family_variants,
+        }
+    print(
+        "Regenerated "
+        + str(len(regenerated_families))
+        + " of "
+        + str(len(VARIANT_FAMILIES))
+        + " variant families."
+    )
+    for family_name in regenerated_families:
+        print("  " + family_name)
+
+    # Reject the new variants that would be too difficult
+    # (existing variants are never rejected, so that their IDs are preserved)
+    new_variants = []
+    for family in VARIANT_FAMILIES:
+        for [variant_name, variant_suits, _] in new_cache["families"][family["name"]][
+            "variants"
+        ]:
+            if variant_name not in old_variants:
+                new_variants.append([variant_name, variant_suits])
+    rejected_variants = get_rejected_variants(
+        new_variants, suits, colors, args.max_efficiency
+    )
 
-    # Add variants for each suit
-    for [suit_name, suit] in suits.items():
-        # We only want to create variants for certain suits
-        # (e.g. "Red" does not get its own variants because it is a basic suit)
-        if not suit["createVariants"]:
-            continue
-
-        for suit_num in [6, 5, 4, 3]:
-            # It would be too difficult to have a 4 suit variant or a 3 suits variant with a
-            # one-of-each suit
-            if (suit_num == 4 or suit_num == 3) and suit["oneOfEach"]:
+    # Assign the IDs in family order, so that new variants get the same IDs as a full rebuild
+    variant_ids = VariantIDAllocator(old_variants)
+    variants = {}
+    for family in VARIANT_FAMILIES:
+        family_variants = new_cache["families"][family["name"]]["variants"]
+        for [variant_name, variant_suits, properties] in family_variants:
+            if variant_name in rejected_variants:
                 continue
-
-            variant_name = suit_name + " (" + str(suit_num) + " Suits)"
-            computed_variant_suits = variant_suits[suit_num - 1] + [suit_name]
             variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": computed_variant_suits,
+                "id": variant_ids.get(variant_name),
+                "suits": variant_suits,
             }
+            variants[variant_name].update(properties)
 
-    # Add variants for each special suit combination
-    # Use a map to avoid repeats
-    combination_map = {}
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
+    diff = get_diff(old_variants, variants)
+    print_diff(diff)
+    if args.diff_output is not None:
+        with open(args.diff_output, "w", newline="\n") as diff_file:
+            json.dump(diff, diff_file, indent=2, separators=(",", ": "))
+            diff_file.write("\n")
+
+    # Check for missing variants
+    missing = False
+    for key in old_variants.keys():
+        if key not in variants:
+            missing = True
+            print("Missing variant: " + key)
+    if missing:
+        sys.exit(1)
+
+    # Write out the new "variant.json" file
+    # Files with the same contents are left untouched so that their modification times do not
+    # trigger rebuilds of the client and the server
+    variants_contents = json.dumps(variants, indent=2, separators=(",", ": ")) + "\n"
+    if write_if_changed(variants_path, variants_contents):
+        print('Wrote a new variants.json" file.')
+    else:
+        print('The "variants.json" file is already up to date.')
+
+    # Additionally, create a "variants.txt" file with the names of all of the variants
+    contents = ""
+    for variant_name in variants.keys():
+        contents += variant_name + "\n"
+    write_if_changed(variants_txt_path, contents + "\n")
+
+    # Additionally, create a "variants.bin" file for fast loading (see "variants_binary.py")
+    variants_bin_path = os.path.join(data_path, "variants.bin")
+    write_if_changed(variants_bin_path, variants_binary.encode_variants(variants))
+
+    # Additionally, create a "variant_tables.json" file with the deck composition and the clue
+    # touches of every variant (see "variant_tables.py")
+    variant_tables_path = os.path.join(data_path, "variant_tables.json")
+    write_if_changed(
+        variant_tables_path,
+        variant_tables.encode_variant_tables(variants, suits, colors),
+    )
+
+    write_if_changed(args.cache, json.dumps(new_cache, separators=(",", ":")) + "\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Generate the "variants.json" and "variants.txt" files.'
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="regenerate every variant family instead of using the cache",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help="the path of the cache of generated families (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--diff-output",
+        metavar="PATH",
+        help="write the added, removed, and changed variants to PATH as JSON",
+    )
+    parser.add_argument(
+        "--max-efficiency",
+        type=float,
+        default=DEFAULT_MAX_EFFICIENCY,
+        help="do not create new variants that require more efficiency than this "
+        + "(default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+# Add default values for each suit
+def add_suit_defaults(suits):
+    for suit in suits.values():
+        for key in ["createVariants", "oneOfEach"] + SPECIAL_PROPERTIES:
+            if key not in suit:
+                suit[key] = False
+
+
+# We only want to create variants for certain suits
+# (e.g. "Red" does not get its own variants because it is a basic suit)
+def get_special_suits(suits):
+    return [
+        [suit_name, suit]
+        for [suit_name, suit] in suits.items()
+        if suit["createVariants"]
+    ]
+
+
+# Yield every variant of a family as "[name, suits, extra properties]", in output order
+def generate_family(family, suits):
+    family_type = family["type"]
+    if family_type == "fixed":
+        return generate_fixed_family(family)
+    if family_type == "suits":
+        return generate_suits_family(family, suits)
+    if family_type == "special_suit_combinations":
+        return generate_special_suit_combinations(suits)
+    if family_type == "special_ranks":
+        return generate_special_ranks(family, suits)
+
+    print('The family of "' + family["name"] + '" has an unknown type: ' + family_type)
+    sys.exit(1)
+
+
+def generate_fixed_family(family):
+    for variant in family["variants"]:
+        yield [variant["name"], variant["suits"], variant.get("properties", {})]
+
+
+def generate_suits_family(family, suits):
+    base_suits = family.get("base_suits", VARIANT_SUITS)
+    properties = family.get("properties", {})
+
+    for suit_num in family.get("base_suit_nums", []):
+        variant_name = family["base_name"].format(num=suit_num)
+        yield [variant_name, base_suits[suit_num], properties]
+
+    if "special_name" not in family:
+        return
+
+    for [suit_name, suit] in get_special_suits(suits):
+        if suit["oneOfEach"] and not family.get("one_of_each", True):
+            continue
+        if (suit["allClueRanks"] or suit["noClueRanks"]) and not family.get(
+            "rank_attributes", True
+        ):
             continue
 
-        for [suit_name2, suit2] in suits.items():
-            if not suit2["createVariants"]:
+        suit_name += family.get("special_suit_suffix", "")
+        for suit_num in family["special_suit_nums"]:
+            if suit_num < ONE_OF_EACH_MIN_SUITS and suit["oneOfEach"]:
                 continue
 
-            if suit_name == suit_name2:
-                continue
+            variant_name = family["special_name"].format(suit=suit_name, num=suit_num)
+            yield [variant_name, base_suits[suit_num - 1] + [suit_name], properties]
 
-            # e.g. Rainbow + Dark Rainbow is illegal
-            if (
-                suit["allClueColors"] == suit2["allClueColors"]
-                and suit["allClueRanks"] == suit2["allClueRanks"]
-                and suit["noClueColors"] == suit2["noClueColors"]
-                and suit["noClueRanks"] == suit2["noClueRanks"]
-            ):
-                continue
 
-            if (
-                suit_name + suit_name2 in combination_map
-                or suit_name2 + suit_name in combination_map
-            ):
+def generate_special_suit_combinations(suits):
+    special_suits = get_special_suits(suits)
+
+    # Each pair is only visited once, in the order of "suits.json"
+    for [i, [suit_name, suit]] in enumerate(special_suits):
+        for [suit_name2, suit2] in special_suits[i + 1 :]:
+            # e.g. Rainbow + Dark Rainbow is illegal
+            if all(suit[key] == suit2[key] for key in SPECIAL_PROPERTIES):
                 continue
-            combination_map[suit_name + suit_name2] = True
 
             for suit_num in [6, 5, 4, 3]:
-                # It would be too difficult to have a 4 suit variant or a 3 suits variant with a
-                # one-of-each suit
-                if (suit_num == 4 or suit_num == 3) and (
+                if suit_num < ONE_OF_EACH_MIN_SUITS and (
                     suit["oneOfEach"] or suit2["oneOfEach"]
                 ):
                     continue
@@ -162,541 +611,198 @@ def main():
                 variant_name = (
                     suit_name + " & " + suit_name2 + " (" + str(suit_num) + " Suits)"
                 )
-                computed_variant_suits = variant_suits[suit_num - 2].copy()
-                computed_variant_suits.append(suit_name)
-                computed_variant_suits.append(suit_name2)
-                variants[variant_name] = {
-                    "id": get_variant_id(variant_name),
-                    "suits": computed_variant_suits,
-                }
-
-    # Add variants for special ranks
-    for special_rank in [1, 5]:
-        if special_rank == 1:
-            word = "Ones"
-        elif special_rank == 5:
-            word = "Fives"
-
-        for [suit_name, suit] in suits.items():
-            if not suit["createVariants"]:
-                continue
+                computed_variant_suits = VARIANT_SUITS[suit_num - 2] + [
+                    suit_name,
+                    suit_name2,
+                ]
+                yield [variant_name, computed_variant_suits, {}]
 
-            # There are no e.g. Black-Ones
-            if suit["oneOfEach"]:
-                continue
 
-            # First create "Rainbow-Ones (6 Suits)", etc.
-            for suit_num in [6, 5, 4, 3]:
-                hyphenated_suit_name = suit_name.replace(" ", "-")
-                variant_name = (
-                    hyphenated_suit_name + "-" + word + " (" + str(suit_num) + " Suits)"
-                )
-                computed_variant_suits = variant_suits[suit_num].copy()
-                variants[variant_name] = {
-                    "id": get_variant_id(variant_name),
-                    "suits": computed_variant_suits,
-                    "specialRank": special_rank,
-                }
-
-                for special_property in [
-                    "allClueColors",
-                    "allClueRanks",
-                    "noClueColors",
-                    "noClueRanks",
-                ]:
-                    if suit[special_property]:
-                        special_property = upperfirst(special_property)
-                        special_property_name = "special" + special_property
-                        variants[variant_name][special_property_name] = True
-
-                if suit["allClueRanks"] or suit["noClueRanks"]:
-                    clue_ranks = [1, 2, 3, 4, 5]
-                    clue_ranks.remove(special_rank)
-                    variants[variant_name]["clueRanks"] = clue_ranks
-
-            # Second, create the special suit combinations, e.g. "Rainbow-Ones & Rainbow (6 Suits)"
-            for [suit_name2, suit2] in suits.items():
-                if not suit2["createVariants"]:
-                    continue
+def generate_special_ranks(family, suits):
+    special_rank = family["special_rank"]
+    special_suits = get_special_suits(suits)
 
-                for suit_num in [6, 5, 4, 3]:
-                    # It would be too difficult to have a 4 suit variant or a 3 suits variant with a
-                    # one-of-each suit
-                    if (suit_num == 4 or suit_num == 3) and suit2["oneOfEach"]:
-                        continue
-
-                    hyphenated_suit_name = suit_name.replace(" ", "-")
-                    variant_name = (
-                        hyphenated_suit_name
-                        + "-"
-                        + word
-                        + " & "
-                        + suit_name2
-                        + " ("
-                        + str(suit_num)
-                        + " Suits)"
-                    )
-                    computed_variant_suits = variant_suits[suit_num - 1] + [suit_name2]
-                    variants[variant_name] = {
-                        "id": get_variant_id(variant_name),
-                        "suits": computed_variant_suits,
-                        "specialRank": special_rank,
-                    }
-
-                    for special_property in [
-                        "allClueColors",
-                        "allClueRanks",
-                        "noClueColors",
-                        "noClueRanks",
-                    ]:
-                        if suit[special_property]:
-                            special_property = upperfirst(special_property)
-                            special_property_name = "special" + special_property
-                            variants[variant_name][special_property_name] = True
-
-                    if suit["allClueRanks"] or suit["noClueRanks"]:
-                        clue_ranks = [1, 2, 3, 4, 5]
-                        clue_ranks.remove(special_rank)
-                        variants[variant_name]["clueRanks"] = clue_ranks
-
-    # Add "Ambiguous" variants
-    red_ambiguous_suits = ["Tomato", "Mahogany"]
-    green_ambiguous_suits = ["Lime", "Forest"]
-    blue_ambiguous_suits = ["Sky", "Navy"]
-    ambiguous_suits = {}
-    ambiguous_suits[2] = red_ambiguous_suits.copy()
-    ambiguous_suits[4] = red_ambiguous_suits + blue_ambiguous_suits
-    ambiguous_suits[6] = (
-        red_ambiguous_suits + green_ambiguous_suits + blue_ambiguous_suits
-    )
-    variants["Ambiguous (6 Suits)"] = {
-        "id": get_variant_id("Ambiguous (6 Suits)"),
-        "suits": ambiguous_suits[6],
-        "showSuitNames": True,
-    }
-    variants["Ambiguous (4 Suits)"] = {
-        "id": get_variant_id("Ambiguous (4 Suits)"),
-        "suits": ambiguous_suits[4],
-        "showSuitNames": True,
-    }
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
+    for [suit_name, suit] in special_suits:
+        # There are no e.g. Black-Ones
+        if suit["oneOfEach"]:
             continue
 
-        for suit_num in [4, 2]:
-            incremented_suit_num = suit_num + 1
-
-            # It would be too difficult to have a 3 suits variant with a one-of-each suit
-            if incremented_suit_num == 3 and suit["oneOfEach"]:
-                continue
-
-            variant_name = (
-                "Ambiguous & "
-                + suit_name
-                + " ("
-                + str(incremented_suit_num)
-                + " Suits)"
-            )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": ambiguous_suits[suit_num] + [suit_name],
-                "showSuitNames": True,
-            }
+        properties = {"specialRank": special_rank}
+        for special_property in SPECIAL_PROPERTIES:
+            if suit[special_property]:
+                properties["special" + upperfirst(special_property)] = True
+        if suit["allClueRanks"] or suit["noClueRanks"]:
+            clue_ranks = [1, 2, 3, 4, 5]
+            clue_ranks.remove(special_rank)
+            properties["clueRanks"] = clue_ranks
 
-    # Add "Very Ambiguous" variants
-    variants["Very Ambiguous (6 Suits)"] = {
-        "id": get_variant_id("Very Ambiguous (6 Suits)"),
-        "suits": [
-            "Tomato VA",
-            "Ruby VA",
-            "Mahogany VA",
-            "Sky VA",
-            "Berry VA",
-            "Navy VA",
-        ],
-        "showSuitNames": True,
-    }
+        prefix = suit_name.replace(" ", "-") + "-" + family["word"]
 
-    # Add "Extremely Ambiguous" variants
-    extremely_ambiguous_suits = {}
-    extremely_ambiguous_suits[3] = [
-        "Sky VA",
-        "Berry VA",
-        "Navy VA",
-    ]
-    extremely_ambiguous_suits[4] = [
-        "Ice EA",
-        "Sapphire EA",
-        "Sky EA",
-        "Berry EA",
-    ]
-    extremely_ambiguous_suits[5] = extremely_ambiguous_suits[4] + ["Navy EA"]
-    extremely_ambiguous_suits[6] = extremely_ambiguous_suits[5] + ["Ocean EA"]
-    variants["Extremely Ambiguous (6 Suits)"] = {
-        "id": get_variant_id("Extremely Ambiguous (6 Suits)"),
-        "suits": extremely_ambiguous_suits[6],
-        "showSuitNames": True,
-    }
-    variants["Extremely Ambiguous (5 Suits)"] = {
-        "id": get_variant_id("Extremely Ambiguous (5 Suits)"),
-        "suits": extremely_ambiguous_suits[5],
-        "showSuitNames": True,
-    }
-    variants["Extremely Ambiguous (4 Suits)"] = {
-        "id": get_variant_id("Extremely Ambiguous (4 Suits)"),
-        "suits": extremely_ambiguous_suits[4],
-        "showSuitNames": True,
-    }
-    variants["Extremely Ambiguous (3 Suits)"] = {
-        "id": get_variant_id("Extremely Ambiguous (3 Suits)"),
-        "suits": extremely_ambiguous_suits[3],
-        "showSuitNames": True,
-    }
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
-            continue
+        # First create "Rainbow-Ones (6 Suits)", etc.
+        for suit_num in [6, 5, 4, 3]:
+            variant_name = prefix + " (" + str(suit_num) + " Suits)"
+            yield [variant_name, VARIANT_SUITS[suit_num], properties]
 
-        for suit_num in [5, 4, 3]:
-            incremented_suit_num = suit_num + 1
+        # Second, create the special suit combinations, e.g. "Rainbow-Ones & Rainbow (6 Suits)"
+        for [suit_name2, suit2] in special_suits:
+            for suit_num in [6, 5, 4, 3]:
+                if suit_num < ONE_OF_EACH_MIN_SUITS and suit2["oneOfEach"]:
+                    continue
 
-            # It would be too difficult to have a 4 suit variant with a one-of-each suit
-            if incremented_suit_num == 4 and suit["oneOfEach"]:
-                continue
+                variant_name = (
+                    prefix + " & " + suit_name2 + " (" + str(suit_num) + " Suits)"
+                )
+                yield [
+                    variant_name,
+                    VARIANT_SUITS[suit_num - 1] + [suit_name2],
+                    properties,
+                ]
 
-            variant_name = (
-                "Extremely Ambiguous & "
-                + suit_name
-                + " ("
-                + str(incremented_suit_num)
-                + " Suits)"
-            )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": extremely_ambiguous_suits[suit_num] + [suit_name],
-                "showSuitNames": True,
-            }
 
-    # Add "Dual-Color" variants
-    dual_color_suits = {}
-    dual_color_suits[3] = ["Orange D2", "Purple D", "Green D"]
-    dual_color_suits[5] = ["Orange D2", "Lime D", "Teal D", "Indigo D", "Cardinal D"]
-    dual_color_suits[6] = [
-        "Orange D",
-        "Purple D",
-        "Mahogany D",
-        "Green D",
-        "Tan D",
-        "Navy D",
-    ]
-    variants["Dual-Color (6 Suits)"] = {
-        "id": get_variant_id("Dual-Color (6 Suits)"),
-        "suits": dual_color_suits[6],
-        "showSuitNames": True,
-    }
-    variants["Dual-Color (5 Suits)"] = {
-        "id": get_variant_id("Dual-Color (5 Suits)"),
-        "suits": dual_color_suits[5],
-        "showSuitNames": True,
-    }
-    variants["Dual-Color (3 Suits)"] = {
-        "id": get_variant_id("Dual-Color (3 Suits)"),
-        "suits": dual_color_suits[3],
-        "showSuitNames": True,
-    }
+# Only the suit fields that are read by the generators are hashed,
+# so changing e.g. the fill color of a suit does not regenerate any families
+def get_suit_hashes(suits):
+    suit_hashes = {}
     for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
-            continue
+        fields = [
+            suit[key] for key in ["createVariants", "oneOfEach"] + SPECIAL_PROPERTIES
+        ]
+        suit_hashes[suit_name] = get_hash(json.dumps(fields))
+    return suit_hashes
+
+
+# A family depends on every special suit (and their order) unless it only has base variants
+def get_family_dependency_hash(family, suits, suit_hashes):
+    if family["type"] == "fixed" or (
+        family["type"] == "suits" and "special_name" not in family
+    ):
+        return ""
+
+    special_suit_hashes = [
+        [suit_name, suit_hashes[suit_name]]
+        for [suit_name, _] in get_special_suits(suits)
+    ]
+    return get_hash(json.dumps(special_suit_hashes))
 
-        for suit_num in [5, 3]:
-            incremented_suit_num = suit_num + 1
 
-            # It would be too difficult to have a 4 suit variant with a one-of-each suit
-            if incremented_suit_num == 4 and suit["oneOfEach"]:
-                continue
+# The cache is invalid if the family definitions or the generators in this script change
+def get_script_hash():
+    with open(os.path.realpath(__file__), "rb") as script_file:
+        return hashlib.sha256(script_file.read()).hexdigest()
 
-            variant_name = (
-                "Dual-Color & "
-                + suit_name
-                + " ("
-                + str(incremented_suit_num)
-                + " Suits)"
-            )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": dual_color_suits[suit_num] + [suit_name],
-                "showSuitNames": True,
-            }
 
-    # Add "Special Mix (5 Suits)"
-    variants["Special Mix (5 Suits)"] = {
-        "id": get_variant_id("Special Mix (5 Suits)"),
-        "suits": ["Black", "Rainbow", "Pink", "White", "Brown",],
-    }
+def get_hash(string):
+    return hashlib.sha256(string.encode("utf-8")).hexdigest()
 
-    # Add "Special Mix (6 Suits)"
-    variants["Special Mix (6 Suits)"] = {
-        "id": get_variant_id("Special Mix (6 Suits)"),
-        "suits": ["Black", "Rainbow", "Pink", "White", "Brown", "Null",],
-    }
 
-    # Add "Ambiguous Mix"
-    variants["Ambiguous Mix"] = {
-        "id": get_variant_id("Ambiguous Mix"),
-        "suits": ["Tomato", "Mahogany", "Sky", "Navy", "Black", "White",],
-        "showSuitNames": True,
-    }
+def read_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return None
 
-    # Add "Dual-Color Mix"
-    variants["Dual-Color Mix"] = {
-        "id": get_variant_id("Dual-Color Mix"),
-        "suits": ["Orange D2", "Purple D", "Green D", "Black", "Rainbow", "White",],
-    }
+    try:
+        with open(cache_path, "r") as cache_file:
+            cache = json.load(cache_file)
+    except ValueError:
+        print('The cache file of "' + cache_path + '" is corrupt; ignoring it.')
+        return None
 
-    # Add "Ambiguous & Dual-Color"
-    variants["Ambiguous & Dual-Color"] = {
-        "id": get_variant_id("Ambiguous & Dual-Color"),
-        "suits": [
-            "Tangelo AD",
-            "Peach AD",
-            "Orchid AD",
-            "Violet AD",
-            "Lime AD",
-            "Forest AD",
-        ],
-        "showSuitNames": True,
-    }
+    return cache
 
-    # Add blind variants
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Color Blind (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-            "colorCluesTouchNothing": True,
-        }
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Number Blind (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-            "rankCluesTouchNothing": True,
-        }
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Totally Blind (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-            "colorCluesTouchNothing": True,
-            "rankCluesTouchNothing": True,
-        }
 
-    # Add mute variants
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Color Mute (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-            "clueColors": [],
-        }
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Number Mute (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-            "clueRanks": [],
-        }
+def print_changed_suits(old_suit_hashes, suit_hashes):
+    if len(old_suit_hashes) == 0:
+        return
 
-    # Add "Alternating Clues" variants
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Alternating Clues (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-        }
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
-            continue
+    for suit_name in suit_hashes.keys():
+        if suit_name not in old_suit_hashes:
+            print("Added suit: " + suit_name)
+        elif old_suit_hashes[suit_name] != suit_hashes[suit_name]:
+            print("Changed suit: " + suit_name)
+    for suit_name in old_suit_hashes.keys():
+        if suit_name not in suit_hashes:
+            print("Removed suit: " + suit_name)
 
-        for suit_num in [6, 5, 4, 3]:
-            # It would be too difficult to have a 4 suit variant or a 3 suits variant with a
-            # one-of-each suit
-            if (suit_num == 4 or suit_num == 3) and suit["oneOfEach"]:
-                continue
-
-            variant_name = (
-                "Alternating Clues & " + suit_name + " (" + str(suit_num) + " Suits)"
-            )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": variant_suits[suit_num - 1] + [suit_name],
-            }
 
-    # Add "Clue Starved" variants
-    for suit_num in [6, 5]:  # 4 suits and 3 suits would be too difficult
-        variant_name = "Clue Starved (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-        }
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
+def get_diff(old_variants, variants):
+    diff = {"added": [], "removed": [], "changed": []}
+    for [variant_name, variant] in variants.items():
+        if variant_name not in old_variants:
+            diff["added"].append({"name": variant_name, "id": variant["id"]})
             continue
 
-        if suit["oneOfEach"]:
-            continue
-
-        for suit_num in [6, 5]:  # 4 suits and 3 suits would be too difficult
-            variant_name = (
-                "Clue Starved & " + suit_name + " (" + str(suit_num) + " Suits)"
+        old_variant = old_variants[variant_name]
+        changed_fields = [
+            key
+            for key in list(old_variant.keys())
+            + [key for key in variant.keys() if key not in old_variant]
+            if old_variant.get(key) != variant.get(key)
+        ]
+        if len(changed_fields) > 0:
+            diff["changed"].append(
+                {"name": variant_name, "id": variant["id"], "fields": changed_fields}
             )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": variant_suits[suit_num - 1] + [suit_name],
-            }
-
-    # Add "Cow & Pig" variants
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Cow & Pig (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-        }
+    for [variant_name, old_variant] in old_variants.items():
+        if variant_name not in variants:
+            diff["removed"].append({"name": variant_name, "id": old_variant["id"]})
 
-    # Add "Duck" variants
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Duck (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-        }
+    return diff
 
-    # Add "Throw It in a Hole" variants
-    for suit_num in [6, 5, 4]:  # 3 suits would be too difficult
-        variant_name = "Throw It in a Hole (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-        }
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
-            continue
 
-        if suit["oneOfEach"]:
-            # "Throw It in a Hole & Black (6 Suits)" is 1.88 required efficiency in 5-player
+def print_diff(diff):
+    for [key, symbol] in [["added", "+"], ["removed", "-"], ["changed", "~"]]:
+        if len(diff[key]) == 0:
             continue
 
-        for suit_num in [6, 5, 4]:  # 3 suits would be too difficult
-            variant_name = (
-                "Throw It in a Hole & " + suit_name + " (" + str(suit_num) + " Suits)"
+        print(key.capitalize() + " variants (" + str(len(diff[key])) + "):")
+        for entry in diff[key]:
+            line = (
+                "  " + symbol + " " + entry["name"] + " (ID " + str(entry["id"]) + ")"
             )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": variant_suits[suit_num - 1] + [suit_name],
-            }
-
-    # Add "Reversed" variants (the "Teal" version without any special suits)
-    for suit_num in [6, 5, 4, 3]:
-        variant_name = "Reversed (" + str(suit_num) + " Suits)"
-        reversed_variant_suits = variant_suits[suit_num].copy()
-        reversed_variant_suits[-1] += SUIT_REVERSED_SUFFIX
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": reversed_variant_suits,
-        }
+            if "fields" in entry:
+                line += ": " + ", ".join(entry["fields"])
+            print(line)
 
-    # Add "Reversed" variants for each special suit
-    for [suit_name, suit] in suits.items():
-        # We only want to create variants for certain suits
-        # (e.g. "Red" does not get its own variants because it is a basic suit)
-        if not suit["createVariants"]:
-            continue
-
-        # Reversed suits with rank attributes would be identical to the normal versions
-        if suit["allClueRanks"] or suit["noClueRanks"]:
-            continue
+    if len(diff["added"]) + len(diff["removed"]) + len(diff["changed"]) == 0:
+        print("No variants were added, removed, or changed.")
 
-        suit_name = suit_name + SUIT_REVERSED_SUFFIX
-        for suit_num in [6, 5, 4, 3]:
-            # It would be too difficult to have a 4 suit variant or a 3 suits variant with a
-            # one-of-each suit
-            if (suit_num == 4 or suit_num == 3) and suit["oneOfEach"]:
-                continue
 
-            variant_name = suit_name + " (" + str(suit_num) + " Suits)"
-            computed_variant_suits = variant_suits[suit_num - 1] + [suit_name]
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": computed_variant_suits,
-            }
+# Returns the names of the variants that require more efficiency than the maximum
+# in any player count (see "variant_efficiency.py")
+def get_rejected_variants(new_variants, suits, colors, max_efficiency):
+    if len(new_variants) == 0:
+        return set()
 
-    # Add "Up or Down" variants
-    for suit_num in [6, 5]:  # 4 suits and 3 suits would be too difficult
-        variant_name = "Up or Down (" + str(suit_num) + " Suits)"
-        variants[variant_name] = {
-            "id": get_variant_id(variant_name),
-            "suits": variant_suits[suit_num],
-            "showSuitNames": True,
-        }
-    for [suit_name, suit] in suits.items():
-        if not suit["createVariants"]:
-            continue
-
-        if suit["oneOfEach"]:
-            # A one of each suit in combination with Up or Down would be too difficult
-            continue
-
-        for suit_num in [6, 5]:  # 4 suits and 3 suits would be too difficult
-            variant_name = (
-                "Up or Down & " + suit_name + " (" + str(suit_num) + " Suits)"
+    efficiencies = variant_efficiency.get_required_efficiencies(
+        new_variants, suits, colors
+    )
+    worst_efficiencies = efficiencies.max(axis=1)
+    rejected_variants = set()
+    for [i, [variant_name, _]] in enumerate(new_variants):
+        if worst_efficiencies[i] > max_efficiency:
+            rejected_variants.add(variant_name)
+            print(
+                "Rejected variant (requires "
+                + "{:.2f}".format(worst_efficiencies[i])
+                + " efficiency): "
+                + variant_name
             )
-            variants[variant_name] = {
-                "id": get_variant_id(variant_name),
-                "suits": variant_suits[suit_num - 1] + [suit_name],
-                "showSuitNames": True,
-            }
 
-    # Check for missing variants
-    missing = False
-    for key in old_variants.keys():
-        if key not in variants:
-            missing = True
-            print("Missing variant: " + key)
-    if missing:
-        sys.exit(1)
+    return rejected_variants
 
-    # Write out the new "variant.json" file
-    with open(variants_path, "w", newline="\n") as new_variants_file:
-        json.dump(variants, new_variants_file, indent=2, separators=(",", ": "))
-        new_variants_file.write("\n")
 
-    print('Wrote a new variants.json" file.')
+# Returns true if the file was written
+def write_if_changed(path, contents):
+    if isinstance(contents, str):
+        contents = contents.encode("utf-8")
 
-    # Additionally, create a "variants.txt" file with the names of all of the variants
-    variants_txt_path = os.path.join(data_path, "variants.txt")
-    contents = ""
-    for variant_name in variants.keys():
-        contents += variant_name + "\n"
-    with open(variants_txt_path, "w", newline="\n") as variants_txt_file:
-        variants_txt_file.write(contents + "\n")
-
-
-def get_variant_id(variant_name):
-    global old_variants
-    global current_variant_id
-
-    if variant_name in old_variants:
-        return old_variants[variant_name]["id"]
-
-    # Find the lowest unused variant ID
-    while True:
-        current_variant_id += 1
-        found = False
-        for variant in old_variants.values():
-            if variant["id"] == current_variant_id:
-                found = True
-                break
-        if not found:
-            return current_variant_id
+    if os.path.exists(path):
+        with open(path, "rb") as existing_file:
+            if existing_file.read() == contents:
+                return False
+
+    with open(path, "wb") as new_file:
+        new_file.write(contents)
+    return True
 
 
 # From: https://stackoverflow.com/questions/12410242/python-capitalize-first-letter-only
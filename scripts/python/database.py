@@ -0,0 +1,576 @@
+# Shared database helpers for the maintenance scripts in this directory
+# Scripts import this module with "import database" (the directory of the running script is always
+# on the Python path)
+
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import codecs
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import re
+import dotenv
+import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+
+# Import environment variables
+dotenv.load_dotenv(dotenv.find_dotenv())
+
+# Constants
+# The number of rows that a server-side cursor fetches per network round trip
+DEFAULT_CHUNK_SIZE = 10000
+# The number of rows that are written per statement or transaction by the bulk helpers
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_CONNECTIONS = 4
+# The server writes a game, its participants, and its actions with separate statements when the game
+# ends, so the incremental jobs leave the games that finished less than this long ago for the next
+# run (otherwise, a game could be read before all of its rows exist and then never be read again)
+SETTLE_INTERVAL = "1 hour"
+# The backslash sequences that "COPY ... TO STDOUT" uses in the text format
+COPY_ESCAPE_PATTERN = re.compile(r"\\(.)")
+COPY_ESCAPES = {
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+}
+
+# Variables
+connection_pool = None
+cursor_counter = 0
+
+
+def get_connection_parameters():
+    host = os.getenv("DB_HOST")
+    if not host:
+        host = "localhost"
+    port = os.getenv("DB_PORT")
+    if not port:
+        port = "5432"
+
+    return {
+        "host": host,
+        "port": port,
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASS"),
+        "database": os.getenv("DB_NAME"),
+    }
+
+
+# Open a new dedicated connection to the PostgreSQL database
+def connect():
+    return psycopg2.connect(**get_connection_parameters())
+
+
+def get_pool(max_connections=DEFAULT_MAX_CONNECTIONS):
+    global connection_pool
+
+    if connection_pool is None:
+        connection_pool = psycopg2.pool.ThreadedConnectionPool(
+            1, max_connections, **get_connection_parameters()
+        )
+
+    return connection_pool
+
+
+def close_pool():
+    global connection_pool
+
+    if connection_pool is not None:
+        connection_pool.closeall()
+        connection_pool = None
+
+
+# Borrow a connection from the pool
+# Anything that was not committed is rolled back before the connection is returned, so that a
+# failed job never leaves an open transaction behind for the next user of the connection
+@contextlib.contextmanager
+def pooled_connection():
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        if not conn.closed:
+            conn.rollback()
+        pool.putconn(conn)
+
+
+# Run a block of statements as a single transaction
+# It is committed if the block succeeds and rolled back if it raises an exception
+@contextlib.contextmanager
+def transaction(conn):
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# Stream the results of a query through a named (server-side) cursor
+# Only "chunk_size" rows are held in memory at a time, regardless of the size of the result set
+# Use "with_hold" if the caller will commit on the same connection while still iterating
+def stream(conn, query, params=None, chunk_size=DEFAULT_CHUNK_SIZE, with_hold=False):
+    global cursor_counter
+
+    cursor_counter += 1
+    cursor_name = "stream_" + str(os.getpid()) + "_" + str(cursor_counter)
+    cursor = conn.cursor(name=cursor_name, withhold=with_hold)
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+# Stream the results of a query as lists of up to "chunk_size" rows
+def stream_chunks(
+    conn, query, params=None, chunk_size=DEFAULT_CHUNK_SIZE, with_hold=False
+):
+    return batched(
+        stream(conn, query, params, chunk_size=chunk_size, with_hold=with_hold),
+        chunk_size,
+    )
+
+
+# Group an iterable into lists of up to "size" items without materializing the whole iterable
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+# Insert many rows with a multi-row "VALUES" list
+# The query must contain a single "%s" placeholder for the values, e.g.
+# "INSERT INTO foo (a, b) VALUES %s"
+def execute_values(cursor, query, rows, page_size=DEFAULT_BATCH_SIZE):
+    psycopg2.extras.execute_values(cursor, query, rows, page_size=page_size)
+
+
+# Bulk load rows into a table with "COPY ... FROM STDIN"
+# The rows are encoded lazily, so an arbitrarily large iterable can be loaded in constant memory
+def copy_rows(cursor, table, columns, rows):
+    query = "COPY " + table + " (" + ", ".join(columns) + ") FROM STDIN"
+    cursor.copy_expert(query, CopyRowReader(rows))
+
+
+# Stream the results of a query into a file-like object with "COPY ... TO STDOUT"
+# "COPY" does not accept parameters, so any parameters are bound on the client with "mogrify()"
+def copy_query_to(cursor, query, output_file, params=None):
+    if params is not None:
+        query = cursor.mogrify(query, params).decode("utf-8")
+    cursor.copy_expert("COPY (" + query + ") TO STDOUT", output_file)
+
+
+# Encode a row in the PostgreSQL "COPY" text format
+def encode_copy_row(row):
+    fields = []
+    for value in row:
+        if value is None:
+            fields.append("\\N")
+        elif isinstance(value, bool):
+            fields.append("t" if value else "f")
+        else:
+            fields.append(
+                str(value)
+                .replace("\\", "\\\\")
+                .replace("\t", "\\t")
+                .replace("\n", "\\n")
+                .replace("\r", "\\r")
+            )
+    return "\t".join(fields) + "\n"
+
+
+# Decode a field from the PostgreSQL "COPY" text format (the opposite of "encode_copy_row()")
+def decode_copy_field(field):
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+
+    return COPY_ESCAPE_PATTERN.sub(
+        lambda match: COPY_ESCAPES.get(match.group(1), match.group(1)), field
+    )
+
+
+# A file-like object that psycopg2 can read "COPY" data from
+# Rows are pulled from the underlying iterable only when psycopg2 asks for more data
+class CopyRowReader:
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.buffer += encode_copy_row(next(self.rows))
+            except StopIteration:
+                break
+
+        if size < 0:
+            size = len(self.buffer)
+        data = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return data
+
+    def readline(self):
+        if self.buffer == "":
+            try:
+                return encode_copy_row(next(self.rows))
+            except StopIteration:
+                return ""
+
+        line, separator, rest = self.buffer.partition("\n")
+        self.buffer = rest
+        return line + separator
+
+
+# A file-like object that receives "COPY ... TO STDOUT" data and calls "handle_row" with the list
+# of fields of each row (as raw strings in the "COPY" text format)
+# Partial lines are buffered between writes, so rows are processed as soon as they arrive
+class CopyRowWriter:
+    def __init__(self, handle_row):
+        self.handle_row = handle_row
+        self.partial_line = ""
+        # A multi-byte character can be split between two writes
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        lines = (self.partial_line + data).split("\n")
+        self.partial_line = lines.pop()
+        for line in lines:
+            self.handle_row(line.split("\t"))
+        return len(data)
+
+
+# Stream the results of a query to "handle_row" with "COPY ... TO STDOUT"
+def copy_query_rows(cursor, query, handle_row, params=None):
+    copy_query_to(cursor, query, CopyRowWriter(handle_row), params)
+
+
+# A file-like object that parses "COPY ... TO STDOUT" data made up of only integer columns into one
+# NumPy array per column
+# The data is parsed in large blocks with NumPy instead of row by row, so the query must not return
+# NULL values (use "COALESCE()" and cast booleans to integers with "::int")
+class CopyColumnWriter:
+    BLOCK_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, dtypes):
+        # NumPy is only required by the scripts that use this class
+        import numpy
+
+        self.numpy = numpy
+        self.dtypes = dtypes
+        self.pending = []
+        self.pending_size = 0
+        self.blocks = [[] for _ in dtypes]
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= self.BLOCK_SIZE:
+            self.parse_pending(final=False)
+        return len(data)
+
+    def parse_pending(self, final):
+        data = b"".join(self.pending)
+        rest = b""
+        if not final:
+            # Only parse complete lines; the remainder is kept for the next block
+            cut = data.rfind(b"\n") + 1
+            rest = data[cut:]
+            data = data[:cut]
+        self.pending = [rest] if len(rest) > 0 else []
+        self.pending_size = len(rest)
+        if len(data) == 0:
+            return
+
+        # A separator of a space matches any whitespace, including tabs and newlines
+        values = self.numpy.fromstring(
+            data.decode("ascii"), dtype=self.numpy.int64, sep=" "
+        )
+        values = values.reshape(-1, len(self.dtypes))
+        for [i, dtype] in enumerate(self.dtypes):
+            self.blocks[i].append(values[:, i].astype(dtype))
+
+    def get_columns(self):
+        self.parse_pending(final=True)
+        columns = []
+        for [i, dtype] in enumerate(self.dtypes):
+            if len(self.blocks[i]) == 0:
+                columns.append(self.numpy.zeros(0, dtype=dtype))
+            else:
+                columns.append(self.numpy.concatenate(self.blocks[i]))
+        return columns
+
+
+# Run an integer-only query with "COPY ... TO STDOUT" and return one NumPy array per column
+def copy_query_columns(cursor, query, dtypes, params=None):
+    writer = CopyColumnWriter(dtypes)
+    copy_query_to(cursor, query, writer, params)
+    return writer.get_columns()
+
+
+# Commit on a connection every time "batch_size" units of work have been recorded
+# This keeps locks and undo information bounded on long jobs; "finish" commits the remainder
+class BatchCommitter:
+    def __init__(self, conn, batch_size=DEFAULT_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.num_pending = 0
+        self.num_commits = 0
+
+    def add(self, num=1):
+        self.num_pending += num
+        if self.num_pending >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.num_pending = 0
+        self.num_commits += 1
+
+    def finish(self):
+        if self.num_pending > 0:
+            self.commit()
+
+
+# Split the keys of a table into at most "num_ranges" half-open ranges of [low, high)
+# Only keys greater than "after" and up to "last" are included, if specified
+# The ranges are split by key value, which is even enough for "SERIAL" primary keys
+def get_key_ranges(conn, table, num_ranges, column="id", after=None, last=None):
+    query = "SELECT MIN(" + column + "), MAX(" + column + ") FROM " + table
+    conditions = []
+    params = []
+    if after is not None:
+        conditions.append(column + " > %s")
+        params.append(after)
+    if last is not None:
+        conditions.append(column + " <= %s")
+        params.append(last)
+    if len(conditions) > 0:
+        query += " WHERE " + " AND ".join(conditions)
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    [min_key, max_key] = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    if min_key is None:
+        return []
+
+    span = max_key - min_key + 1
+    num_ranges = max(1, min(num_ranges, span))
+    key_ranges = []
+    for i in range(num_ranges):
+        low = min_key + span * i // num_ranges
+        high = min_key + span * (i + 1) // num_ranges
+        key_ranges.append((low, high))
+
+    return key_ranges
+
+
+# Run "worker(low, high, *args)" for every key range and yield each "(key_range, result)" pair as
+# it finishes
+# With more than one worker, the ranges are processed in a pool of separate processes; each worker
+# must open its own connection (e.g. with "connect()") and return a dictionary of counts
+# Workers are started with "spawn" so that no connection of the parent process is ever shared, which
+# means that the calling script must only start work from inside of an
+# 'if __name__ == "__main__":' block
+def run_key_ranges(worker, key_ranges, num_workers=1, args=()):
+    if num_workers <= 1:
+        for key_range in key_ranges:
+            yield key_range, run_key_range(worker, key_range, args)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=context
+    ) as executor:
+        futures = {}
+        for key_range in key_ranges:
+            future = executor.submit(run_key_range, worker, key_range, args)
+            futures[future] = key_range
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+
+# Errors are reported back to the parent instead of aborting the other ranges; since every range
+# commits its own work, it is always safe to rerun the job to retry the ranges that failed
+def run_key_range(worker, key_range, args):
+    [low, high] = key_range
+    try:
+        return worker(low, high, *args)
+    except Exception as e:
+        return {"errors": ["[" + str(low) + ", " + str(high) + "): " + repr(e)]}
+
+
+# Add the per-worker counts from "result" into "totals"
+def combine_results(totals, result):
+    for [key, value] in result.items():
+        if key == "errors":
+            totals.setdefault("errors", []).extend(value)
+        else:
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def print_errors(totals):
+    errors = totals.get("errors", [])
+    for error in errors:
+        print("Error in key range " + error)
+    return len(errors)
+
+
+# Track which key ranges of a job have completed
+# The ranges can finish out of order when running in parallel, so the progress only advances past a
+# range once it and every range before it have completed, and it stops advancing after a failure
+# (at most one range per worker will be repeated after an interruption)
+class RangeProgress:
+    def __init__(self, key_ranges):
+        self.key_ranges = key_ranges
+        self.range_index_map = {}
+        for [i, key_range] in enumerate(key_ranges):
+            self.range_index_map[key_range] = i
+        self.completed = [False] * len(key_ranges)
+        self.num_contiguous = 0
+        self.failed = False
+
+    # Returns the highest key that every range up to it has processed,
+    # or None if the progress did not advance
+    def complete(self, key_range):
+        self.completed[self.range_index_map[key_range]] = True
+        advanced = False
+        while (
+            not self.failed
+            and self.num_contiguous < len(self.key_ranges)
+            and self.completed[self.num_contiguous]
+        ):
+            self.num_contiguous += 1
+            advanced = True
+
+        if not advanced:
+            return None
+        return self.key_ranges[self.num_contiguous - 1][1] - 1
+
+    def fail(self):
+        self.failed = True
+
+
+# The high-water marks of the incremental maintenance jobs are stored as JSON in the "metadata"
+# table under the name of "watermark_[job name]"
+# e.g. {"id": 123456, "datetime": "2020-08-17T12:34:56+00:00"}
+def get_watermark(conn, job):
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM metadata WHERE name = %s", ("watermark_" + job,))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    if row is None:
+        return None
+
+    return json.loads(row[0])
+
+
+def set_watermark(conn, job, watermark):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO metadata (name, value) VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+        """,
+        ("watermark_" + job, json.dumps(watermark)),
+    )
+    cursor.close()
+    conn.commit()
+
+
+# Record that the key range that ends at "high" in the "ranges" of a watermark (a list of
+# "[next key, high]" for every range of a run that is in progress) is done up to "next_key"
+# This does not commit, so that the progress is committed together with the work that it describes;
+# the row stays locked until then, so the workers of a run take turns to update it
+def set_range_progress(cursor, job, high, next_key):
+    cursor.execute(
+        "SELECT value FROM metadata WHERE name = %s FOR UPDATE", ("watermark_" + job,)
+    )
+    watermark = json.loads(cursor.fetchone()[0])
+    for key_range in watermark["ranges"]:
+        if key_range[1] == high:
+            key_range[0] = next_key
+    cursor.execute(
+        "UPDATE metadata SET value = %s WHERE name = %s",
+        (json.dumps(watermark), "watermark_" + job),
+    )
+
+
+# Build a watermark for the row with the given ID, including its timestamp for reference
+def make_watermark(conn, table, key, datetime_column):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT "
+        + datetime_column
+        + " FROM "
+        + table
+        + " WHERE id <= %s ORDER BY id DESC LIMIT 1",
+        (key,),
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+
+    watermark = {"id": key}
+    if row is not None:
+        watermark["datetime"] = row[0].isoformat()
+    return watermark
+
+
+# Returns the highest ID of the rows that are older than "interval" (e.g. "1 hour"), or 0 if there
+# are none
+# The rows are found by walking the primary key backwards from the newest one, so only the recent
+# rows are read
+def get_settled_max_id(conn, table, datetime_column, interval=SETTLE_INTERVAL):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id FROM "
+        + table
+        + " WHERE "
+        + datetime_column
+        + " < NOW() - INTERVAL %s ORDER BY id DESC LIMIT 1",
+        (interval,),
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    if row is None:
+        return 0
+
+    return row[0]
+
+
+def describe_watermark(watermark):
+    description = "ID " + str(watermark["id"])
+    if "datetime" in watermark:
+        description += " (" + watermark["datetime"] + ")"
+    return description
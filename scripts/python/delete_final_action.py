@@ -8,68 +8,136 @@ if sys.version_info < (3, 0):
     sys.exit(1)
 
 # Imports
-import os
-import dotenv
-import psycopg2
-
-# Import environment variables
-dotenv.load_dotenv(dotenv.find_dotenv())
+import database
 
 # Variables
-user = os.getenv("DB_USER")
-password = os.getenv("DB_PASS")
-host = os.getenv("DB_HOST")
-if host == "":
-    host = "localhost"
-port = os.getenv("DB_PORT")
-if port == "":
-    port = "5432"
-database = os.getenv("DB_NAME")
 game_ids_file = "game_ids.txt"
 
-# Read the IDs
+# Read and validate the IDs before touching the database
+# Each line is in the form of "[game ID],[number of actions to delete]"
+num_actions_to_delete_map = {}
 with open(game_ids_file) as f:
-    game_ids = f.read().split("\n")
+    line_num = 0
+    for line in f:
+        line_num += 1
+        line = line.strip()
+        if line == "":
+            continue
 
-# Connect to the PostgreSQL database
-conn = psycopg2.connect(
-    host=host, port=port, user=user, password=password, database=database,
-)
+        line_array = line.split(",")
+        if len(line_array) != 2:
+            print("Line " + str(line_num) + " is invalid:", line)
+            sys.exit(1)
+        try:
+            game_id = int(line_array[0])
+            num_actions_to_delete = int(line_array[1])
+        except ValueError:
+            print("Line " + str(line_num) + " is not numeric:", line)
+            sys.exit(1)
+        if game_id <= 0 or num_actions_to_delete <= 0:
+            print("Line " + str(line_num) + " must have positive numbers:", line)
+            sys.exit(1)
+        if game_id in num_actions_to_delete_map:
+            print("Line " + str(line_num) + " has a duplicate game ID:", game_id)
+            sys.exit(1)
 
-# Delete the final game action for each game
-line_num = 0
-num_actions_deleted = 0
-for line in game_ids:
-    line_num += 1
-    if line == "":
-        continue
+        num_actions_to_delete_map[game_id] = num_actions_to_delete
 
-    line_array = line.split(",")
-    if len(line_array) != 2:
-        print("Line " + str(line_num) + " is invalid:", line)
-        sys.exit(1)
-    game_id = line_array[0]
-    num_actions_to_delete = line_array[1]
+if len(num_actions_to_delete_map) == 0:
+    print('There are no game IDs in the "' + game_ids_file + '" file.')
+    sys.exit(1)
 
-    cursor = conn.cursor()
-    cursor.execute("SELECT MAX(turn) FROM game_actions WHERE game_id = %s", (game_id,))
-    row = cursor.fetchone()
-    cursor.close()
-    max_turn = row[0]
+# Connect to the PostgreSQL database
+conn = database.connect()
 
-    for i in range(0, int(num_actions_to_delete)):
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM game_actions WHERE game_id = %s AND turn = %s",
-            (game_id, max_turn),
-        )
-        cursor.close()
-        num_actions_deleted += 1
+# Stage the input in a temporary table with a single "COPY" instead of one query per game
+cursor = conn.cursor()
+cursor.execute("""
+    CREATE TEMPORARY TABLE actions_to_delete (
+        game_id      INTEGER  NOT NULL  PRIMARY KEY,
+        num_actions  INTEGER  NOT NULL
+    ) ON COMMIT DROP
+    """)
+database.copy_rows(
+    cursor,
+    "actions_to_delete",
+    ["game_id", "num_actions"],
+    num_actions_to_delete_map.items(),
+)
+cursor.execute("ANALYZE actions_to_delete")
 
-        max_turn -= 1
+# Verify that every game in the input actually exists
+cursor.execute("""
+    SELECT actions_to_delete.game_id
+    FROM actions_to_delete
+    LEFT JOIN games ON games.id = actions_to_delete.game_id
+    WHERE games.id IS NULL
+    ORDER BY actions_to_delete.game_id
+    """)
+missing_game_ids = [row[0] for row in cursor]
+if len(missing_game_ids) > 0:
+    for game_id in missing_game_ids:
+        print("Game " + str(game_id) + " does not exist in the database.")
+    cursor.close()
+    conn.rollback()
+    conn.close()
+    sys.exit(1)
 
+# Delete the final N actions of every game with one statement
+# The window function numbers each game's actions from the last turn backwards,
+# which uses the "game_actions (game_id, turn)" primary key
+cursor.execute("""
+    WITH ranked_actions AS (
+        SELECT
+            game_actions.game_id,
+            game_actions.turn,
+            ROW_NUMBER() OVER (
+                PARTITION BY game_actions.game_id
+                ORDER BY game_actions.turn DESC
+            ) AS position
+        FROM game_actions
+        JOIN actions_to_delete ON actions_to_delete.game_id = game_actions.game_id
+    ),
+    deleted_actions AS (
+        DELETE FROM game_actions
+        USING ranked_actions, actions_to_delete
+        WHERE game_actions.game_id = ranked_actions.game_id
+            AND game_actions.turn = ranked_actions.turn
+            AND actions_to_delete.game_id = ranked_actions.game_id
+            AND ranked_actions.position <= actions_to_delete.num_actions
+        RETURNING game_actions.game_id
+    )
+    SELECT game_id, COUNT(*) FROM deleted_actions GROUP BY game_id
+    """)
+num_deleted_actions_map = {}
+for [game_id, num_deleted_actions] in cursor:
+    num_deleted_actions_map[game_id] = num_deleted_actions
+cursor.close()
 conn.commit()
 conn.close()
 
-print("Total pruned games:", len(game_ids))
+# Report the results for each game
+num_actions_deleted = 0
+num_short_games = 0
+for [game_id, num_actions_to_delete] in sorted(num_actions_to_delete_map.items()):
+    num_deleted_actions = num_deleted_actions_map.get(game_id, 0)
+    num_actions_deleted += num_deleted_actions
+    message = (
+        "Game "
+        + str(game_id)
+        + ": deleted "
+        + str(num_deleted_actions)
+        + " / "
+        + str(num_actions_to_delete)
+        + " actions"
+    )
+    if num_deleted_actions < num_actions_to_delete:
+        # The game had fewer actions than requested, so all of them were deleted
+        num_short_games += 1
+        message += " (the game did not have enough actions)"
+    print(message)
+
+print("Total pruned games:", len(num_actions_to_delete_map))
 print("Total actions deleted:", num_actions_deleted)
+if num_short_games > 0:
+    print("Total games with fewer actions than requested:", num_short_games)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+
+# This script dumps every table of "install/database_schema.sql" into a directory that the
+# "restore_db.py" script can load (it replaces the "dump_single_table.sh" script)
+# The tables are streamed with "COPY ... TO STDOUT" through gzip by a pool of threads, each on its
+# own pooled connection; the big tables are split into key ranges, so that they are dumped (and
+# later restored) in parallel as well
+# Every connection reads from the same exported snapshot (like "pg_dump --jobs"), so the dump is
+# consistent even though the tables are read at different times
+#
+# The directory has one compressed file in the "COPY" text format per table (or per key range) and
+# a "manifest.json" file with the columns, the number of rows, and the files of every table
+# The manifest is written last, so an interrupted dump is never restored by mistake
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import concurrent.futures
+import gzip
+import json
+import os
+import re
+import time
+import database
+
+# Constants
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+SCHEMA_PATH = os.path.join(DIR_PATH, "..", "..", "install", "database_schema.sql")
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+FILE_SUFFIX = ".copy.gz"
+# The tables that are split into key ranges, and the column to split them by
+CHUNKED_TABLES = {
+    "game_actions": "game_id",
+}
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNKS = 16
+# Level 1 is the fastest, which is what we want when the network or the disk is the bottleneck
+DEFAULT_COMPRESS_LEVEL = 1
+COMMENT_REGEX = re.compile(r"/\*.*?\*/", re.DOTALL)
+CREATE_TABLE_REGEX = re.compile(r"^CREATE TABLE (\w+)", re.IGNORECASE)
+CREATE_INDEX_REGEX = re.compile(r"^CREATE (UNIQUE )?INDEX", re.IGNORECASE)
+SERIAL_REGEX = re.compile(r"^\s*(\w+)\s+SERIAL\b", re.IGNORECASE | re.MULTILINE)
+# e.g. "FOREIGN KEY (user_id) REFERENCES users (id)" or "CONSTRAINT name UNIQUE (a, b)"
+TABLE_CONSTRAINT_REGEX = re.compile(
+    r"^(CONSTRAINT\s+\w+\s+)?(PRIMARY\s+KEY|UNIQUE|FOREIGN\s+KEY)\b", re.IGNORECASE
+)
+# e.g. "id SERIAL PRIMARY KEY" or "username TEXT NOT NULL UNIQUE"
+COLUMN_CONSTRAINT_REGEX = re.compile(r"\s+(PRIMARY\s+KEY|UNIQUE)\b", re.IGNORECASE)
+
+
+# Parse the schema file into:
+# - the statements that create the tables, without any of their keys
+# - the statements that create the indexes, the primary keys, and the unique constraints
+# - the statements that add the foreign keys, which need the keys that they reference
+# - the tables, as "{name, serial_columns}"
+# Everything but the tables is run after the data is loaded, so that the indexes are built once
+# instead of row by row, and so that the tables can be loaded in any order
+def read_schema():
+    with open(SCHEMA_PATH, "r") as schema_file:
+        schema = COMMENT_REGEX.sub("", schema_file.read())
+
+    table_statements = []
+    index_statements = []
+    foreign_key_statements = []
+    tables = []
+    for statement in schema.split(";"):
+        statement = statement.strip()
+        if statement == "":
+            continue
+        if CREATE_INDEX_REGEX.match(statement):
+            index_statements.append(statement)
+            continue
+
+        match = CREATE_TABLE_REGEX.match(statement)
+        if not match:
+            table_statements.append(statement)
+            continue
+
+        name = match.group(1)
+        columns = []
+        for element in split_table_elements(statement):
+            # The whitespace of the schema is only for alignment
+            element = " ".join(element.split())
+            constraint_match = TABLE_CONSTRAINT_REGEX.match(element)
+            if constraint_match:
+                constraint_statement = "ALTER TABLE " + name + " ADD " + element
+                if constraint_match.group(2).upper().startswith("FOREIGN"):
+                    foreign_key_statements.append(constraint_statement)
+                else:
+                    index_statements.append(constraint_statement)
+                continue
+
+            column_name = element.split()[0]
+            for constraint in COLUMN_CONSTRAINT_REGEX.findall(element):
+                index_statements.append(
+                    "ALTER TABLE "
+                    + name
+                    + " ADD "
+                    + constraint.upper()
+                    + " ("
+                    + column_name
+                    + ")"
+                )
+            columns.append(COLUMN_CONSTRAINT_REGEX.sub("", element))
+
+        table_statements.append(
+            "CREATE TABLE " + name + " (\n    " + ",\n    ".join(columns) + "\n)"
+        )
+        tables.append(
+            {
+                "name": name,
+                "serial_columns": SERIAL_REGEX.findall(statement),
+            }
+        )
+
+    return table_statements, index_statements, foreign_key_statements, tables
+
+
+# Returns the columns and the constraints of a "CREATE TABLE" statement
+# They are separated by the commas that are not inside of parentheses (e.g. "UNIQUE (a, b)")
+def split_table_elements(statement):
+    body = statement[statement.index("(") + 1 : statement.rindex(")")]
+    elements = []
+    depth = 0
+    start = 0
+    for [i, character] in enumerate(body):
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif character == "," and depth == 0:
+            elements.append(body[start:i])
+            start = i + 1
+    elements.append(body[start:])
+
+    return [element for element in elements if element.strip() != ""]
+
+
+def main():
+    args = parse_args()
+
+    if not os.path.exists(args.dump_dir):
+        os.makedirs(args.dump_dir)
+    if os.path.exists(os.path.join(args.dump_dir, MANIFEST_FILE_NAME)):
+        print("There is already a dump in: " + args.dump_dir)
+        sys.exit(1)
+
+    dump(args.dump_dir, args.workers, args.chunks, args.compress_level)
+
+
+# Dump every table of the schema into "dump_dir"
+# "transforms" maps a table to a function that is called with every row (as a dictionary of column
+# names to values) and returns the row to write instead
+# The tables in "dropped_tables" are left empty
+def dump(
+    dump_dir,
+    num_workers,
+    num_chunks,
+    compress_level,
+    transforms=None,
+    dropped_tables=(),
+):
+    if transforms is None:
+        transforms = {}
+    start_time = time.monotonic()
+    [_, _, _, tables] = read_schema()
+    database.get_pool(num_workers + 1)
+
+    # The snapshot is only valid while the transaction that exported it is open
+    snapshot_conn = database.connect()
+    cursor = snapshot_conn.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cursor.execute("SELECT pg_export_snapshot(), NOW()")
+    [snapshot, snapshot_time] = cursor.fetchone()
+    print("Dumping from snapshot " + snapshot + ".", flush=True)
+
+    tasks = []
+    for table in tables:
+        table["columns"] = get_columns(cursor, table["name"])
+        if table["name"] in dropped_tables:
+            continue
+        key_column = CHUNKED_TABLES.get(table["name"])
+        if key_column is None:
+            tasks.append([table, None, None, None])
+            continue
+        key_ranges = get_key_ranges(cursor, table["name"], key_column, num_chunks)
+        for [i, key_range] in enumerate(key_ranges):
+            tasks.append([table, key_column, key_range, i])
+
+    table_files = {table["name"]: [] for table in tables}
+    stats = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = {}
+        for [table, key_column, key_range, chunk] in tasks:
+            future = executor.submit(
+                dump_file,
+                dump_dir,
+                snapshot,
+                table,
+                key_column,
+                key_range,
+                chunk,
+                compress_level,
+                transforms.get(table["name"]),
+            )
+            futures[future] = table["name"]
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            [file_entry, file_start_time, file_end_time] = future.result()
+            table_files[name].append(file_entry)
+            add_stats(stats, name, file_entry, file_start_time, file_end_time)
+            print(
+                "Dumped "
+                + file_entry["file"]
+                + " ("
+                + str(file_entry["rows"])
+                + " rows)",
+                flush=True,
+            )
+
+    cursor.close()
+    snapshot_conn.rollback()
+    snapshot_conn.close()
+    database.close_pool()
+
+    for table in tables:
+        table["files"] = sorted(table_files[table["name"]], key=lambda f: f["file"])
+    write_manifest(
+        os.path.join(dump_dir, MANIFEST_FILE_NAME),
+        {
+            "version": MANIFEST_VERSION,
+            "snapshot_time": snapshot_time.isoformat(),
+            "tables": tables,
+        },
+    )
+
+    print_stats(stats, [table["name"] for table in tables])
+    print("Total rows:", sum(table_stats["rows"] for table_stats in stats.values()))
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Dump every table of the database in parallel."
+    )
+    parser.add_argument("dump_dir", help="the directory to write the dump to")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="the number of files to dump at the same time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        default=DEFAULT_CHUNKS,
+        help="the number of key ranges to split the big tables into (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        default=DEFAULT_COMPRESS_LEVEL,
+        help="the gzip compression level, from 1 to 9 (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0 or args.chunks <= 0:
+        print("The number of workers and chunks must be positive numbers.")
+        sys.exit(1)
+    if args.compress_level < 1 or args.compress_level > 9:
+        print("The compression level must be between 1 and 9.")
+        sys.exit(1)
+
+    return args
+
+
+# The columns are listed explicitly, so that a dump can be restored even if the columns of the
+# production database are not in the same order as in the schema file
+def get_columns(cursor, table):
+    cursor.execute(
+        """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (table,),
+    )
+    columns = [row[0] for row in cursor.fetchall()]
+    if len(columns) == 0:
+        print('The "' + table + '" table does not exist in the database.')
+        sys.exit(1)
+    return columns
+
+
+# Like "database.get_key_ranges()", but inside of the snapshot
+def get_key_ranges(cursor, table, column, num_ranges):
+    cursor.execute("SELECT MIN(" + column + "), MAX(" + column + ") FROM " + table)
+    [min_key, max_key] = cursor.fetchone()
+    if min_key is None:
+        return [(None, None)]
+
+    span = max_key - min_key + 1
+    num_ranges = max(1, min(num_ranges, span))
+    key_ranges = []
+    for i in range(num_ranges):
+        low = min_key + span * i // num_ranges
+        high = min_key + span * (i + 1) // num_ranges
+        key_ranges.append((low, high))
+    return key_ranges
+
+
+# A file-like object that passes the "COPY" data through while counting the bytes and the rows
+# (every row ends with exactly one newline in the text format)
+class CountingWriter:
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.num_bytes = 0
+        self.num_rows = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.num_bytes += len(data)
+        self.num_rows += data.count(b"\n")
+        return self.output_file.write(data)
+
+
+def get_file_name(table, chunk):
+    if chunk is None:
+        return table + FILE_SUFFIX
+    return table + "." + str(chunk).zfill(4) + FILE_SUFFIX
+
+
+# Returns the manifest entry of the file, and when the dump of the file started and ended
+def dump_file(
+    dump_dir, snapshot, table, key_column, key_range, chunk, compress_level, transform
+):
+    start_time = time.monotonic()
+    file_name = get_file_name(table["name"], chunk)
+    query = "SELECT " + ", ".join(table["columns"]) + " FROM " + table["name"]
+    params = None
+    if key_range is not None and key_range[0] is not None:
+        query += " WHERE " + key_column + " >= %s AND " + key_column + " < %s"
+        params = key_range
+
+    with database.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+
+        path = os.path.join(dump_dir, file_name)
+        temp_path = path + ".tmp"
+        with gzip.open(temp_path, "wb", compresslevel=compress_level) as output_file:
+            writer = CountingWriter(output_file)
+            if transform is None:
+                database.copy_query_to(cursor, query, writer, params)
+            else:
+                database.copy_query_rows(
+                    cursor,
+                    query,
+                    lambda fields: write_transformed_row(
+                        writer, table["columns"], transform, fields
+                    ),
+                    params,
+                )
+        os.replace(temp_path, path)
+
+        cursor.close()
+        conn.rollback()
+
+    file_entry = {
+        "file": file_name,
+        "rows": writer.num_rows,
+        "bytes": writer.num_bytes,
+    }
+    return file_entry, start_time, time.monotonic()
+
+
+def write_transformed_row(writer, columns, transform, fields):
+    row = {}
+    for [column, field] in zip(columns, fields):
+        row[column] = database.decode_copy_field(field)
+    row = transform(row)
+    writer.write(database.encode_copy_row([row[column] for column in columns]))
+
+
+# Add a file to the throughput of its table
+# The files of a table run in parallel, so the time of a table is from the start of its first file
+# to the end of its last file
+def add_stats(stats, table, file_entry, start_time, end_time):
+    table_stats = stats.setdefault(
+        table, {"rows": 0, "bytes": 0, "start": start_time, "end": end_time}
+    )
+    table_stats["rows"] += file_entry["rows"]
+    table_stats["bytes"] += file_entry["bytes"]
+    table_stats["start"] = min(table_stats["start"], start_time)
+    table_stats["end"] = max(table_stats["end"], end_time)
+
+
+def print_stats(stats, tables):
+    for table in tables:
+        if table not in stats:
+            continue
+        table_stats = stats[table]
+        elapsed = max(table_stats["end"] - table_stats["start"], 0.001)
+        print(
+            "  "
+            + table
+            + ": "
+            + str(table_stats["rows"])
+            + " rows, "
+            + "{:.1f}".format(table_stats["bytes"] / 1000000)
+            + " MB in "
+            + "{:.2f}".format(elapsed)
+            + " seconds ("
+            + "{:.0f}".format(table_stats["rows"] / elapsed)
+            + " rows/sec, "
+            + "{:.1f}".format(table_stats["bytes"] / 1000000 / elapsed)
+            + " MB/sec)"
+        )
+
+
+def read_manifest(dump_dir):
+    manifest_path = os.path.join(dump_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        print("There is no complete dump in: " + dump_dir)
+        sys.exit(1)
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get("version") != MANIFEST_VERSION:
+        print("The dump in " + dump_dir + " is in an unknown format.")
+        sys.exit(1)
+    return manifest
+
+
+def write_manifest(path, manifest):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", newline="\n") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+        manifest_file.write("\n")
+    os.replace(temp_path, path)
+
+
+if __name__ == "__main__":
+    main()
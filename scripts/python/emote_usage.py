@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+
+# This script counts how often every emote (from "data/emotes.json") and every emoji (from
+# "data/emojis.json") is used in the "chat_log" table, per month and per type of room, so that we
+# know which ones are worth preloading and which ones can be dropped
+#
+# Every name is added to a single Aho-Corasick automaton, so every message is scanned once,
+# regardless of the number of emotes (instead of once per emote like the client does)
+# The matching follows the client:
+# - An emote is case-sensitive and must be a whole word (like the "\b" in "fillTwitchEmotes()")
+# - An emoji is either the character itself (the client replaces ":name:" before a message is
+#   sent) or the ":name:" tag
+# - When matches overlap, the longest match that starts first wins (e.g. "KappaPride" is not also
+#   counted as "Kappa")
+#
+# The table is split into key ranges that are streamed through server-side cursors by a pool of
+# workers, and the counts of every range are added together at the end
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import json
+import os
+import re
+import time
+import database
+
+# Constants
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+EMOTES_PATH = os.path.join(DIR_PATH, "..", "..", "data", "emotes.json")
+EMOJIS_PATH = os.path.join(DIR_PATH, "..", "..", "data", "emojis.json")
+# Split the table into more ranges than workers so that a slow range does not leave the other
+# workers idle at the end of the job
+RANGES_PER_WORKER = 4
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_TOP = 50
+WORD_CHARACTER_REGEX = re.compile(r"\w")
+ROOM_TYPES = ["lobby", "table", "discord"]
+
+# Variables
+# The automaton is built once per worker process
+worker_data = {}
+
+
+class AhoCorasick:
+    # "patterns" is a list of strings; a match reports the index of its pattern in the list
+    def __init__(self, patterns):
+        # The trie: the transitions of every state, the state to fall back to when there is no
+        # transition, and the patterns that end at every state (longest first)
+        self.transitions = [{}]
+        self.failures = [0]
+        self.outputs = [[]]
+        for [i, pattern] in enumerate(patterns):
+            state = 0
+            for character in pattern:
+                next_state = self.transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions.append({})
+                    self.failures.append(0)
+                    self.outputs.append([])
+                    self.transitions[state][character] = next_state
+                state = next_state
+            self.outputs[state].append(i)
+
+        # Compute the failure links in breadth-first order, so that the link of every shorter
+        # prefix is known first
+        queue = list(self.transitions[0].values())
+        position = 0
+        while position < len(queue):
+            state = queue[position]
+            position += 1
+            for [character, next_state] in self.transitions[state].items():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure != 0 and character not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                fallback = self.transitions[failure].get(character, 0)
+                self.failures[next_state] = fallback if fallback != next_state else 0
+                # The patterns that end at the failure state also end here
+                self.outputs[next_state] = (
+                    self.outputs[next_state] + self.outputs[self.failures[next_state]]
+                )
+
+    # Returns a list of "[start, end, pattern index]" for every match (including overlapping ones)
+    def find_all(self, text, pattern_lengths):
+        transitions = self.transitions
+        failures = self.failures
+        outputs = self.outputs
+        matches = []
+        state = 0
+        for [i, character] in enumerate(text):
+            while True:
+                next_state = transitions[state].get(character)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = failures[state]
+            for pattern_index in outputs[state]:
+                matches.append(
+                    [i + 1 - pattern_lengths[pattern_index], i + 1, pattern_index]
+                )
+
+        return matches
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    [names, _, _] = load_patterns()
+    conn = database.connect()
+    key_ranges = database.get_key_ranges(
+        conn, "chat_log", args.workers * RANGES_PER_WORKER
+    )
+    conn.close()
+    print(
+        "Counting "
+        + str(len(names))
+        + " emotes and emoji in "
+        + str(len(key_ranges))
+        + " key ranges of chat_log.",
+        flush=True,
+    )
+
+    totals = {}
+    num_ranges = 0
+    for [key_range, result] in database.run_key_ranges(
+        count_range, key_ranges, args.workers, (args.chunk_size,)
+    ):
+        database.combine_results(totals, result)
+        num_ranges += 1
+        elapsed = time.monotonic() - start_time
+        num_messages = totals.get("num_messages", 0)
+        print(
+            "Finished "
+            + str(num_ranges)
+            + " / "
+            + str(len(key_ranges))
+            + " key ranges, "
+            + str(num_messages)
+            + " messages ("
+            + "{:.0f}".format(num_messages / elapsed if elapsed > 0 else 0)
+            + " messages/sec)",
+            flush=True,
+        )
+
+    usage = get_usage(names, totals)
+    print_usage(usage, args.top)
+    if args.output is not None:
+        write_usage(args.output, usage, totals.get("num_messages", 0))
+        print("Wrote the usage of every emote and emoji to: " + args.output)
+
+    print("Total messages:", totals.get("num_messages", 0))
+    print("Total matches:", sum(entry["total"] for entry in usage.values()))
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+    num_errors = database.print_errors(totals)
+    if num_errors > 0:
+        print("Total failed key ranges:", num_errors)
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Count the usage of every emote and emoji in the chat."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="the number of key ranges to process in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="the number of messages to read at a time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=DEFAULT_TOP,
+        help="the number of the most used emotes to print (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        help="write the usage of every emote and emoji to this JSON file",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0 or args.chunk_size <= 0:
+        print("The number of workers and the chunk size must be positive numbers.")
+        sys.exit(1)
+    if args.top < 0:
+        print("The number of emotes to print cannot be negative.")
+        sys.exit(1)
+
+    return args
+
+
+# Returns the names (as "[kind, category, name]"), the patterns, and the index of the name of
+# every pattern
+def load_patterns():
+    with open(EMOTES_PATH, "r") as emotes_file:
+        emote_categories = json.load(emotes_file)
+    with open(EMOJIS_PATH, "r") as emojis_file:
+        emojis = json.load(emojis_file)
+
+    names = []
+    patterns = []
+    pattern_names = []
+    seen_patterns = set()
+
+    def add_pattern(pattern):
+        # If two emoji are the same character, the first name gets the matches
+        if pattern in seen_patterns:
+            return
+        seen_patterns.add(pattern)
+        patterns.append(pattern)
+        pattern_names.append(len(names) - 1)
+
+    for [category, emotes] in emote_categories.items():
+        for emote in emotes:
+            names.append(["emote", category, emote])
+            add_pattern(emote)
+    for [emoji_name, emoji] in emojis.items():
+        names.append(["emoji", "emoji", emoji_name])
+        add_pattern(emoji)
+        add_pattern(":" + emoji_name + ":")
+
+    return names, patterns, pattern_names
+
+
+def get_worker_data():
+    if "automaton" not in worker_data:
+        [names, patterns, pattern_names] = load_patterns()
+        worker_data["names"] = names
+        worker_data["pattern_names"] = pattern_names
+        worker_data["pattern_lengths"] = [len(pattern) for pattern in patterns]
+        # Only the emotes need to be whole words
+        worker_data["checks_boundaries"] = [
+            names[pattern_names[i]][0] == "emote" for i in range(len(patterns))
+        ]
+        worker_data["automaton"] = AhoCorasick(patterns)
+
+    return worker_data
+
+
+# Returns the index of the name of every emote or emoji in a message
+def find_names(message, data):
+    matches = data["automaton"].find_all(message, data["pattern_lengths"])
+    if len(matches) == 0:
+        return []
+
+    # Keep the longest match that starts first, and skip the matches that overlap it
+    matches.sort(key=lambda match: (match[0], -match[1]))
+    name_indexes = []
+    end = 0
+    for [match_start, match_end, pattern_index] in matches:
+        if match_start < end:
+            continue
+        if data["checks_boundaries"][pattern_index] and not is_whole_word(
+            message, match_start, match_end
+        ):
+            continue
+        name_indexes.append(data["pattern_names"][pattern_index])
+        end = match_end
+
+    return name_indexes
+
+
+# Like "\b" in a JavaScript regular expression, an edge of the match that is a word character must
+# not be next to another word character
+def is_whole_word(message, start, end):
+    if (
+        start > 0
+        and WORD_CHARACTER_REGEX.match(message[start])
+        and WORD_CHARACTER_REGEX.match(message[start - 1])
+    ):
+        return False
+    if (
+        end < len(message)
+        and WORD_CHARACTER_REGEX.match(message[end - 1])
+        and WORD_CHARACTER_REGEX.match(message[end])
+    ):
+        return False
+    return True
+
+
+# Count the emotes of the messages with an ID in the range of [low, high) on a dedicated connection
+# Returns the counts keyed by "(name index, month, room type)"
+def count_range(low, high, chunk_size):
+    data = get_worker_data()
+    conn = database.connect()
+    cursor = conn.cursor()
+    # The months are in UTC, regardless of the time zone of the server
+    cursor.execute("SET TIME ZONE 'UTC'")
+    cursor.close()
+
+    counts = {"num_messages": 0}
+    for [month, room_type, message] in database.stream(
+        conn,
+        """
+        SELECT
+            TO_CHAR(datetime_sent, 'YYYY-MM'),
+            CASE
+                WHEN user_id = 0 AND discord_name IS NOT NULL THEN 'discord'
+                WHEN room = 'lobby' THEN 'lobby'
+                ELSE 'table'
+            END,
+            message
+        FROM chat_log
+        WHERE id >= %s AND id < %s
+        """,
+        (low, high),
+        chunk_size,
+    ):
+        counts["num_messages"] += 1
+        for name_index in find_names(message, data):
+            key = (name_index, month, room_type)
+            counts[key] = counts.get(key, 0) + 1
+
+    conn.rollback()
+    conn.close()
+    return counts
+
+
+# Returns the usage of every name, including the ones that were never used
+def get_usage(names, totals):
+    usage = {}
+    for [kind, category, name] in names:
+        usage[kind + "/" + name] = {
+            "kind": kind,
+            "category": category,
+            "name": name,
+            "total": 0,
+            "months": {},
+            "rooms": {room_type: 0 for room_type in ROOM_TYPES},
+        }
+
+    for [key, count] in totals.items():
+        if not isinstance(key, tuple):
+            continue
+        [name_index, month, room_type] = key
+        [kind, _, name] = names[name_index]
+        entry = usage[kind + "/" + name]
+        entry["total"] += count
+        entry["months"][month] = entry["months"].get(month, 0) + count
+        entry["rooms"][room_type] += count
+
+    return usage
+
+
+def print_usage(usage, top):
+    entries = sorted(usage.values(), key=lambda entry: -entry["total"])
+    if top > 0:
+        print("Most used:")
+        for entry in entries[:top]:
+            if entry["total"] == 0:
+                break
+            print(
+                "  "
+                + entry["name"]
+                + " ("
+                + entry["category"]
+                + "): "
+                + str(entry["total"])
+                + " ("
+                + ", ".join(
+                    room_type + ": " + str(entry["rooms"][room_type])
+                    for room_type in ROOM_TYPES
+                )
+                + ")"
+            )
+
+    for kind in ["emote", "emoji"]:
+        num_unused = sum(
+            1 for entry in entries if entry["kind"] == kind and entry["total"] == 0
+        )
+        num_total = sum(1 for entry in entries if entry["kind"] == kind)
+        print("Never used " + kind + "s: " + str(num_unused) + " / " + str(num_total))
+
+
+def write_usage(path, usage, num_messages):
+    entries = sorted(
+        usage.values(),
+        key=lambda entry: (-entry["total"], entry["kind"], entry["name"]),
+    )
+    for entry in entries:
+        entry["months"] = dict(sorted(entry["months"].items()))
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", newline="\n") as usage_file:
+        json.dump(
+            {"num_messages": num_messages, "usage": entries},
+            usage_file,
+            ensure_ascii=False,
+            indent=2,
+        )
+        usage_file.write("\n")
+    os.replace(temporary_path, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+
+# This script packs every emote into a few sprite sheets (texture atlases), so that the client can
+# download them with a few requests instead of one request per emote
+# - The emotes are the ones listed in "data/emotes.json" (plus the hard-coded "<3" and "D:" emotes
+#   from "chat.ts"), with the images from the "public/img/emotes" directory
+# - Identical images are only stored once (by the hash of their pixels)
+# - The images are packed into shelves (rows) of sheets that are "SHEET_WIDTH" pixels wide, from
+#   the tallest image to the shortest
+# - The sheets are written to the "public/img/emotes/atlas" directory and the position of every
+#   emote is written to "data/emotes_atlas.json" as "name: [sheet index, x, y, width, height]"
+#
+# The layout is saved in a cache file, so that the next run only has to place the new images and
+# redraw the sheets that changed; the images that were removed leave a hole in their sheet until
+# too much of the sheets is wasted, at which point everything is packed again from scratch
+#
+# The sheets and the index are not committed to the repository; they are generated by
+# "client/build_client.sh" (when Pillow is installed), and the chat does not load emotes from
+# them yet
+#
+# This script requires Pillow, which is not needed by the other scripts:
+#   pip install Pillow
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import hashlib
+import json
+import os
+import time
+
+# Constants
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+REPOSITORY_PATH = os.path.join(DIR_PATH, "..", "..", "..")
+EMOTES_JSON_PATH = os.path.join(REPOSITORY_PATH, "data", "emotes.json")
+EMOTES_ATLAS_JSON_PATH = os.path.join(REPOSITORY_PATH, "data", "emotes_atlas.json")
+EMOTES_PATH = os.path.join(REPOSITORY_PATH, "public", "img", "emotes")
+ATLAS_DIRECTORY = "atlas"
+DEFAULT_CACHE_PATH = os.path.join(DIR_PATH, ".build_emote_atlas_cache.json")
+CACHE_VERSION = 1
+# These emotes are not in "emotes.json" because they are parsed separately in "chat.ts"
+EXTRA_EMOTES = [
+    ["<3", os.path.join("other", "3.png")],
+    ["D:", os.path.join("other", "D.png")],
+]
+SHEET_WIDTH = 1024
+MAX_SHEET_HEIGHT = 1024
+# The empty space around every image, so that the neighboring images do not bleed into each other
+# when the emotes are scaled
+PADDING = 1
+# Pack everything again when the holes left by the removed images are bigger than this fraction
+# of the area of the current images
+MAX_WASTED_AREA = 0.25
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    # Pillow is only required by this script
+    try:
+        import PIL.Image
+    except ImportError:
+        print('This script requires Pillow. (Install it with "pip install Pillow".)')
+        sys.exit(1)
+
+    emotes = read_emotes()
+    cache = read_cache(args.cache, args.full)
+
+    # Hash the pixels of every image (reusing the hashes of the files that did not change)
+    images = {}
+    emote_hashes = {}
+    file_hashes = {}
+    missing_emotes = []
+    for [emote_name, relative_path] in emotes:
+        path = os.path.join(EMOTES_PATH, relative_path)
+        if not os.path.exists(path):
+            # The emote is left out of the index, so the client will not find it in a sheet
+            print(
+                'Warning: The emote of "'
+                + emote_name
+                + '" does not have an image at: '
+                + path
+            )
+            missing_emotes.append(emote_name)
+            continue
+        [image_hash, width, height] = get_image_hash(
+            PIL.Image, path, cache["files"], file_hashes
+        )
+        emote_hashes[emote_name] = image_hash
+        if image_hash not in images:
+            images[image_hash] = [width, height, path]
+    cache["files"] = file_hashes
+    emotes = [emote for emote in emotes if emote[0] not in missing_emotes]
+
+    # Update the layout
+    [layout, changed_sheets, repacked] = update_layout(cache["layout"], images)
+    cache["layout"] = layout
+
+    # Redraw the sheets that changed
+    atlas_path = os.path.join(EMOTES_PATH, ATLAS_DIRECTORY)
+    os.makedirs(atlas_path, exist_ok=True)
+    sheet_names = []
+    for [sheet_index, sheet] in enumerate(layout["sheets"]):
+        sheet_name = get_sheet_name(sheet_index)
+        sheet_names.append(sheet_name)
+        sheet_path = os.path.join(atlas_path, sheet_name)
+        if sheet_index in changed_sheets or not os.path.exists(sheet_path):
+            draw_sheet(
+                PIL.Image, sheet_path, sheet_index, sheet, layout["placements"], images
+            )
+    remove_old_sheets(atlas_path, sheet_names)
+
+    # Write the index
+    sheets = []
+    for sheet_name in sheet_names:
+        with open(os.path.join(atlas_path, sheet_name), "rb") as sheet_file:
+            sheet_hash = hashlib.sha256(sheet_file.read()).hexdigest()[:16]
+        sheets.append({"file": sheet_name, "hash": sheet_hash})
+    index_changed = write_if_changed(
+        EMOTES_ATLAS_JSON_PATH,
+        encode_index(emotes, emote_hashes, layout["placements"], sheets),
+    )
+    write_cache(args.cache, cache)
+
+    print(
+        "Packed "
+        + str(len(emotes))
+        + " emotes ("
+        + str(len(images))
+        + " unique images) into "
+        + str(len(sheet_names))
+        + " sheets."
+    )
+    if repacked:
+        print("Every image was packed again.")
+    print("Sheets redrawn: " + str(len(changed_sheets)))
+    if index_changed:
+        print('Wrote "' + EMOTES_ATLAS_JSON_PATH + '".')
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pack the emotes into sprite sheets.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="ignore the cache and pack every image again",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help="the path of the cache of the previous layout (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+# Returns a list of "[emote name, path relative to the emotes directory]"
+def read_emotes():
+    with open(EMOTES_JSON_PATH, "r") as emotes_file:
+        categories = json.load(emotes_file)
+
+    emotes = []
+    for [category, emote_names] in categories.items():
+        for emote_name in emote_names:
+            emotes.append([emote_name, os.path.join(category, emote_name + ".png")])
+
+    return emotes + EXTRA_EMOTES
+
+
+def read_cache(path, full):
+    empty_cache = {
+        "version": CACHE_VERSION,
+        "files": {},
+        "layout": {"sheets": [], "placements": {}, "removed_area": 0},
+    }
+    if full or not os.path.exists(path):
+        return empty_cache
+
+    with open(path, "r") as cache_file:
+        cache = json.load(cache_file)
+    if cache.get("version") != CACHE_VERSION:
+        return empty_cache
+
+    return cache
+
+
+def write_cache(path, cache):
+    with open(path, "w", newline="\n") as cache_file:
+        json.dump(cache, cache_file, separators=(",", ":"), sort_keys=True)
+
+
+# Returns "[hash, width, height]" of an image, where the hash is of the pixels, so that the same
+# image saved differently is only stored once
+# Every file is added to "file_hashes" as "[modification time, file size, hash, width, height]",
+# so that the files that did not change do not have to be decoded again
+def get_image_hash(image_module, path, cached_files, file_hashes):
+    key = os.path.relpath(path, EMOTES_PATH).replace(os.sep, "/")
+    stat = os.stat(path)
+    cached_file = cached_files.get(key)
+    if (
+        cached_file is not None
+        and cached_file[0] == stat.st_mtime_ns
+        and cached_file[1] == stat.st_size
+    ):
+        file_hashes[key] = cached_file
+        return cached_file[2:]
+
+    with image_module.open(path) as image:
+        image = image.convert("RGBA")
+        [width, height] = image.size
+        image_hash = hashlib.sha256(
+            str(width).encode("ascii")
+            + b"x"
+            + str(height).encode("ascii")
+            + b":"
+            + image.tobytes()
+        ).hexdigest()
+
+    file_hashes[key] = [stat.st_mtime_ns, stat.st_size, image_hash, width, height]
+    return [image_hash, width, height]
+
+
+# Place every image in "images" (a map of hash to "[width, height, path]") in the layout
+# The existing placements are kept unless the holes left by the removed images get too big
+# Returns "[layout, the indexes of the sheets that changed, whether everything was packed again]"
+def update_layout(layout, images):
+    placements = {}
+    removed_sheets = set()
+    removed_area = layout.get("removed_area", 0)
+    for [image_hash, placement] in layout["placements"].items():
+        if image_hash in images:
+            placements[image_hash] = placement
+        else:
+            removed_sheets.add(placement[0])
+            removed_area += get_padded_area(placement[3], placement[4])
+    sheets = layout["sheets"]
+    new_hashes = [image_hash for image_hash in images if image_hash not in placements]
+
+    used_area = sum(get_padded_area(*images[image_hash][:2]) for image_hash in images)
+    repacked = removed_area > MAX_WASTED_AREA * used_area
+    if repacked:
+        placements = {}
+        sheets = []
+        removed_area = 0
+        new_hashes = list(images.keys())
+
+    # Place the tallest images first, so that the shelves are filled evenly
+    new_hashes.sort(key=lambda image_hash: (-images[image_hash][1], image_hash))
+    changed_sheets = set() if repacked else removed_sheets
+    for image_hash in new_hashes:
+        [width, height, _] = images[image_hash]
+        sheet_index = place_image(sheets, placements, image_hash, width, height)
+        changed_sheets.add(sheet_index)
+    if repacked:
+        changed_sheets = set(range(len(sheets)))
+
+    layout = {"sheets": sheets, "placements": placements, "removed_area": removed_area}
+    return [layout, changed_sheets, repacked]
+
+
+def get_padded_area(width, height):
+    return (width + 2 * PADDING) * (height + 2 * PADDING)
+
+
+# Put the image on the first shelf where it fits, or on a new shelf, or on a new sheet
+# Every sheet is "{height, shelves: [[y, height, used width]]}"
+# Returns the index of the sheet
+def place_image(sheets, placements, image_hash, width, height):
+    padded_width = width + 2 * PADDING
+    padded_height = height + 2 * PADDING
+    if padded_width > SHEET_WIDTH or padded_height > MAX_SHEET_HEIGHT:
+        raise ValueError(
+            "An image of "
+            + str(width)
+            + "x"
+            + str(height)
+            + " does not fit in a sheet."
+        )
+
+    for [sheet_index, sheet] in enumerate(sheets):
+        for shelf in sheet["shelves"]:
+            [shelf_y, shelf_height, used_width] = shelf
+            if (
+                padded_height <= shelf_height
+                and used_width + padded_width <= SHEET_WIDTH
+            ):
+                shelf[2] += padded_width
+                placements[image_hash] = [
+                    sheet_index,
+                    used_width + PADDING,
+                    shelf_y + PADDING,
+                    width,
+                    height,
+                ]
+                return sheet_index
+
+        if sheet["height"] + padded_height <= MAX_SHEET_HEIGHT:
+            return add_shelf(sheet, sheet_index, placements, image_hash, width, height)
+
+    sheets.append({"height": 0, "shelves": []})
+    sheet_index = len(sheets) - 1
+    return add_shelf(
+        sheets[sheet_index], sheet_index, placements, image_hash, width, height
+    )
+
+
+def add_shelf(sheet, sheet_index, placements, image_hash, width, height):
+    padded_width = width + 2 * PADDING
+    padded_height = height + 2 * PADDING
+    shelf_y = sheet["height"]
+    sheet["shelves"].append([shelf_y, padded_height, padded_width])
+    sheet["height"] += padded_height
+    placements[image_hash] = [sheet_index, PADDING, shelf_y + PADDING, width, height]
+    return sheet_index
+
+
+def get_sheet_name(sheet_index):
+    return "sheet" + str(sheet_index) + ".png"
+
+
+def draw_sheet(image_module, path, sheet_index, sheet, placements, images):
+    sheet_image = image_module.new("RGBA", (SHEET_WIDTH, sheet["height"]))
+    for [image_hash, placement] in placements.items():
+        [placement_sheet_index, x, y, _, _] = placement
+        if placement_sheet_index != sheet_index:
+            continue
+        with image_module.open(images[image_hash][2]) as image:
+            sheet_image.paste(image.convert("RGBA"), (x, y))
+
+    # Write to a temporary file first so that the client never sees a partial sheet
+    temporary_path = path + ".tmp"
+    sheet_image.save(temporary_path, format="PNG", optimize=True)
+    os.replace(temporary_path, path)
+
+
+# Remove the sheets from a previous layout that had more sheets
+def remove_old_sheets(atlas_path, sheet_names):
+    for file_name in os.listdir(atlas_path):
+        if file_name.endswith(".png") and file_name not in sheet_names:
+            os.remove(os.path.join(atlas_path, file_name))
+
+
+# Returns the contents of the "emotes_atlas.json" file, with one emote per line
+def encode_index(emotes, emote_hashes, placements, sheets):
+    lines = []
+    for [emote_name, _] in emotes:
+        lines.append(
+            "    "
+            + json.dumps(emote_name)
+            + ": "
+            + json.dumps(placements[emote_hashes[emote_name]])
+        )
+
+    return (
+        "{\n"
+        + '  "sheets": '
+        + json.dumps(sheets)
+        + ",\n"
+        + '  "emotes": {\n'
+        + ",\n".join(lines)
+        + "\n  }\n}\n"
+    )
+
+
+# Returns whether the file was written
+def write_if_changed(path, contents):
+    if os.path.exists(path):
+        with open(path, "r") as existing_file:
+            if existing_file.read() == contents:
+                return False
+
+    with open(path, "w", newline="\n") as output_file:
+        output_file.write(contents)
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+# This script downloads the Twitch and BetterTTV emotes into the "public/img/emotes" directory
+# The lists of emotes are copy-pasted from the websites:
+# - "twitch.txt" is from the source code of: https://twitchemotes.com
+# - "betterttv.txt" is from: https://api.betterttv.net/emotes
+# Note that the "<3" Twitch emote must be added manually, and that the BetterTTV emotes with a
+# colon in the name (e.g. "D:") are skipped, because file names cannot have a colon on Windows
+#
+# The emotes are downloaded in parallel by a pool of threads, where every thread keeps its own
+# keep-alive session; each request has a timeout and is retried on connection errors and server
+# errors
+# The "ETag" and "Last-Modified" headers of every emote are stored in a manifest, so that the next
+# run only downloads the emotes that changed (with a conditional GET)
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import threading
+import time
+import requests
+import requests.adapters
+import urllib3.util.retry
+
+# Constants
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_OUTPUT_PATH = os.path.join(
+    DIR_PATH, "..", "..", "..", "public", "img", "emotes"
+)
+DEFAULT_MANIFEST_PATH = os.path.join(DIR_PATH, ".download_emotes_manifest.json")
+MANIFEST_VERSION = 1
+DEFAULT_WORKERS = 8
+# The timeouts are in seconds (to connect and then to read each chunk of the response)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+MAX_RETRIES = 3
+# The delay before the "n"th retry is "RETRY_BACKOFF * 2^(n - 1)" seconds
+RETRY_BACKOFF = 0.5
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# e.g. <div class="col-md-2"><center><a href="/emotes/354" class="emote-name"><img src="https://static-cdn.jtvnw.net/emoticons/v1/354/1.0" data-tooltip="<strong>4Head</strong>" data-regex="4Head" data-toggle="popover" data-image-id="354" class="emote expandable-emote" /><br /></a>4Head</center><br /></div>
+TWITCH_EMOTE_REGEX = re.compile(
+    r'<img src="(.+?)" data-tooltip="<strong>(.+?)</strong>"'
+)
+TWITCH_IGNORED_LINES = ["", '<div class="row">', "</div>"]
+
+# Variables
+thread_data = threading.local()
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    emotes = read_twitch_emotes(args.twitch_file) + read_betterttv_emotes(
+        args.betterttv_file
+    )
+    manifest = read_manifest(args.manifest)
+    print("Checking " + str(len(emotes)) + " emotes.", flush=True)
+
+    totals = {"downloaded": 0, "unchanged": 0, "failed": 0}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {}
+        for [source, name, url] in emotes:
+            path = os.path.join(args.output, source, name + ".png")
+            key = source + "/" + name
+            future = executor.submit(
+                download_emote, url, path, manifest["emotes"].get(key)
+            )
+            futures[future] = key
+
+        # The manifest is only updated from the main thread
+        for future in concurrent.futures.as_completed(futures):
+            key = futures[future]
+            try:
+                [status, entry] = future.result()
+            except Exception as e:
+                print("Failed to download " + key + ": " + str(e), flush=True)
+                totals["failed"] += 1
+                continue
+
+            totals[status] += 1
+            manifest["emotes"][key] = entry
+            if status == "downloaded":
+                print("Downloaded " + key, flush=True)
+
+    write_manifest(args.manifest, manifest)
+
+    print("Total downloaded:", totals["downloaded"])
+    print("Total unchanged:", totals["unchanged"])
+    print("Total failed:", totals["failed"])
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+    if totals["failed"] > 0:
+        # Only the emotes that failed will be downloaded again on the next run
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Download the Twitch and BetterTTV emotes."
+    )
+    parser.add_argument(
+        "--twitch-file",
+        default=os.path.join(DIR_PATH, "twitch.txt"),
+        help="the list of Twitch emotes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--betterttv-file",
+        default=os.path.join(DIR_PATH, "betterttv.txt"),
+        help="the list of BetterTTV emotes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT_PATH,
+        help="the directory to download the emotes to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=DEFAULT_MANIFEST_PATH,
+        help="the path of the manifest of the downloaded emotes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="the number of emotes to download at the same time (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0:
+        print("The number of workers must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+# Returns a list of "[source, name, url]"
+def read_twitch_emotes(path):
+    emotes = []
+    with open(path, "r") as emotes_file:
+        for line in emotes_file:
+            line = line.strip()
+            if line in TWITCH_IGNORED_LINES:
+                continue
+            match = TWITCH_EMOTE_REGEX.search(line)
+            if not match:
+                print("Failed to parse line: " + line)
+                sys.exit(1)
+            emotes.append(["twitch", match.group(2), match.group(1)])
+
+    return emotes
+
+
+# Returns a list of "[source, name, url]"
+def read_betterttv_emotes(path):
+    with open(path, "r") as emotes_file:
+        data = json.load(emotes_file)
+
+    emotes = []
+    for emote in data["emotes"]:
+        # e.g. {"url":"//cdn.betterttv.net/emote/54fa925e01e468494b85b54d/1x","width":28,"height":28,"imageType":"png","regex":"OhMyGoodness","channel":null}
+        name = emote["regex"]
+
+        # Skip animated gif emotes
+        if emote["imageType"] != "png":
+            continue
+
+        # Skip emotes with colons in the name, since file names cannot have colons in them
+        if ":" in name:
+            continue
+
+        emotes.append(["betterttv", name, "https:" + emote["url"]])
+
+    return emotes
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "emotes": {}}
+
+    with open(path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get("version") != MANIFEST_VERSION:
+        # Download everything again rather than trusting a manifest in an unknown format
+        return {"version": MANIFEST_VERSION, "emotes": {}}
+
+    return manifest
+
+
+def write_manifest(path, manifest):
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", newline="\n") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        manifest_file.write("\n")
+    os.replace(temporary_path, path)
+
+
+# Every thread has its own session, so that its connections are kept alive between emotes
+# ("requests.Session" is not guaranteed to be thread-safe)
+def get_session():
+    session = getattr(thread_data, "session", None)
+    if session is None:
+        retry = urllib3.util.retry.Retry(
+            total=MAX_RETRIES,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        thread_data.session = session
+
+    return session
+
+
+# Returns "[status, manifest entry]", where the status is either "downloaded" or "unchanged"
+def download_emote(url, path, entry):
+    # Only send a conditional request if the file from the previous download is still there
+    headers = {}
+    if entry is not None and entry["url"] == url and os.path.exists(path):
+        if entry.get("etag") is not None:
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified") is not None:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = get_session().get(
+        url,
+        headers=headers,
+        allow_redirects=True,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+    if response.status_code == 304:
+        return ["unchanged", entry]
+    response.raise_for_status()
+
+    # Write to a temporary file first so that an interrupted run never leaves a truncated emote
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as emote_file:
+        emote_file.write(response.content)
+    os.replace(temporary_path, path)
+
+    return [
+        "downloaded",
+        {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        },
+    ]
+
+
+if __name__ == "__main__":
+    main()
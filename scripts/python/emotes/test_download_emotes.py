@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+# The tests of the "download_emotes.py" script
+# The emotes are served by a local HTTP server (in a thread) that replays a list of responses for
+# every path and records the headers of every request
+#
+# Usage:
+#   python -m unittest test_download_emotes
+
+# Imports
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import download_emotes
+
+# Constants
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_DATA = PNG_SIGNATURE + b"first"
+NEW_PNG_DATA = PNG_SIGNATURE + b"second"
+ETAG = '"abc123"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append([self.path, dict(self.headers)])
+        responses = self.server.responses[self.path]
+        # The last response is repeated once the others are used up
+        [status, headers, body] = (
+            responses.pop(0) if len(responses) > 1 else responses[0]
+        )
+
+        self.send_response(status)
+        for [name, value] in headers.items():
+            self.send_header(name, value)
+        if "Content-Length" not in headers:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # A short body (compared to the "Content-Length" header) must not be kept alive
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloadEmoteTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.server.responses = {}
+        self.server.requests = []
+        self.server_thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.server_thread.start()
+        self.base_url = "http://127.0.0.1:" + str(self.server.server_address[1])
+
+        self.temporary_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temporary_dir, "twitch", "Kappa.png")
+
+        # Retry right away, and do not reuse a session (with its retry settings) from another test
+        self.original_backoff = download_emotes.RETRY_BACKOFF
+        download_emotes.RETRY_BACKOFF = 0
+        download_emotes.thread_data.session = None
+
+    def tearDown(self):
+        download_emotes.RETRY_BACKOFF = self.original_backoff
+        download_emotes.thread_data.session = None
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+        shutil.rmtree(self.temporary_dir)
+
+    def serve(self, path, responses):
+        self.server.responses[path] = responses
+        return self.base_url + path
+
+    def read_emote(self):
+        with open(self.path, "rb") as emote_file:
+            return emote_file.read()
+
+    def test_reuses_unchanged_emote(self):
+        url = self.serve(
+            "/Kappa.png",
+            [
+                [200, {"ETag": ETAG, "Last-Modified": LAST_MODIFIED}, PNG_DATA],
+                [304, {}, b""],
+            ],
+        )
+
+        [status, entry] = download_emotes.download_emote(url, self.path, None)
+        self.assertEqual(status, "downloaded")
+        self.assertEqual(
+            entry, {"url": url, "etag": ETAG, "last_modified": LAST_MODIFIED}
+        )
+        self.assertNotIn("If-None-Match", self.server.requests[0][1])
+
+        [status, new_entry] = download_emotes.download_emote(url, self.path, entry)
+        self.assertEqual(status, "unchanged")
+        self.assertEqual(new_entry, entry)
+        self.assertEqual(self.read_emote(), PNG_DATA)
+        [_, headers] = self.server.requests[1]
+        self.assertEqual(headers["If-None-Match"], ETAG)
+        self.assertEqual(headers["If-Modified-Since"], LAST_MODIFIED)
+
+    def test_downloads_missing_emote_again(self):
+        url = self.serve(
+            "/Kappa.png",
+            [[200, {"ETag": ETAG, "Last-Modified": LAST_MODIFIED}, PNG_DATA]],
+        )
+        [_, entry] = download_emotes.download_emote(url, self.path, None)
+        os.remove(self.path)
+
+        # The manifest entry is stale, so the request must not be conditional
+        [status, _] = download_emotes.download_emote(url, self.path, entry)
+        self.assertEqual(status, "downloaded")
+        self.assertEqual(self.read_emote(), PNG_DATA)
+        self.assertNotIn("If-None-Match", self.server.requests[1][1])
+        self.assertNotIn("If-Modified-Since", self.server.requests[1][1])
+
+    def test_retries_server_errors(self):
+        url = self.serve(
+            "/Kappa.png",
+            [[503, {}, b""], [500, {}, b""], [200, {"ETag": ETAG}, PNG_DATA]],
+        )
+
+        [status, entry] = download_emotes.download_emote(url, self.path, None)
+        self.assertEqual(status, "downloaded")
+        self.assertEqual(entry["etag"], ETAG)
+        self.assertEqual(self.read_emote(), PNG_DATA)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_keeps_emote_after_server_errors(self):
+        url = self.serve(
+            "/Kappa.png",
+            [[200, {"ETag": ETAG}, PNG_DATA], [500, {}, b""]],
+        )
+        [_, entry] = download_emotes.download_emote(url, self.path, None)
+
+        with self.assertRaises(Exception):
+            download_emotes.download_emote(url, self.path, entry)
+        self.assertEqual(len(self.server.requests), 2 + download_emotes.MAX_RETRIES)
+        self.assertEqual(self.read_emote(), PNG_DATA)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["Kappa.png"])
+
+    def test_keeps_emote_after_truncated_download(self):
+        url = self.serve(
+            "/Kappa.png",
+            [
+                [200, {"ETag": ETAG}, PNG_DATA],
+                [200, {"Content-Length": str(len(NEW_PNG_DATA) * 2)}, NEW_PNG_DATA],
+            ],
+        )
+        [_, entry] = download_emotes.download_emote(url, self.path, None)
+
+        # The new emote is cut off, so the old one must be left in place
+        with self.assertRaises(Exception):
+            download_emotes.download_emote(url, self.path, entry)
+        self.assertEqual(self.read_emote(), PNG_DATA)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["Kappa.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
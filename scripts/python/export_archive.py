@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+# This script exports the finished games, participants, and actions to a columnar archive
+# The archive is partitioned by the month that each game finished in (e.g. "2020-08") and every
+# partition is made up of one or more compressed NumPy ".npz" segments, each of which contains one
+# typed array per column (matching the types of the database schema)
+# A "manifest.json" file records the segments and the last exported game ID, so each run only
+# appends the games that were finished since the previous run
+# The archive can be read with "load_partition()" (or directly with "numpy.load()")
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import json
+import os
+import time
+import numpy
+import database
+
+# Constants
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# The number of games that are read from the database (and held in memory) at a time
+DEFAULT_CHUNK_SIZE = 100000
+TABLES = ["games", "game_participants", "game_actions"]
+# The integer columns of each table, with the NumPy type that matches the schema
+# (booleans are stored as "bool" and timestamps are stored as seconds since the Unix epoch)
+GAMES_COLUMNS = [
+    ["id", "id", numpy.int32],
+    ["num_players", "num_players", numpy.int16],
+    ["starting_player", "starting_player", numpy.int16],
+    ["variant", "variant", numpy.int16],
+    ["timed", "timed::int", numpy.bool_],
+    ["time_base", "time_base", numpy.int32],
+    ["time_per_turn", "time_per_turn", numpy.int32],
+    ["speedrun", "speedrun::int", numpy.bool_],
+    ["card_cycle", "card_cycle::int", numpy.bool_],
+    ["deck_plays", "deck_plays::int", numpy.bool_],
+    ["empty_clues", "empty_clues::int", numpy.bool_],
+    ["one_extra_card", "one_extra_card::int", numpy.bool_],
+    ["one_less_card", "one_less_card::int", numpy.bool_],
+    ["all_or_nothing", "all_or_nothing::int", numpy.bool_],
+    ["detrimental_characters", "detrimental_characters::int", numpy.bool_],
+    ["score", "score", numpy.int16],
+    ["num_turns", "num_turns", numpy.int16],
+    ["end_condition", "end_condition", numpy.int16],
+    [
+        "datetime_started",
+        "EXTRACT(EPOCH FROM datetime_started)::bigint",
+        numpy.int64,
+    ],
+    [
+        "datetime_finished",
+        "EXTRACT(EPOCH FROM datetime_finished)::bigint",
+        numpy.int64,
+    ],
+    # This is used to assign the game to a partition (e.g. 202008)
+    [
+        "month",
+        "(EXTRACT(YEAR FROM datetime_finished AT TIME ZONE 'UTC') * 100 "
+        + "+ EXTRACT(MONTH FROM datetime_finished AT TIME ZONE 'UTC'))::int",
+        numpy.int32,
+    ],
+]
+GAMES_TEXT_COLUMNS = ["name", "seed"]
+GAME_PARTICIPANTS_COLUMNS = [
+    ["id", "id", numpy.int32],
+    ["game_id", "game_id", numpy.int32],
+    ["user_id", "user_id", numpy.int32],
+    ["seat", "seat", numpy.int16],
+    ["character_assignment", "character_assignment", numpy.int16],
+    ["character_metadata", "character_metadata", numpy.int16],
+]
+GAME_ACTIONS_COLUMNS = [
+    ["game_id", "game_id", numpy.int32],
+    ["turn", "turn", numpy.int16],
+    ["type", "type", numpy.int16],
+    ["target", "target", numpy.int16],
+    ["value", "value", numpy.int16],
+]
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    if not os.path.exists(args.archive_dir):
+        os.makedirs(args.archive_dir)
+    manifest = read_manifest(args.archive_dir)
+
+    conn = database.connect()
+    # The games that are still being written could be exported without all of their rows, and the
+    # manifest would never let them be exported again
+    settled_game_id = database.get_settled_max_id(conn, "games", "datetime_finished")
+    cursor = conn.cursor()
+    # All of the chunks must see the same snapshot of the database
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+    cursor.execute(
+        "SELECT COALESCE(MAX(id), 0) FROM games WHERE id > %s AND id <= %s",
+        (manifest["last_game_id"], settled_game_id),
+    )
+    max_game_id = cursor.fetchone()[0]
+    if max_game_id == 0:
+        print("There are no new games to export.")
+        cursor.close()
+        conn.close()
+        return
+    print(
+        "Exporting game IDs "
+        + str(manifest["last_game_id"] + 1)
+        + " through "
+        + str(max_game_id)
+        + ".",
+        flush=True,
+    )
+
+    # Export the new games in chunks of game IDs
+    # The manifest is written after every chunk so that an interrupted export can be continued
+    totals = {table: 0 for table in TABLES}
+    low = manifest["last_game_id"] + 1
+    while low <= max_game_id:
+        high = min(low + args.chunk_size, max_game_id + 1)
+        counts = export_chunk(cursor, args.archive_dir, manifest, low, high)
+        for table in TABLES:
+            totals[table] += counts[table]
+        manifest["last_game_id"] = high - 1
+        write_manifest(args.archive_dir, manifest)
+
+        elapsed = time.monotonic() - start_time
+        print(
+            "Exported up to game ID "
+            + str(high - 1)
+            + " ("
+            + "{:.0f}".format(totals["game_actions"] / elapsed if elapsed > 0 else 0)
+            + " actions/sec)",
+            flush=True,
+        )
+        low = high
+
+    cursor.close()
+    conn.rollback()
+    conn.close()
+
+    for table in TABLES:
+        print("Total exported " + table + " rows:", totals[table])
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Export finished games to a month-partitioned columnar archive."
+    )
+    parser.add_argument("archive_dir", help="the directory of the archive")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="the number of game IDs to export at a time (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.chunk_size <= 0:
+        print("The chunk size must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+def read_manifest(archive_dir):
+    manifest_path = os.path.join(archive_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {
+            "version": MANIFEST_VERSION,
+            "last_game_id": 0,
+            "partitions": {},
+        }
+
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest["version"] != MANIFEST_VERSION:
+        print("Unsupported manifest version:", manifest["version"])
+        sys.exit(1)
+
+    return manifest
+
+
+def write_manifest(archive_dir, manifest):
+    # Write to a temporary file first so that an interrupted write cannot corrupt the manifest
+    manifest_path = os.path.join(archive_dir, MANIFEST_FILE_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", newline="\n") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, separators=(",", ": "))
+        manifest_file.write("\n")
+    os.replace(temp_path, manifest_path)
+
+
+def read_columns(cursor, table, columns, key_column, order_by, low, high):
+    column_arrays = database.copy_query_columns(
+        cursor,
+        "SELECT "
+        + ", ".join(column[1] for column in columns)
+        + " FROM "
+        + table
+        + " WHERE "
+        + key_column
+        + " >= %s AND "
+        + key_column
+        + " < %s ORDER BY "
+        + order_by,
+        [column[2] for column in columns],
+        (low, high),
+    )
+
+    return dict(zip([column[0] for column in columns], column_arrays))
+
+
+def read_games_text_columns(cursor, low, high):
+    values = {name: [] for name in GAMES_TEXT_COLUMNS}
+
+    def handle_row(fields):
+        for [name, field] in zip(GAMES_TEXT_COLUMNS, fields):
+            values[name].append(database.decode_copy_field(field))
+
+    database.copy_query_rows(
+        cursor,
+        "SELECT "
+        + ", ".join(GAMES_TEXT_COLUMNS)
+        + " FROM games WHERE id >= %s AND id < %s ORDER BY id",
+        handle_row,
+        (low, high),
+    )
+
+    return {name: numpy.array(column, dtype=str) for [name, column] in values.items()}
+
+
+def export_chunk(cursor, archive_dir, manifest, low, high):
+    games = read_columns(cursor, "games", GAMES_COLUMNS, "id", "id", low, high)
+    games.update(read_games_text_columns(cursor, low, high))
+    participants = read_columns(
+        cursor,
+        "game_participants",
+        GAME_PARTICIPANTS_COLUMNS,
+        "game_id",
+        "game_id, seat",
+        low,
+        high,
+    )
+    actions = read_columns(
+        cursor,
+        "game_actions",
+        GAME_ACTIONS_COLUMNS,
+        "game_id",
+        "game_id, turn",
+        low,
+        high,
+    )
+
+    # Assign every participant and action to the partition of its game
+    # (the games are sorted by ID, so the month of each row can be found with a binary search)
+    months = games.pop("month")
+    participant_months = months[
+        numpy.searchsorted(games["id"], participants["game_id"])
+    ]
+    action_months = months[numpy.searchsorted(games["id"], actions["game_id"])]
+
+    for month in numpy.unique(months).tolist():
+        partition_name = str(month // 100) + "-" + str(month % 100).zfill(2)
+        write_segment(
+            archive_dir,
+            manifest,
+            partition_name,
+            {
+                "games": select_rows(games, months == month),
+                "game_participants": select_rows(
+                    participants, participant_months == month
+                ),
+                "game_actions": select_rows(actions, action_months == month),
+            },
+            low,
+            high,
+        )
+
+    return {
+        "games": len(games["id"]),
+        "game_participants": len(participants["game_id"]),
+        "game_actions": len(actions["game_id"]),
+    }
+
+
+def select_rows(columns, mask):
+    return {name: column[mask] for [name, column] in columns.items()}
+
+
+def write_segment(archive_dir, manifest, partition_name, tables, low, high):
+    partition = manifest["partitions"].setdefault(partition_name, {"segments": []})
+    partition_dir = os.path.join(archive_dir, partition_name)
+    if not os.path.exists(partition_dir):
+        os.makedirs(partition_dir)
+
+    segment = {
+        "min_game_id": low,
+        "max_game_id": high - 1,
+    }
+    segment_number = str(len(partition["segments"]) + 1).zfill(6)
+    for [table, columns] in tables.items():
+        file_name = table + "-" + segment_number + ".npz"
+        numpy.savez_compressed(os.path.join(partition_dir, file_name), **columns)
+        segment[table] = {
+            "file": partition_name + "/" + file_name,
+            "num_rows": len(next(iter(columns.values()))),
+        }
+
+    partition["segments"].append(segment)
+
+
+# Read every segment of a partition (e.g. "2020-08") of one table into a single set of columns
+def load_partition(archive_dir, partition_name, table):
+    manifest = read_manifest(archive_dir)
+    partition = manifest["partitions"].get(partition_name)
+    if partition is None:
+        return None
+
+    segments = []
+    for segment in partition["segments"]:
+        with numpy.load(os.path.join(archive_dir, segment[table]["file"])) as data:
+            segments.append({name: data[name] for name in data.files})
+
+    columns = {}
+    for name in segments[0].keys():
+        columns[name] = numpy.concatenate([segment[name] for segment in segments])
+    return columns
+
+
+if __name__ == "__main__":
+    main()
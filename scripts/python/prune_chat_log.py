@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+# This script deletes the old messages of the "chat_log" and "chat_log_pm" tables, so that the
+# tables (and their indexes) stop growing forever
+# Every kind of room has its own retention policy:
+# - The lobby messages are kept for "--lobby-days" days
+# - The table messages are kept for "--table-days" days (the server writes the chat of a table
+#   when its game ends, and the table IDs are reused after a restart, so the messages are the only
+#   record of the game); with "--game-archive", only the messages of the games that were already
+#   exported by the "export_archive.py" script are deleted
+# - The private messages are kept forever, unless "--pm-days" is specified
+#
+# The messages are deleted in small batches, walking along the "datetime_sent" index with a
+# keyset (so that every batch starts where the previous one stopped), with a pause between every
+# batch so that the server is not starved
+# With "--archive-dir", the deleted rows are first written to gzip-compressed files in the
+# PostgreSQL "COPY" text format, so that they can be loaded back with:
+#   zcat chat_log.[...].tsv.gz | psql -c "COPY chat_log FROM STDIN"
+# The size of the tables and the number of dead rows are reported before and after; the space of
+# the deleted rows is only reused after the table is vacuumed (use "--vacuum")
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import datetime
+import gzip
+import json
+import os
+import time
+import database
+
+# Constants
+DEFAULT_BATCH_SIZE = 1000
+# The pause between every batch, in seconds
+DEFAULT_SLEEP = 0.1
+DEFAULT_LOBBY_DAYS = 365
+DEFAULT_TABLE_DAYS = 90
+CHAT_LOG_COLUMNS = [
+    "id",
+    "user_id",
+    "discord_name",
+    "message",
+    "room",
+    "datetime_sent",
+]
+CHAT_LOG_PM_COLUMNS = [
+    "id",
+    "user_id",
+    "message",
+    "recipient_id",
+    "datetime_sent",
+]
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    conn = database.connect()
+    policies = get_policies(conn, args)
+    tables = sorted({policy["table"] for policy in policies})
+
+    print("Before:")
+    print_table_sizes(conn, tables)
+
+    totals = {}
+    for policy in policies:
+        print(
+            "Deleting "
+            + policy["description"]
+            + " sent before "
+            + policy["cutoff"].isoformat()
+            + ".",
+            flush=True,
+        )
+        if args.dry_run:
+            num_rows = count_rows(conn, policy)
+            print("Dry run; " + str(num_rows) + " rows would be deleted.")
+            continue
+
+        archive_file = None
+        if args.archive_dir is not None:
+            archive_file = open_archive_file(args.archive_dir, policy["table"])
+        try:
+            num_deleted = delete_rows(
+                conn, policy, args.batch_size, args.sleep, archive_file
+            )
+        finally:
+            if archive_file is not None:
+                archive_file.close()
+        totals[policy["description"]] = num_deleted
+
+    if args.vacuum and not args.dry_run:
+        # "VACUUM" cannot run inside of a transaction
+        conn.autocommit = True
+        cursor = conn.cursor()
+        for table in tables:
+            print("Vacuuming " + table + ".", flush=True)
+            cursor.execute("VACUUM (ANALYZE) " + table)
+        cursor.close()
+        conn.autocommit = False
+
+    print("After:")
+    print_table_sizes(conn, tables)
+    conn.close()
+
+    for [description, num_deleted] in totals.items():
+        print("Total deleted " + description + ":", num_deleted)
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Delete the old messages of the chat_log and chat_log_pm tables."
+    )
+    parser.add_argument(
+        "--lobby-days",
+        type=int,
+        default=DEFAULT_LOBBY_DAYS,
+        help="the number of days to keep the lobby messages (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--table-days",
+        type=int,
+        default=DEFAULT_TABLE_DAYS,
+        help="the number of days to keep the table messages (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pm-days",
+        type=int,
+        default=None,
+        help="the number of days to keep the private messages (default: forever)",
+    )
+    parser.add_argument(
+        "--game-archive",
+        metavar="DIR",
+        help="only delete the table messages of the games in this game archive",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        metavar="DIR",
+        help="write the deleted rows to compressed files in this directory first",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="the number of rows to delete per transaction (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        default=DEFAULT_SLEEP,
+        help="the number of seconds to wait between batches (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="vacuum the tables after deleting the rows",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="count the rows that would be deleted without deleting them",
+    )
+    args = parser.parse_args()
+
+    for days in [args.lobby_days, args.table_days, args.pm_days]:
+        if days is not None and days < 0:
+            print("The number of days to keep the messages cannot be negative.")
+            sys.exit(1)
+    if args.batch_size <= 0:
+        print("The batch size must be a positive number.")
+        sys.exit(1)
+    if args.sleep < 0:
+        print("The number of seconds to wait cannot be negative.")
+        sys.exit(1)
+
+    return args
+
+
+# Every policy is a table, a condition on the rows, and the time before which the rows are deleted
+def get_policies(conn, args):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    policies = [
+        {
+            "description": "lobby messages",
+            "table": "chat_log",
+            "columns": CHAT_LOG_COLUMNS,
+            "condition": "room = 'lobby'",
+            "cutoff": now - datetime.timedelta(days=args.lobby_days),
+        }
+    ]
+
+    table_cutoff = now - datetime.timedelta(days=args.table_days)
+    if args.game_archive is not None:
+        archive_cutoff = get_game_archive_cutoff(conn, args.game_archive)
+        if archive_cutoff is None:
+            print("The game archive does not have any games yet.")
+            sys.exit(1)
+        table_cutoff = min(table_cutoff, archive_cutoff)
+    policies.append(
+        {
+            "description": "table messages",
+            "table": "chat_log",
+            "columns": CHAT_LOG_COLUMNS,
+            "condition": "room LIKE 'table%%'",
+            "cutoff": table_cutoff,
+        }
+    )
+
+    if args.pm_days is not None:
+        policies.append(
+            {
+                "description": "private messages",
+                "table": "chat_log_pm",
+                "columns": CHAT_LOG_PM_COLUMNS,
+                "condition": "TRUE",
+                "cutoff": now - datetime.timedelta(days=args.pm_days),
+            }
+        )
+
+    return policies
+
+
+# The chat of a table is written when its game ends, so the messages of the games in the archive
+# are the ones that were sent before the last archived game finished
+def get_game_archive_cutoff(conn, archive_dir):
+    manifest_path = os.path.join(archive_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        print("The game archive does not have a manifest at: " + manifest_path)
+        sys.exit(1)
+    with open(manifest_path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT datetime_finished
+        FROM games
+        WHERE id <= %s
+        ORDER BY id DESC
+        LIMIT 1
+        """,
+        (manifest["last_game_id"],),
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    if row is None:
+        return None
+
+    return row[0]
+
+
+def count_rows(conn, policy):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM "
+        + policy["table"]
+        + " WHERE datetime_sent < %s AND "
+        + policy["condition"],
+        (policy["cutoff"],),
+    )
+    [num_rows] = cursor.fetchone()
+    cursor.close()
+    conn.commit()
+    return num_rows
+
+
+def open_archive_file(archive_dir, table):
+    if not os.path.exists(archive_dir):
+        os.makedirs(archive_dir)
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(archive_dir, table + "." + timestamp + ".tsv.gz")
+    # Append, since the same table can have more than one policy
+    return gzip.open(path, "at", encoding="utf-8", newline="\n")
+
+
+# Delete the rows of a policy in batches of "batch_size" rows
+# Returns the number of rows that were deleted
+def delete_rows(conn, policy, batch_size, sleep, archive_file):
+    start_time = time.monotonic()
+    table = policy["table"]
+    columns = policy["columns"]
+    # The keyset of the last deleted row, so that the next batch starts right after it on the
+    # "datetime_sent" index instead of going over the deleted rows again
+    last_datetime_sent = None
+    last_id = None
+    num_deleted = 0
+    while True:
+        keyset_condition = ""
+        params = {"cutoff": policy["cutoff"], "batch_size": batch_size}
+        if last_datetime_sent is not None:
+            keyset_condition = "AND (datetime_sent, id) > (%(datetime_sent)s, %(id)s)"
+            params["datetime_sent"] = last_datetime_sent
+            params["id"] = last_id
+
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            WITH batch AS (
+                SELECT id
+                FROM """
+            + table
+            + """
+                WHERE datetime_sent < %(cutoff)s
+                    AND """
+            + policy["condition"]
+            + """
+                    """
+            + keyset_condition
+            + """
+                ORDER BY datetime_sent, id
+                LIMIT %(batch_size)s
+            )
+            DELETE FROM """
+            + table
+            + """
+            WHERE id IN (SELECT id FROM batch)
+            RETURNING """
+            + ", ".join(columns),
+            params,
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        if len(rows) == 0:
+            conn.commit()
+            break
+
+        # The rows are archived before the deletion is committed, so a failed write never loses
+        # any rows (at worst, a batch is archived twice if the commit fails)
+        if archive_file is not None:
+            for row in rows:
+                archive_file.write(database.encode_copy_row(row))
+            archive_file.flush()
+        conn.commit()
+
+        num_deleted += len(rows)
+        last_row = max(
+            rows,
+            key=lambda row: (
+                row[columns.index("datetime_sent")],
+                row[columns.index("id")],
+            ),
+        )
+        last_datetime_sent = last_row[columns.index("datetime_sent")]
+        last_id = last_row[columns.index("id")]
+
+        elapsed = time.monotonic() - start_time
+        rows_per_second = num_deleted / elapsed if elapsed > 0 else 0
+        print(
+            "Deleted "
+            + str(num_deleted)
+            + " rows ("
+            + "{:.0f}".format(rows_per_second)
+            + " rows/sec), last sent: "
+            + last_datetime_sent.isoformat(),
+            flush=True,
+        )
+        time.sleep(sleep)
+
+    return num_deleted
+
+
+def print_table_sizes(conn, tables):
+    cursor = conn.cursor()
+    for table in tables:
+        cursor.execute(
+            """
+            SELECT
+                pg_size_pretty(pg_relation_size(relid)),
+                pg_size_pretty(pg_indexes_size(relid)),
+                n_live_tup,
+                n_dead_tup
+            FROM pg_stat_user_tables
+            WHERE relname = %s
+            """,
+            (table,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            continue
+        [table_size, indexes_size, num_live_rows, num_dead_rows] = row
+        dead_percentage = 0
+        if num_live_rows + num_dead_rows > 0:
+            dead_percentage = num_dead_rows / (num_live_rows + num_dead_rows) * 100
+        print(
+            "  "
+            + table
+            + ": "
+            + table_size
+            + " (indexes: "
+            + indexes_size
+            + "), "
+            + str(num_live_rows)
+            + " live rows, "
+            + str(num_dead_rows)
+            + " dead rows ("
+            + "{:.1f}".format(dead_percentage)
+            + "%)"
+        )
+    cursor.close()
+    conn.commit()
+
+
+if __name__ == "__main__":
+    main()
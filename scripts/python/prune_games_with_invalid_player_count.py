@@ -8,63 +8,190 @@ if sys.version_info < (3, 0):
     sys.exit(1)
 
 # Imports
-import os
-import dotenv
-import psycopg2
-
-# Import environment variables
-dotenv.load_dotenv(dotenv.find_dotenv())
-
-# Variables
-user = os.getenv("DB_USER")
-password = os.getenv("DB_PASS")
-host = os.getenv("DB_HOST")
-if host == "":
-    host = "localhost"
-port = os.getenv("DB_PORT")
-if port == "":
-    port = "5432"
-database = os.getenv("DB_NAME")
-
-# Connect to the PostgreSQL database
-conn = psycopg2.connect(
-    host=host, port=port, user=user, password=password, database=database,
-)
-
-# Get all the games
-cursor = conn.cursor()
-cursor.execute("SELECT id, num_players FROM games ORDER BY id")
-rows = cursor.fetchall()
-games = []
-for row in rows:
-    games.append(row)
-cursor.close()
-print("Loaded " + str(len(games)) + " games.", flush=True)
-
-# Get the count of game participants for each game ID
-i = 0
-numInvalidGames = 0
-for game in games:
-    i += 1
-    if i % 1000 == 0:
-        print("On user #" + str(i), flush=True)
-
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(id) FROM game_participants WHERE game_id = %s", (game[0],)
+import argparse
+import time
+import database
+
+# Constants
+JOB_NAME = "prune_games_with_invalid_player_count"
+# Each batch of deletions is committed separately so that we never hold a lock on every invalid
+# game (and every row that cascades from it) in one huge transaction
+DEFAULT_BATCH_SIZE = 1000
+# Split the table into more ranges than workers so that a slow range does not leave the other
+# workers idle at the end of the job
+RANGES_PER_WORKER = 4
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    # By default, only the games that were finished since the last run are examined
+    conn = database.connect()
+    watermark = None
+    if not args.full:
+        watermark = database.get_watermark(conn, JOB_NAME)
+    if watermark is None:
+        print("Examining all games.", flush=True)
+        last_game_id = None
+    else:
+        print(
+            "Examining games after " + database.describe_watermark(watermark) + ".",
+            flush=True,
+        )
+        last_game_id = watermark["id"]
+
+    # The games that are still being written would look like they have too few participants
+    settled_game_id = database.get_settled_max_id(conn, "games", "datetime_finished")
+    key_ranges = database.get_key_ranges(
+        conn,
+        "games",
+        args.workers * RANGES_PER_WORKER,
+        after=last_game_id,
+        last=settled_game_id,
     )
-    row = cursor.fetchone()
-    cursor.close()
-    num_game_participants = row[0]
-    if num_game_participants != game[1]:
-        print("Invalid player count found on game: ", game[0])
-        numInvalidGames += 1
+    progress = database.RangeProgress(key_ranges)
+
+    totals = {}
+    for [key_range, result] in database.run_key_ranges(
+        prune_range, key_ranges, args.workers, (args.batch_size,)
+    ):
+        database.combine_results(totals, result)
+        if "errors" in result:
+            progress.fail()
+            continue
+
+        new_last_game_id = progress.complete(key_range)
+        if new_last_game_id is not None:
+            watermark = database.make_watermark(
+                conn, "games", new_last_game_id, "datetime_finished"
+            )
+            database.set_watermark(conn, JOB_NAME, watermark)
 
+        print(
+            "Finished game IDs ["
+            + str(key_range[0])
+            + ", "
+            + str(key_range[1])
+            + "): "
+            + str(result.get("num_deleted_games", 0))
+            + " deleted",
+            flush=True,
+        )
+
+    conn.close()
+
+    total_time = time.monotonic() - start_time
+    num_deleted_games = totals.get("num_deleted_games", 0)
+    print("Total invalid rows:", totals.get("num_invalid_games", 0))
+    print("Total deleted rows:", num_deleted_games)
+    if total_time > 0:
+        print(
+            "Delete rate: "
+            + "{:.0f}".format(num_deleted_games / total_time)
+            + " rows/sec"
+        )
+    print("Total time: " + "{:.2f}".format(total_time) + " seconds")
+
+    num_errors = database.print_errors(totals)
+    if num_errors > 0:
+        # Every range commits its own work, so it is safe to run the script again
+        print("Total failed key ranges:", num_errors)
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Delete games where the number of participants does not match the player count."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="the number of games to delete per transaction (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="the number of key ranges to process in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="examine every game instead of only the games finished since the last run",
+    )
+    args = parser.parse_args()
+    if args.batch_size <= 0 or args.workers <= 0:
+        print("The batch size and the number of workers must be positive numbers.")
+        sys.exit(1)
+
+    return args
+
+
+# Prune the games with an ID in the range of [low, high) on a dedicated connection
+def prune_range(low, high, batch_size):
+    conn = database.connect()
+    start_time = time.monotonic()
+
+    # Find every game where the number of participants does not match the "num_players" column
+    # The participants are counted with a single grouped pass over the "game_participants" table,
+    # and the left join ensures that games with no participants at all are also found
+    # The IDs are streamed from a holdable server-side cursor, so the cursor survives the commit
+    # after each batch of deletions
+    invalid_game_ids = database.stream(
+        conn,
+        """
+        SELECT games.id
+        FROM games
+        LEFT JOIN (
+            SELECT game_id, COUNT(*) AS num_game_participants
+            FROM game_participants
+            WHERE game_id >= %(low)s AND game_id < %(high)s
+            GROUP BY game_id
+        ) AS participant_counts ON participant_counts.game_id = games.id
+        WHERE games.id >= %(low)s
+            AND games.id < %(high)s
+            AND COALESCE(participant_counts.num_game_participants, 0) != games.num_players
+        ORDER BY games.id
+        """,
+        {"low": low, "high": high},
+        with_hold=True,
+    )
+
+    # Delete the invalid games in bounded batches
+    # (the rows in "game_participants", "game_actions", and so forth are removed by
+    # "ON DELETE CASCADE")
+    num_invalid_games = 0
+    num_deleted_games = 0
+    for batch in database.batched(invalid_game_ids, batch_size):
+        batch = [row[0] for row in batch]
+        num_invalid_games += len(batch)
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM games WHERE id = %s", (game[0],))
+        cursor.execute("DELETE FROM games WHERE id = ANY(%s)", (batch,))
+        num_deleted_games += cursor.rowcount
         cursor.close()
+        conn.commit()
+
+        elapsed = time.monotonic() - start_time
+        rows_per_second = num_deleted_games / elapsed if elapsed > 0 else 0
+        print(
+            "Deleted "
+            + str(num_deleted_games)
+            + " games ("
+            + "{:.0f}".format(rows_per_second)
+            + " rows/sec), last game ID: "
+            + str(batch[-1]),
+            flush=True,
+        )
+
+    conn.close()
+
+    return {
+        "num_invalid_games": num_invalid_games,
+        "num_deleted_games": num_deleted_games,
+    }
 
-conn.commit()
-conn.close()
 
-print("Total invalid rows:", numInvalidGames)
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 #!/usr/bin/env python3
 
+# This script deletes the users that have not played any games
+# By default, only the users that were created since the last run are examined, so a user is never
+# examined again after the first run that saw them; after games are deleted (e.g. by the
+# "prune_games_with_invalid_player_count.py" script), run it with "--full" to find the users that
+# no longer have any games
+# Every page of users is committed with the progress of its worker, so an interrupted run is
+# resumed from where every worker stopped
+
 # The "dotenv" module does not work in Python 2
 import sys
 
@@ -8,59 +16,203 @@ if sys.version_info < (3, 0):
     sys.exit(1)
 
 # Imports
-import os
-import dotenv
-import psycopg2
-
-# Import environment variables
-dotenv.load_dotenv(dotenv.find_dotenv())
-
-# Variables
-user = os.getenv("DB_USER")
-password = os.getenv("DB_PASS")
-host = os.getenv("DB_HOST")
-if host == "":
-    host = "localhost"
-port = os.getenv("DB_PORT")
-if port == "":
-    port = "5432"
-database = os.getenv("DB_NAME")
-
-# Connect to the PostgreSQL database
-conn = psycopg2.connect(
-    host=host, port=port, user=user, password=password, database=database,
-)
-
-# Get all users
-cursor = conn.cursor()
-cursor.execute("SELECT id, username FROM users WHERE id > 15000")
-# (users before 15000 are verified to have at least 1 game played)
-rows = cursor.fetchall()
-users = []
-for row in rows:
-    users.append(row)
-cursor.close()
-
-print("Loaded " + str(len(users)) + " users.", flush=True)
-i = 0
-for user in users:
-    i += 1
-    if i % 1000 == 0:
-        print("On user #" + str(i), flush=True)
-
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(game_id) FROM game_participants WHERE user_id = %s", (user[0],)
+import argparse
+import time
+import database
+
+# Constants
+JOB_NAME = "prune_users_with_no_games_played"
+DEFAULT_BATCH_SIZE = 5000
+# Split the table into more ranges than workers so that a slow range does not leave the other
+# workers idle at the end of the job
+RANGES_PER_WORKER = 4
+# A new user has not had the time to play a game yet, so the users that were created less than this
+# long ago are left for a later run (and the watermark never moves past them)
+NEW_USER_INTERVAL = "7 days"
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    # By default, only the users that were created since the last run are examined
+    conn = database.connect()
+    watermark = database.get_watermark(conn, JOB_NAME)
+    if not args.full and watermark is not None and "ranges" in watermark:
+        # Every worker saves its progress after every page, so the ranges of an interrupted run
+        # are resumed from the first user that was not examined yet
+        print(
+            "Resuming the interrupted run of the users after "
+            + database.describe_watermark(watermark)
+            + ".",
+            flush=True,
+        )
+        key_ranges = [(low, high) for [low, high] in watermark["ranges"] if low < high]
+    else:
+        if args.full or watermark is None:
+            print("Examining all users.", flush=True)
+            last_user_id = None
+        else:
+            print(
+                "Examining users after " + database.describe_watermark(watermark) + ".",
+                flush=True,
+            )
+            last_user_id = watermark["id"]
+
+        settled_user_id = database.get_settled_max_id(
+            conn, "users", "datetime_created", NEW_USER_INTERVAL
+        )
+        key_ranges = database.get_key_ranges(
+            conn,
+            "users",
+            args.workers * RANGES_PER_WORKER,
+            after=last_user_id,
+            last=settled_user_id,
+        )
+        if len(key_ranges) == 0:
+            print("There are no new users to examine.")
+            conn.close()
+            return
+
+        # The run is saved before it starts, so that the workers can record their progress in it
+        watermark = dict(
+            watermark if watermark is not None else {"id": 0},
+            ranges=[[low, high] for [low, high] in key_ranges],
+            last=key_ranges[-1][1] - 1,
+        )
+        database.set_watermark(conn, JOB_NAME, watermark)
+
+    totals = {}
+    for [key_range, result] in database.run_key_ranges(
+        prune_range, key_ranges, args.workers, (args.batch_size,)
+    ):
+        database.combine_results(totals, result)
+        print(
+            "Examined "
+            + str(totals.get("num_examined_users", 0))
+            + " users, deleted "
+            + str(totals.get("num_deleted_users", 0)),
+            flush=True,
+        )
+
+    # The watermark only moves past the run once every range of it is done; otherwise, the next
+    # run resumes the ranges that failed
+    if "errors" not in totals:
+        watermark = database.make_watermark(
+            conn, "users", watermark["last"], "datetime_created"
+        )
+        database.set_watermark(conn, JOB_NAME, watermark)
+        print("New watermark: " + database.describe_watermark(watermark))
+
+    conn.close()
+
+    print("Total examined users:", totals.get("num_examined_users", 0))
+    print("Total deleted users:", totals.get("num_deleted_users", 0))
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+    num_errors = database.print_errors(totals)
+    if num_errors > 0:
+        print("Total failed key ranges:", num_errors)
+        sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Delete users that have not played any games, in committed batches."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="the number of users to examine per transaction (default: %(default)s)",
     )
-    row = cursor.fetchone()
-    cursor.close()
-    num_games = row[0]
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="the number of key ranges to process in parallel (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="examine every user instead of only the users created since the last run, "
+        + "which is needed after games are deleted "
+        + "(the users created in the last "
+        + NEW_USER_INTERVAL
+        + " are never examined)",
+    )
+    args = parser.parse_args()
+    if args.batch_size <= 0 or args.workers <= 0:
+        print("The batch size and the number of workers must be positive numbers.")
+        sys.exit(1)
+
+    return args
 
-    if num_games == 0:
+
+# Prune the users with an ID in the range of [low, high) on a dedicated connection
+# The range must be one of the ranges of the run that is saved in the watermark
+# The range is paged through by keyset on the primary key and each page is handled in its own
+# transaction, so the locks on "users" are only held for one batch at a time
+def prune_range(low, high, batch_size):
+    conn = database.connect()
+    last_user_id = low - 1
+    num_examined_users = 0
+    num_deleted_users = 0
+    while True:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE id = %s", (user[0],))
+        cursor.execute(
+            """
+            SELECT MAX(id), COUNT(id)
+            FROM (
+                SELECT id
+                FROM users
+                WHERE id > %s AND id < %s
+                ORDER BY id
+                LIMIT %s
+            ) AS page
+            """,
+            (last_user_id, high, batch_size),
+        )
+        [page_last_user_id, page_size] = cursor.fetchone()
+        if page_size == 0:
+            database.set_range_progress(cursor, JOB_NAME, high, high)
+            cursor.close()
+            conn.commit()
+            break
+
+        # Delete every user in this page that has no rows in "game_participants" with one
+        # set-based statement, rather than counting the games for each user individually
+        cursor.execute(
+            """
+            DELETE FROM users
+            WHERE id > %s
+                AND id <= %s
+                AND NOT EXISTS (
+                    SELECT 1 FROM game_participants WHERE game_participants.user_id = users.id
+                )
+            RETURNING id
+            """,
+            (last_user_id, page_last_user_id),
+        )
+        deleted_user_ids = [row[0] for row in cursor]
+        # The progress is committed with the page, so that an interrupted run resumes after it
+        database.set_range_progress(cursor, JOB_NAME, high, page_last_user_id + 1)
         cursor.close()
-        print("Deleted user:", user[0], flush=True)
+        conn.commit()
+
+        last_user_id = page_last_user_id
+        num_examined_users += page_size
+        num_deleted_users += len(deleted_user_ids)
+        for user_id in deleted_user_ids:
+            print("Deleted user:", user_id, flush=True)
+
+    conn.close()
+
+    return {
+        "num_examined_users": num_examined_users,
+        "num_deleted_users": num_deleted_users,
+    }
+
 
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    main()
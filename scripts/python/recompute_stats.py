@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+# This script rebuilds the "user_stats" and "variant_stats" tables from scratch
+# It is an offline replacement for the "UserStats.UpdateAll()" and "VariantStats.UpdateAll()"
+# functions in the server, which issue several queries for every user and every variant
+# Instead, "games" joined with "game_participants" is streamed once and every aggregate is computed
+# with NumPy group-by operations
+# The results follow the same rules as the per-game updates in the "WriteDatabaseStats()" function:
+# - A user's best score for a player count uses every game, and ties go to the lowest modifier
+# - A variant's best score for a player count only uses games without any modifiers
+# - The number of games, the average score, the number of strikeouts, and the number of max scores
+#   do not include speedrun games
+# The new rows are loaded into staging tables with "COPY" and swapped in with a single transaction
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import json
+import os
+import time
+import numpy
+import database
+
+# Constants
+MIN_PLAYERS = 2
+MAX_PLAYERS = 6
+# The modifier is a bitmask of 5 flags (see the "ScoreModifier" constants in "constants.go"),
+# so it is always less than this
+NUM_MODIFIERS = 32
+USER_STATS_COLUMNS = [
+    "user_id",
+    "variant",
+    "num_games",
+    "best_score2",
+    "best_score2_mod",
+    "best_score3",
+    "best_score3_mod",
+    "best_score4",
+    "best_score4_mod",
+    "best_score5",
+    "best_score5_mod",
+    "best_score6",
+    "best_score6_mod",
+    "average_score",
+    "num_strikeouts",
+]
+VARIANT_STATS_COLUMNS = [
+    "variant",
+    "num_games",
+    "best_score2",
+    "best_score3",
+    "best_score4",
+    "best_score5",
+    "best_score6",
+    "num_max_scores",
+    "average_score",
+    "num_strikeouts",
+]
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    max_scores = load_max_scores()
+
+    conn = database.connect()
+    cursor = conn.cursor()
+    columns = read_games(cursor)
+    conn.commit()
+    print(
+        "Read "
+        + str(len(columns["game_id"]))
+        + " participant rows in "
+        + "{:.2f}".format(time.monotonic() - start_time)
+        + " seconds.",
+        flush=True,
+    )
+
+    # Games of variants that no longer exist cannot be attributed to a max score
+    known_variant = columns["variant"] < len(max_scores)
+    known_variant[known_variant] = max_scores[columns["variant"][known_variant]] > 0
+    num_unknown_rows = int(numpy.count_nonzero(~known_variant))
+    if num_unknown_rows > 0:
+        print("Skipping " + str(num_unknown_rows) + " rows with an unknown variant ID.")
+        for [name, column] in columns.items():
+            columns[name] = column[known_variant]
+
+    compute_start_time = time.monotonic()
+    user_stats = compute_user_stats(columns)
+    variant_stats = compute_variant_stats(columns, max_scores)
+    print(
+        "Computed "
+        + str(len(user_stats[0]))
+        + " user stats rows and "
+        + str(len(variant_stats[0]))
+        + " variant stats rows in "
+        + "{:.2f}".format(time.monotonic() - compute_start_time)
+        + " seconds.",
+        flush=True,
+    )
+
+    if args.dry_run:
+        print("Dry run; the database was not modified.")
+    else:
+        write_stats(conn, cursor, user_stats, variant_stats)
+        print("Swapped in the new stats tables.")
+
+    cursor.close()
+    conn.close()
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Recompute the user_stats and variant_stats tables from every game."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="compute the stats without writing them to the database",
+    )
+    return parser.parse_args()
+
+
+# Returns an array indexed by variant ID, with 0 for IDs that do not exist
+def load_max_scores():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    variants_path = os.path.join(dir_path, "..", "..", "data", "variants.json")
+    with open(variants_path, "r") as variants_file:
+        variants = json.load(variants_file)
+
+    highest_id = max(variant["id"] for variant in variants.values())
+    max_scores = numpy.zeros(highest_id + 1, dtype=numpy.int16)
+    for variant in variants.values():
+        # This matches the "MaxScore" field in "variants.go"
+        max_scores[variant["id"]] = len(variant["suits"]) * 5
+
+    return max_scores
+
+
+# Every game appears once per participant
+# The left join keeps games without participants (with a user ID of -1) so that they still count
+# towards the variant stats
+def read_games(cursor):
+    names = [
+        "game_id",
+        "user_id",
+        "variant",
+        "num_players",
+        "score",
+        "modifier",
+        "speedrun",
+    ]
+    dtypes = [
+        numpy.int32,
+        numpy.int32,
+        numpy.int16,
+        numpy.int8,
+        numpy.int16,
+        numpy.int8,
+        numpy.bool_,
+    ]
+    column_arrays = database.copy_query_columns(
+        cursor,
+        """
+        SELECT
+            games.id,
+            COALESCE(game_participants.user_id, -1),
+            games.variant,
+            games.num_players,
+            games.score,
+            games.deck_plays::int
+                + games.empty_clues::int * 2
+                + games.one_extra_card::int * 4
+                + games.one_less_card::int * 8
+                + games.all_or_nothing::int * 16,
+            games.speedrun::int
+        FROM games
+        LEFT JOIN game_participants ON game_participants.game_id = games.id
+        ORDER BY games.id
+        """,
+        dtypes,
+    )
+
+    return dict(zip(names, column_arrays))
+
+
+# Returns the unique keys and, for every row, the index of its group
+def group_by(keys):
+    return numpy.unique(keys, return_inverse=True)
+
+
+# Returns the average of "values" for each group (or 0 for an empty group)
+def group_average(group_indexes, num_groups, values, mask):
+    sums = numpy.bincount(group_indexes, weights=values * mask, minlength=num_groups)
+    counts = numpy.bincount(group_indexes, weights=mask, minlength=num_groups)
+    averages = numpy.zeros(num_groups)
+    numpy.divide(sums, counts, out=averages, where=counts > 0)
+    return averages
+
+
+def group_count(group_indexes, num_groups, mask):
+    return numpy.bincount(group_indexes, weights=mask, minlength=num_groups).astype(
+        numpy.int64
+    )
+
+
+# Returns the best score and the lowest modifier that achieved it for each group,
+# only looking at the rows in "mask"
+def group_best_score(group_indexes, num_groups, scores, modifiers, mask):
+    # Pack the score and the inverted modifier into a single value so that one maximum finds both
+    packed = scores.astype(numpy.int32) * NUM_MODIFIERS + (
+        NUM_MODIFIERS - 1 - modifiers
+    )
+    best = numpy.full(num_groups, -1, dtype=numpy.int32)
+    numpy.maximum.at(best, group_indexes[mask], packed[mask])
+
+    best_scores = numpy.where(best >= 0, best // NUM_MODIFIERS, 0)
+    best_modifiers = numpy.where(best >= 0, NUM_MODIFIERS - 1 - best % NUM_MODIFIERS, 0)
+    # A best score of 0 is never recorded with a modifier
+    best_modifiers[best_scores == 0] = 0
+
+    return best_scores, best_modifiers
+
+
+def compute_user_stats(columns):
+    has_user = columns["user_id"] >= 0
+    user_ids = columns["user_id"][has_user].astype(numpy.int64)
+    variants = columns["variant"][has_user].astype(numpy.int64)
+    num_players = columns["num_players"][has_user]
+    scores = columns["score"][has_user]
+    modifiers = columns["modifier"][has_user]
+    not_speedrun = ~columns["speedrun"][has_user]
+
+    # Variant IDs are "SMALLINT" values, so they fit in the low 16 bits of the key
+    [keys, group_indexes] = group_by(user_ids * 65536 + variants)
+    num_groups = len(keys)
+
+    stats = [
+        keys // 65536,
+        keys % 65536,
+        group_count(group_indexes, num_groups, not_speedrun),
+    ]
+    for player_count in range(MIN_PLAYERS, MAX_PLAYERS + 1):
+        [best_scores, best_modifiers] = group_best_score(
+            group_indexes, num_groups, scores, modifiers, num_players == player_count
+        )
+        stats.append(best_scores)
+        stats.append(best_modifiers)
+    stats.append(
+        group_average(group_indexes, num_groups, scores, not_speedrun & (scores != 0))
+    )
+    stats.append(group_count(group_indexes, num_groups, not_speedrun & (scores == 0)))
+
+    return stats
+
+
+def compute_variant_stats(columns, max_scores):
+    # The variant stats are per game, so only keep the first participant row of every game
+    [_, first_rows] = numpy.unique(columns["game_id"], return_index=True)
+    variants = columns["variant"][first_rows].astype(numpy.int64)
+    num_players = columns["num_players"][first_rows]
+    scores = columns["score"][first_rows]
+    modifiers = columns["modifier"][first_rows]
+    not_speedrun = ~columns["speedrun"][first_rows]
+
+    [keys, group_indexes] = group_by(variants)
+    num_groups = len(keys)
+
+    stats = [
+        keys,
+        group_count(group_indexes, num_groups, not_speedrun),
+    ]
+    for player_count in range(MIN_PLAYERS, MAX_PLAYERS + 1):
+        [best_scores, _] = group_best_score(
+            group_indexes,
+            num_groups,
+            scores,
+            modifiers,
+            (num_players == player_count) & (modifiers == 0),
+        )
+        stats.append(best_scores)
+    is_max_score = scores == max_scores[variants]
+    stats.append(group_count(group_indexes, num_groups, not_speedrun & is_max_score))
+    stats.append(
+        group_average(group_indexes, num_groups, scores, not_speedrun & (scores != 0))
+    )
+    stats.append(group_count(group_indexes, num_groups, not_speedrun & (scores == 0)))
+
+    return stats
+
+
+# Yield the rows of a list of columns
+def iterate_rows(columns):
+    return zip(*[column.tolist() for column in columns])
+
+
+def write_stats(conn, cursor, user_stats, variant_stats):
+    # Load the staging tables
+    # They are created with the same columns, defaults, and primary keys as the real tables
+    for table in ["user_stats", "variant_stats"]:
+        cursor.execute("DROP TABLE IF EXISTS " + table + "_new")
+        cursor.execute(
+            "CREATE TABLE " + table + "_new (LIKE " + table + " INCLUDING ALL)"
+        )
+    database.copy_rows(
+        cursor, "user_stats_new", USER_STATS_COLUMNS, iterate_rows(user_stats)
+    )
+    database.copy_rows(
+        cursor, "variant_stats_new", VARIANT_STATS_COLUMNS, iterate_rows(variant_stats)
+    )
+    # "LIKE" does not copy foreign keys
+    cursor.execute("""
+        ALTER TABLE user_stats_new
+        ADD CONSTRAINT user_stats_new_user_id_fkey
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        """)
+    conn.commit()
+
+    # Swap the tables in a single transaction, so the server sees either the old or the new stats
+    with database.transaction(conn):
+        for table in ["user_stats", "variant_stats"]:
+            cursor.execute("LOCK TABLE " + table + " IN ACCESS EXCLUSIVE MODE")
+            cursor.execute("ALTER TABLE " + table + " RENAME TO " + table + "_old")
+            cursor.execute("ALTER TABLE " + table + "_new RENAME TO " + table)
+            cursor.execute("DROP TABLE " + table + "_old")
+            # Give the constraints their original names back so that the next run does not collide
+            cursor.execute(
+                "ALTER TABLE "
+                + table
+                + " RENAME CONSTRAINT "
+                + table
+                + "_new_pkey TO "
+                + table
+                + "_pkey"
+            )
+        cursor.execute("""
+            ALTER TABLE user_stats
+            RENAME CONSTRAINT user_stats_new_user_id_fkey TO user_stats_user_id_fkey
+            """)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+# This script builds (and this module reads) a compact on-disk store of the actions of every game
+# Each action takes 4 bytes (a signed byte each for the type, the target, and the value, plus one
+# reserved byte) instead of a full "game_actions" row
+# The store is made up of append-only segments; each run of the builder adds one segment with the
+# games that were finished since the previous run
+#
+# Segment file layout (all integers are little-endian):
+# - A 32 byte header: the magic bytes, the format version, the first game ID in the segment,
+#   the number of game ID slots, and the total number of actions
+# - The actions of every game, in game ID and turn order (4 bytes per action)
+# - The index: one 8 byte offset per game ID slot plus a final end offset, so the actions of the
+#   game with ID "base_game_id + i" are "actions[offsets[i]:offsets[i + 1]]"
+#
+# The reader memory-maps the segments, so looking up a game is a constant-time index lookup that
+# returns a zero-copy NumPy view of its actions:
+#   store = ReplayStore("/path/to/store")
+#   actions = store.get(123456)
+#   actions["type"], actions["target"], actions["value"]
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import time
+import numpy
+import database
+
+# Constants
+MAGIC = b"HLREPLAY"  # cspell:disable-line
+FORMAT_VERSION = 1
+# Magic, version, base game ID, number of slots, number of actions, and padding
+HEADER_FORMAT = "<8sIiIQ4x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+ACTION_DTYPE = numpy.dtype(
+    [("type", "i1"), ("target", "i1"), ("value", "i1"), ("reserved", "i1")]
+)
+OFFSET_DTYPE = numpy.dtype("<u8")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".bin"
+# The number of game IDs that are read from the database at a time
+DEFAULT_CHUNK_SIZE = 100000
+
+
+class ReplaySegment:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        [magic, version, base_game_id, num_slots, num_actions] = struct.unpack_from(
+            HEADER_FORMAT, self.mmap
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('"' + path + '" is not a valid replay segment.')
+
+        self.base_game_id = base_game_id
+        self.num_slots = num_slots
+        self.actions = numpy.frombuffer(
+            self.mmap, dtype=ACTION_DTYPE, count=num_actions, offset=HEADER_SIZE
+        )
+        self.offsets = numpy.frombuffer(
+            self.mmap,
+            dtype=OFFSET_DTYPE,
+            count=num_slots + 1,
+            offset=HEADER_SIZE + num_actions * ACTION_DTYPE.itemsize,
+        )
+
+    @property
+    def end_game_id(self):
+        return self.base_game_id + self.num_slots
+
+    def get(self, game_id):
+        i = game_id - self.base_game_id
+        if i < 0 or i >= self.num_slots:
+            return None
+
+        start = self.offsets[i]
+        end = self.offsets[i + 1]
+        if start == end:
+            return None
+        return self.actions[start:end]
+
+    def close(self):
+        self.actions = None
+        self.offsets = None
+        self.file.close()
+        try:
+            self.mmap.close()
+        except BufferError:
+            # A caller is still holding a view of the actions,
+            # so the memory map will be released once that view is garbage collected
+            pass
+
+
+class ReplayStore:
+    def __init__(self, store_dir):
+        self.segments = []
+        if os.path.exists(store_dir):
+            for file_name in sorted(os.listdir(store_dir)):
+                if file_name.startswith(SEGMENT_PREFIX) and file_name.endswith(
+                    SEGMENT_SUFFIX
+                ):
+                    self.segments.append(
+                        ReplaySegment(os.path.join(store_dir, file_name))
+                    )
+        self.segments.sort(key=lambda segment: segment.base_game_id)
+        self.base_game_ids = [segment.base_game_id for segment in self.segments]
+
+    # The first game ID that is not covered by any segment
+    @property
+    def end_game_id(self):
+        if len(self.segments) == 0:
+            return 0
+        return self.segments[-1].end_game_id
+
+    # Returns a read-only view of the actions of a game, or None if it is not in the store
+    def get(self, game_id):
+        i = bisect.bisect_right(self.base_game_ids, game_id) - 1
+        if i < 0:
+            return None
+        return self.segments[i].get(game_id)
+
+    # Yield every game in the store as "(game_id, actions)"
+    def iterate_games(self):
+        for segment in self.segments:
+            counts = numpy.diff(segment.offsets)
+            for i in numpy.flatnonzero(counts).tolist():
+                start = segment.offsets[i]
+                end = segment.offsets[i + 1]
+                yield segment.base_game_id + i, segment.actions[start:end]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+        self.base_game_ids = []
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    if not os.path.exists(args.store_dir):
+        os.makedirs(args.store_dir)
+    store = ReplayStore(args.store_dir)
+    base_game_id = store.end_game_id
+    store.close()
+
+    conn = database.connect()
+    # The end of a segment is permanent, so the games that are still being written (and could have
+    # no actions yet) are left for the next run
+    settled_game_id = database.get_settled_max_id(conn, "games", "datetime_finished")
+    cursor = conn.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+    cursor.execute(
+        "SELECT COALESCE(MAX(id), -1) FROM games WHERE id >= %s AND id <= %s",
+        (base_game_id, settled_game_id),
+    )
+    end_game_id = cursor.fetchone()[0] + 1
+    if end_game_id <= base_game_id:
+        print("There are no new games to add to the store.")
+        cursor.close()
+        conn.close()
+        return
+
+    path = os.path.join(
+        args.store_dir,
+        SEGMENT_PREFIX
+        + str(base_game_id).zfill(10)
+        + "-"
+        + str(end_game_id - 1).zfill(10)
+        + SEGMENT_SUFFIX,
+    )
+    num_actions = write_segment(
+        cursor, path, base_game_id, end_game_id, args.chunk_size
+    )
+    cursor.close()
+    conn.rollback()
+    conn.close()
+
+    elapsed = time.monotonic() - start_time
+    print(
+        "Wrote "
+        + str(num_actions)
+        + " actions for game IDs "
+        + str(base_game_id)
+        + " through "
+        + str(end_game_id - 1)
+        + " to: "
+        + path
+    )
+    print("Total size: " + str(os.path.getsize(path)) + " bytes")
+    print("Total time: " + "{:.2f}".format(elapsed) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Add the newly finished games to a compact replay store."
+    )
+    parser.add_argument("store_dir", help="the directory of the replay store")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="the number of game IDs to read at a time (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.chunk_size <= 0:
+        print("The chunk size must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+# The actions are streamed to the file chunk by chunk, and the index is written at the end
+# The segment is written to a temporary file first, so a partial segment is never visible
+def write_segment(cursor, path, base_game_id, end_game_id, chunk_size):
+    num_slots = end_game_id - base_game_id
+    counts = numpy.zeros(num_slots, dtype=OFFSET_DTYPE)
+    num_actions = 0
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as segment_file:
+        segment_file.write(b"\0" * HEADER_SIZE)
+
+        for low in range(base_game_id, end_game_id, chunk_size):
+            high = min(low + chunk_size, end_game_id)
+            [game_ids, action_types, targets, values] = database.copy_query_columns(
+                cursor,
+                """
+                SELECT game_id, type, target, value
+                FROM game_actions
+                WHERE game_id >= %s AND game_id < %s
+                ORDER BY game_id, turn
+                """,
+                [numpy.int32, numpy.int16, numpy.int16, numpy.int16],
+                (low, high),
+            )
+            for column in [action_types, targets, values]:
+                if len(column) > 0 and (column.min() < -128 or column.max() > 127):
+                    raise ValueError(
+                        "An action in game IDs "
+                        + str(low)
+                        + " through "
+                        + str(high - 1)
+                        + " does not fit in a byte."
+                    )
+
+            actions = numpy.zeros(len(game_ids), dtype=ACTION_DTYPE)
+            actions["type"] = action_types
+            actions["target"] = targets
+            actions["value"] = values
+            segment_file.write(actions.tobytes())
+
+            counts += numpy.bincount(
+                game_ids - base_game_id, minlength=num_slots
+            ).astype(OFFSET_DTYPE)
+            num_actions += len(game_ids)
+
+        offsets = numpy.zeros(num_slots + 1, dtype=OFFSET_DTYPE)
+        numpy.cumsum(counts, out=offsets[1:])
+        segment_file.write(offsets.tobytes())
+
+        segment_file.seek(0)
+        segment_file.write(
+            struct.pack(
+                HEADER_FORMAT,
+                MAGIC,
+                FORMAT_VERSION,
+                base_game_id,
+                num_slots,
+                num_actions,
+            )
+        )
+
+    os.replace(temp_path, path)
+    return num_actions
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+# This script restores a dump from the "dump_db.py" or "sanitize_dump.py" scripts (the plain SQL
+# backups of "database_backup.sh" are still restored with the "import_db.sh" script)
+# 1. The tables are created from "install/database_schema.sql", without any of their indexes or
+#    keys (primary keys, unique constraints, and foreign keys)
+# 2. The files are loaded with "COPY ... FROM STDIN" by a pool of threads, each on its own pooled
+#    connection; nothing is checked during the load, so every table (and every key range of a big
+#    table) is loaded at the same time, starting with the biggest files
+# 3. The sequences of the "SERIAL" columns are moved past the restored rows
+# 4. The indexes, the primary keys, and the unique constraints are created in parallel, which is
+#    much faster than updating them row by row during the load
+# 5. The foreign keys are added (and the tables are analyzed) in parallel; every foreign key is
+#    checked with a single query over the whole table instead of once per row
+# The tables of the schema are dropped and recreated, so everything in them is lost
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import concurrent.futures
+import gzip
+import os
+import time
+import psycopg2
+import psycopg2.sql
+import database
+import dump_db
+
+# Constants
+DEFAULT_WORKERS = 4
+# The memory that every worker can use to sort the rows of an index
+INDEX_MAINTENANCE_WORK_MEM = "256MB"
+# The size of the reads from the dump files
+COPY_BUFFER_SIZE = 1 << 20
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    manifest = dump_db.read_manifest(args.dump_dir)
+    [
+        table_statements,
+        index_statements,
+        foreign_key_statements,
+        tables,
+    ] = dump_db.read_schema()
+    schema_tables = {table["name"]: table for table in tables}
+    for table in manifest["tables"]:
+        if table["name"] not in schema_tables:
+            print('The "' + table["name"] + '" table of the dump is not in the schema.')
+            sys.exit(1)
+    dump_tables = {table["name"]: table for table in manifest["tables"]}
+    for table in tables:
+        if table["name"] not in dump_tables:
+            print('Warning: The "' + table["name"] + '" table is not in the dump.')
+
+    print(
+        "Restoring the dump from " + manifest["snapshot_time"] + ".",
+        flush=True,
+    )
+    if args.recreate:
+        recreate_database()
+    create_tables(table_statements, [table["name"] for table in tables])
+    database.get_pool(args.workers + 1)
+
+    # The biggest files go first, so that they are not the last ones to finish
+    tasks = []
+    for table in tables:
+        if table["name"] in dump_tables:
+            dump_table = dump_tables[table["name"]]
+            for file_entry in dump_table["files"]:
+                tasks.append([dump_table, file_entry])
+    tasks.sort(key=lambda task: -task[1]["bytes"])
+    stats = {}
+    run_tasks(
+        args.workers,
+        tasks,
+        lambda task: load_file(args.dump_dir, *task),
+        lambda task, result: finish_load(stats, task, result),
+    )
+
+    reset_sequences(tables)
+
+    # A foreign key needs the primary key or the unique constraint that it references
+    index_start_time = time.monotonic()
+    run_tasks(
+        args.workers,
+        index_statements,
+        run_maintenance_statement,
+        finish_maintenance_statement,
+    )
+    run_tasks(
+        args.workers,
+        foreign_key_statements + ["ANALYZE " + table["name"] for table in tables],
+        run_maintenance_statement,
+        finish_maintenance_statement,
+    )
+    index_elapsed = time.monotonic() - index_start_time
+    database.close_pool()
+
+    dump_db.print_stats(stats, [table["name"] for table in tables])
+    print("Total rows:", sum(table_stats["rows"] for table_stats in stats.values()))
+    print("Total index time: " + "{:.2f}".format(index_elapsed) + " seconds")
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Restore a dump of the database in parallel."
+    )
+    parser.add_argument("dump_dir", help="the directory of the dump")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="the number of files to load at the same time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--recreate",
+        action="store_true",
+        help='drop and create the database first (as the "postgres" user)',
+    )
+    args = parser.parse_args()
+    if args.workers <= 0:
+        print("The number of workers must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+# Like "import_db.sh", this assumes that "postgres" and the database user share the same password
+def recreate_database():
+    parameters = database.get_connection_parameters()
+    admin_parameters = dict(parameters, user="postgres", database="postgres")
+    conn = psycopg2.connect(**admin_parameters)
+    # "DROP DATABASE" and "CREATE DATABASE" cannot run inside of a transaction
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(
+        psycopg2.sql.SQL("DROP DATABASE IF EXISTS {}").format(
+            psycopg2.sql.Identifier(parameters["database"])
+        )
+    )
+    cursor.execute(
+        psycopg2.sql.SQL("CREATE DATABASE {} OWNER {}").format(
+            psycopg2.sql.Identifier(parameters["database"]),
+            psycopg2.sql.Identifier(parameters["user"]),
+        )
+    )
+    cursor.close()
+    conn.close()
+    print("Recreated the " + parameters["database"] + " database.", flush=True)
+
+
+# Create the tables without their indexes and keys; they are emptied, since the schema inserts some
+# default rows that are also in the dump
+def create_tables(table_statements, table_names):
+    conn = database.connect()
+    with database.transaction(conn):
+        cursor = conn.cursor()
+        for statement in table_statements:
+            cursor.execute(statement)
+        cursor.execute("TRUNCATE " + ", ".join(table_names))
+        cursor.close()
+    conn.close()
+
+
+# Run "work(task)" for every task on a pool of threads, and call "finish(task, result)" from the
+# main thread as every task finishes
+def run_tasks(num_workers, tasks, work, finish):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = {}
+        for task in tasks:
+            futures[executor.submit(work, task)] = task
+        for future in concurrent.futures.as_completed(futures):
+            finish(futures[future], future.result())
+
+
+# Returns when the load of the file started and ended
+def load_file(dump_dir, table, file_entry):
+    start_time = time.monotonic()
+    with database.pooled_connection() as conn:
+        cursor = conn.cursor()
+        # The whole restore is redone if anything fails, so there is no need to wait for the disk
+        cursor.execute("SET synchronous_commit = off")
+        path = os.path.join(dump_dir, file_entry["file"])
+        with gzip.open(path, "rb") as input_file:
+            cursor.copy_expert(
+                "COPY "
+                + table["name"]
+                + " ("
+                + ", ".join(table["columns"])
+                + ") FROM STDIN",
+                input_file,
+                size=COPY_BUFFER_SIZE,
+            )
+        cursor.close()
+        conn.commit()
+
+    return start_time, time.monotonic()
+
+
+def finish_load(stats, task, result):
+    [table, file_entry] = task
+    [start_time, end_time] = result
+    dump_db.add_stats(stats, table["name"], file_entry, start_time, end_time)
+    print(
+        "Loaded " + file_entry["file"] + " (" + str(file_entry["rows"]) + " rows)",
+        flush=True,
+    )
+
+
+# The rows were loaded with their IDs, so the sequences have to be moved past them; otherwise, the
+# next insert would fail with a duplicate key
+def reset_sequences(tables):
+    conn = database.connect()
+    with database.transaction(conn):
+        cursor = conn.cursor()
+        for table in tables:
+            for column in table["serial_columns"]:
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX("
+                    + column
+                    + "), 1), MAX("
+                    + column
+                    + ") IS NOT NULL) FROM "
+                    + table["name"],
+                    (table["name"], column),
+                )
+        cursor.close()
+    conn.close()
+
+
+# Returns the number of seconds that the statement took
+def run_maintenance_statement(statement):
+    start_time = time.monotonic()
+    with database.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET maintenance_work_mem = %s", (INDEX_MAINTENANCE_WORK_MEM,))
+        cursor.execute(statement)
+        cursor.close()
+        conn.commit()
+
+    return time.monotonic() - start_time
+
+
+def finish_maintenance_statement(statement, elapsed):
+    print(
+        "Finished in "
+        + "{:.2f}".format(elapsed)
+        + " seconds: "
+        + " ".join(statement.split()),
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+# This script maintains the "seed_stats" and "user_variant_max_scores" rollup tables, so that the
+# pages can read a handful of precomputed rows instead of going through every game of a seed or of
+# a user (the history pages get the number of games on every seed from "seed_stats", plus the games
+# after the watermark of this script)
+# The tables are created in an existing database by "install/database_migrations.sql"
+# - "seed_stats" has the number of games, the best score, and the users with a max score for
+#   every seed
+# - "user_variant_max_scores" has a bitset of the variants that a user has a max score on for every
+#   player count (like "httpGetVariantStatsList()", every game counts, even with modifiers)
+#
+# By default, only the games that were finished since the last run are added to the rollups
+# The games are processed in order, one range of game IDs per transaction, and the watermark is
+# saved in the same transaction as the range, so that no game is ever counted twice
+# (unlike the prune scripts, the ranges cannot be processed in parallel for this reason)
+# Games that are deleted afterwards are not removed from the rollups; use "--full" to rebuild the
+# tables from scratch
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import json
+import os
+import time
+import numpy
+import database
+
+# Constants
+JOB_NAME = "rollup_stats"
+# The number of game IDs that are added to the rollups per transaction
+DEFAULT_BATCH_SIZE = 10000
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    max_scores = load_max_scores()
+    conn = database.connect()
+    cursor = conn.cursor()
+    load_variant_max_scores(cursor, max_scores)
+    conn.commit()
+
+    if args.full:
+        # The watermark is reset in the same transaction, so an interrupted rebuild resumes from
+        # where it stopped
+        cursor.execute("TRUNCATE seed_stats, user_variant_max_scores")
+        database.set_watermark(conn, JOB_NAME, {"id": 0})
+        print("Rebuilding the rollups from every game.", flush=True)
+        last_game_id = 0
+    else:
+        watermark = database.get_watermark(conn, JOB_NAME)
+        if watermark is None:
+            print(
+                "The rollups have never been built; run this script with --full first."
+            )
+            sys.exit(1)
+        print(
+            "Adding the games after "
+            + database.describe_watermark(watermark)
+            + " to the rollups.",
+            flush=True,
+        )
+        last_game_id = watermark["id"]
+
+    # The watermark only moves forward, so the games that are still being written (and could have
+    # no participants yet) are left for the next run
+    max_game_id = database.get_settled_max_id(conn, "games", "datetime_finished")
+
+    num_seed_rows = 0
+    num_max_score_rows = 0
+    for low in range(last_game_id + 1, max_game_id + 1, args.batch_size):
+        high = min(low + args.batch_size, max_game_id + 1)
+        watermark = database.make_watermark(
+            conn, "games", high - 1, "datetime_finished"
+        )
+
+        num_seed_rows += update_seed_stats(cursor, low, high)
+        num_max_score_rows += update_user_variant_max_scores(
+            cursor, low, high, len(max_scores)
+        )
+        # This commits the range and the watermark together
+        database.set_watermark(conn, JOB_NAME, watermark)
+
+        print(
+            "Finished game IDs [" + str(low) + ", " + str(high) + ")",
+            flush=True,
+        )
+
+    cursor.close()
+    conn.close()
+
+    print("Total seed rows updated:", num_seed_rows)
+    print("Total max score rows updated:", num_max_score_rows)
+    print("Total time: " + "{:.2f}".format(time.monotonic() - start_time) + " seconds")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Update the seed_stats and user_variant_max_scores tables."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="the number of game IDs to add per transaction (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="rebuild the rollups from every game instead of only adding the new games",
+    )
+    args = parser.parse_args()
+    if args.batch_size <= 0:
+        print("The batch size must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+# Returns a list of "[variant ID, max score]"
+def load_max_scores():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    variants_path = os.path.join(dir_path, "..", "..", "data", "variants.json")
+    with open(variants_path, "r") as variants_file:
+        variants = json.load(variants_file)
+
+    # This matches the "MaxScore" field in "variants.go"
+    return [[variant["id"], len(variant["suits"]) * 5] for variant in variants.values()]
+
+
+# The max score of every variant is needed to find the max score games in the queries below
+def load_variant_max_scores(cursor, max_scores):
+    cursor.execute("""
+        CREATE TEMPORARY TABLE variant_max_scores (
+            variant    SMALLINT  NOT NULL  PRIMARY KEY,
+            max_score  SMALLINT  NOT NULL
+        )
+        """)
+    database.copy_rows(
+        cursor, "variant_max_scores", ["variant", "max_score"], max_scores
+    )
+    cursor.execute("ANALYZE variant_max_scores")
+
+
+# Add the games with an ID in the range of [low, high) to the "seed_stats" table
+# Returns the number of rows that were inserted or updated
+def update_seed_stats(cursor, low, high):
+    # Games of variants that no longer exist still count towards the number of games
+    cursor.execute(
+        """
+        WITH new_games AS (
+            SELECT
+                games.id,
+                games.seed,
+                games.score,
+                COALESCE(games.score = variant_max_scores.max_score, FALSE) AS max_score
+            FROM games
+            LEFT JOIN variant_max_scores ON variant_max_scores.variant = games.variant
+            WHERE games.id >= %(low)s AND games.id < %(high)s
+        ), max_score_users AS (
+            SELECT
+                new_games.seed,
+                ARRAY_AGG(DISTINCT game_participants.user_id ORDER BY game_participants.user_id)
+                    AS user_ids
+            FROM new_games
+            JOIN game_participants ON game_participants.game_id = new_games.id
+            WHERE new_games.max_score
+            GROUP BY new_games.seed
+        )
+        INSERT INTO seed_stats (
+            seed,
+            num_games,
+            best_score,
+            num_max_scores,
+            max_score_user_ids
+        )
+        SELECT
+            new_games.seed,
+            COUNT(*),
+            MAX(new_games.score),
+            COUNT(*) FILTER (WHERE new_games.max_score),
+            COALESCE(max_score_users.user_ids, '{}')
+        FROM new_games
+        LEFT JOIN max_score_users ON max_score_users.seed = new_games.seed
+        GROUP BY new_games.seed, max_score_users.user_ids
+        ON CONFLICT (seed) DO UPDATE SET
+            num_games = seed_stats.num_games + EXCLUDED.num_games,
+            best_score = GREATEST(seed_stats.best_score, EXCLUDED.best_score),
+            num_max_scores = seed_stats.num_max_scores + EXCLUDED.num_max_scores,
+            max_score_user_ids = ARRAY(
+                SELECT DISTINCT UNNEST(
+                    seed_stats.max_score_user_ids || EXCLUDED.max_score_user_ids
+                )
+                ORDER BY 1
+            )
+        """,
+        {"low": low, "high": high},
+    )
+    return cursor.rowcount
+
+
+# Add the max scores of the games with an ID in the range of [low, high) to the
+# "user_variant_max_scores" table
+# Returns the number of rows that were inserted or updated
+def update_user_variant_max_scores(cursor, low, high, num_variants):
+    [user_ids, num_players, variants] = database.copy_query_columns(
+        cursor,
+        """
+        SELECT game_participants.user_id, games.num_players, games.variant
+        FROM games
+        JOIN variant_max_scores ON variant_max_scores.variant = games.variant
+        JOIN game_participants ON game_participants.game_id = games.id
+        WHERE games.id >= %(low)s
+            AND games.id < %(high)s
+            AND games.score = variant_max_scores.max_score
+        """,
+        [numpy.int64, numpy.int64, numpy.int64],
+        {"low": low, "high": high},
+    )
+    if len(user_ids) == 0:
+        return 0
+
+    # Build the bitset of the new max scores for every user and player count
+    # (the bits are in the same order as "get_bit()" in PostgreSQL)
+    [keys, group_indexes] = numpy.unique(
+        user_ids * 8 + num_players, return_inverse=True
+    )
+    highest_variant = max(num_variants, int(variants.max()) + 1)
+    bitsets = numpy.zeros((len(keys), (highest_variant + 7) // 8), dtype=numpy.uint8)
+    numpy.bitwise_or.at(
+        bitsets,
+        (group_indexes, variants // 8),
+        (1 << (variants % 8)).astype(numpy.uint8),
+    )
+    key_user_ids = (keys // 8).tolist()
+    key_num_players = (keys % 8).tolist()
+
+    # Merge them with the existing bitsets
+    cursor.execute(
+        """
+        SELECT user_id, num_players, max_scores
+        FROM user_variant_max_scores
+        WHERE (user_id, num_players) IN (
+            SELECT * FROM UNNEST(%s::INTEGER[], %s::SMALLINT[])
+        )
+        FOR UPDATE
+        """,
+        (key_user_ids, key_num_players),
+    )
+    key_indexes = dict(zip(keys.tolist(), range(len(keys))))
+    existing_bitsets = {}
+    for [user_id, player_count, max_scores] in cursor.fetchall():
+        existing_bitsets[key_indexes[user_id * 8 + player_count]] = numpy.frombuffer(
+            bytes(max_scores), dtype=numpy.uint8
+        )
+
+    rows = []
+    for i in range(len(keys)):
+        bitset = bitsets[i]
+        if i in existing_bitsets:
+            existing_bitset = existing_bitsets[i]
+            if len(existing_bitset) > len(bitset):
+                bitset = numpy.pad(bitset, (0, len(existing_bitset) - len(bitset)))
+            bitset[: len(existing_bitset)] |= existing_bitset
+        rows.append(
+            (
+                key_user_ids[i],
+                key_num_players[i],
+                bitset.tobytes(),
+                int(numpy.unpackbits(bitset).sum()),
+            )
+        )
+
+    database.execute_values(
+        cursor,
+        """
+        INSERT INTO user_variant_max_scores (
+            user_id,
+            num_players,
+            max_scores,
+            num_max_scores
+        )
+        VALUES %s
+        ON CONFLICT (user_id, num_players) DO UPDATE SET
+            max_scores = EXCLUDED.max_scores,
+            num_max_scores = EXCLUDED.num_max_scores
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+if __name__ == "__main__":
+    main()
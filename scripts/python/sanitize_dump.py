@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# This script writes a sanitized dump of the production database that can be loaded on a
+# development machine with the "restore_db.py" script (it replaces the "sanitize_local_db.sh"
+# script, which had to restore a full copy first and then rewrite it in place)
+# The tables are read with "COPY ... TO STDOUT" (in the same way as the "dump_db.py" script) and
+# the sanitization rules are applied to every row on the way to the dump:
+# - The IP address of every user is blanked
+# - The password hashes of every user are cleared, so the restored users cannot log in (new users
+#   can still register)
+# - The usernames are replaced by a salted hash, if "--hash-usernames" is specified
+# - The tables with personal data (settings, friends, chat, and IP addresses) are left empty
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import hashlib
+import os
+import secrets
+import dump_db
+
+# Constants
+BLANK_IP = "0.0.0.0"
+DROPPED_TABLES = [
+    "user_settings",
+    "user_friends",
+    "user_reverse_friends",
+    "chat_log",
+    "chat_log_pm",
+    "banned_ips",
+    "muted_ips",
+    "throttled_ips",
+]
+# The number of hexadecimal digits of the hash that are kept in a username
+USERNAME_HASH_LENGTH = 12
+
+
+def main():
+    args = parse_args()
+
+    if not os.path.exists(args.dump_dir):
+        os.makedirs(args.dump_dir)
+    if os.path.exists(os.path.join(args.dump_dir, dump_db.MANIFEST_FILE_NAME)):
+        print("There is already a dump in: " + args.dump_dir)
+        sys.exit(1)
+
+    salt = None
+    if args.hash_usernames:
+        # Without a salt, a username could be found by hashing a list of known usernames
+        salt = args.salt if args.salt is not None else secrets.token_hex(16)
+
+    dump_db.dump(
+        args.dump_dir,
+        args.workers,
+        args.chunks,
+        args.compress_level,
+        transforms={"users": lambda row: sanitize_user(row, salt)},
+        dropped_tables=DROPPED_TABLES,
+    )
+    print("Left empty: " + ", ".join(DROPPED_TABLES))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Write a sanitized dump of the database."
+    )
+    parser.add_argument("dump_dir", help="the directory to write the dump to")
+    parser.add_argument(
+        "--hash-usernames",
+        action="store_true",
+        help="replace every username with a hash",
+    )
+    parser.add_argument(
+        "--salt",
+        help="the salt of the username hashes, to get the same hashes on every run "
+        + "(default: a random salt)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=dump_db.DEFAULT_WORKERS,
+        help="the number of files to dump at the same time (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        default=dump_db.DEFAULT_CHUNKS,
+        help="the number of key ranges to split the big tables into (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        default=dump_db.DEFAULT_COMPRESS_LEVEL,
+        help="the gzip compression level, from 1 to 9 (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.workers <= 0 or args.chunks <= 0:
+        print("The number of workers and chunks must be positive numbers.")
+        sys.exit(1)
+    if args.compress_level < 1 or args.compress_level > 9:
+        print("The compression level must be between 1 and 9.")
+        sys.exit(1)
+    if args.salt is not None and not args.hash_usernames:
+        print("A salt can only be used with --hash-usernames.")
+        sys.exit(1)
+
+    return args
+
+
+def sanitize_user(row, salt):
+    row["last_ip"] = BLANK_IP
+    # A hash is enough to brute-force a weak password offline, so no hash leaves the server
+    row["password_hash"] = None
+    row["old_password_hash"] = None
+    if salt is not None:
+        # The hash is already lowercase ASCII, so it is also a valid normalized username
+        username_hash = hashlib.sha256(
+            (salt + row["normalized_username"]).encode("utf-8")
+        ).hexdigest()
+        row["username"] = "user_" + username_hash[:USERNAME_HASH_LENGTH]
+        row["normalized_username"] = row["username"]
+
+    return row
+
+
+if __name__ == "__main__":
+    main()
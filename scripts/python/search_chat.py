@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+# This script searches the chat index that is built by the "chat_index.py" script, without
+# connecting to the database
+# The query is matched as a phrase of whole words (case-insensitive), e.g. "good game" matches
+# "Good game!" but not "game good" or "goodgame"
+# The results can be filtered by sender (a user of the website or a Discord name), by room (for
+# the chat), or by recipient (for private messages), and are printed from the newest to the oldest
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import time
+import chat_index
+
+# Constants
+DEFAULT_LIMIT = 100
+# The messages from Discord and from the server are both sent by user 0
+# (the Discord messages are the ones with a Discord name)
+SERVER_USER_ID = 0
+
+
+def main():
+    args = parse_args()
+    start_time = time.monotonic()
+
+    users = chat_index.read_users(args.index_dir)
+    user_ids = {username.lower(): user_id for [user_id, username] in users.items()}
+
+    table = "chat_log_pm" if args.pm else "chat_log"
+    facets = []
+    if args.user is not None:
+        facets.append(chat_index.user_facet(get_user_id(user_ids, args.user)))
+    if args.discord_user is not None:
+        facets.append(chat_index.discord_user_facet(args.discord_user))
+    if args.room is not None:
+        target = chat_index.get_room_target(args.room)
+        if target is None:
+            print('The room must be "lobby" or "table" followed by a table ID.')
+            sys.exit(1)
+        facets.append(chat_index.target_facet(target))
+    if args.recipient is not None:
+        facets.append(chat_index.target_facet(get_user_id(user_ids, args.recipient)))
+
+    words = chat_index.tokenize(args.query)
+    if len(words) == 0 and len(facets) == 0:
+        print("Specify a query, a user, a Discord user, a room, or a recipient.")
+        sys.exit(1)
+
+    index = chat_index.ChatIndex(args.index_dir, table)
+    num_results = 0
+    for message in index.search(words, facets):
+        if num_results >= args.limit:
+            print("(stopped after " + str(args.limit) + " results; use --limit)")
+            break
+        print(format_message(message, users, args.pm))
+        num_results += 1
+    index.close()
+
+    elapsed = (time.monotonic() - start_time) * 1000
+    print(
+        "Found "
+        + str(num_results)
+        + " messages in "
+        + "{:.1f}".format(elapsed)
+        + " milliseconds."
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search the chat index.")
+    parser.add_argument("index_dir", help="the directory of the chat index")
+    parser.add_argument(
+        "query", nargs="?", default="", help="the words to search for, as a phrase"
+    )
+    parser.add_argument(
+        "--pm",
+        action="store_true",
+        help="search the private messages instead of the chat",
+    )
+    parser.add_argument("--user", help="only show the messages sent by this user")
+    parser.add_argument(
+        "--discord-user",
+        help="only show the messages sent from Discord by this Discord name",
+    )
+    parser.add_argument(
+        "--room",
+        help='only show the messages in this room (e.g. "lobby" or "table123")',
+    )
+    parser.add_argument(
+        "--recipient", help="only show the private messages sent to this user"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=DEFAULT_LIMIT,
+        help="the maximum number of messages to show (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.room is not None and args.pm:
+        print("Private messages do not have a room; use --recipient instead.")
+        sys.exit(1)
+    if args.discord_user is not None and args.pm:
+        print("Private messages are never sent from Discord.")
+        sys.exit(1)
+    if args.user is not None and args.discord_user is not None:
+        print("A message can not be sent by both a user and a Discord user.")
+        sys.exit(1)
+    if args.recipient is not None and not args.pm:
+        print("Only private messages have a recipient; use --pm.")
+        sys.exit(1)
+    if args.limit <= 0:
+        print("The limit must be a positive number.")
+        sys.exit(1)
+
+    return args
+
+
+def get_user_id(user_ids, username):
+    user_id = user_ids.get(username.lower())
+    if user_id is None:
+        print('The user of "' + username + '" is not in the chat index.')
+        sys.exit(1)
+    return user_id
+
+
+def get_username(users, user_id):
+    if user_id == SERVER_USER_ID:
+        return "(server)"
+    return users.get(user_id, "(user " + str(user_id) + ")")
+
+
+def get_sender_name(users, message):
+    if message["discord_name"] != "":
+        return message["discord_name"] + " (Discord)"
+    return get_username(users, message["user_id"])
+
+
+def format_message(message, users, pm):
+    if pm:
+        location = "to " + get_username(users, message["target"])
+    else:
+        location = "#" + chat_index.get_room_name(message["target"])
+
+    return (
+        "["
+        + message["datetime_sent"].strftime("%Y-%m-%d %H:%M:%S")
+        + "] ("
+        + str(message["id"])
+        + ") "
+        + location
+        + " <"
+        + get_sender_name(users, message)
+        + "> "
+        + message["text"]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+
+# This script reproduces the shuffled deck of a game from its seed (e.g. "p2v5s1"), exactly like
+# the server does in "command_table_start.go":
+# - "InitDeck()" adds the cards of every suit in order (see "variant_tables.get_card_counts()")
+# - "setSeed()" seeds "math/rand" with the CRC-64 checksum of the seed string
+# - "ShuffleDeck()" swaps every card with a card chosen by "rand.Intn()"
+# The Go random number generator is ported in "go_rand.py"
+#
+# Decks are returned as a NumPy array with one row per seed and one card identity per column,
+# where a card identity is "suit index * number of ranks + rank index" (like in
+# "simulate_variants.py"); a large number of seeds can be split between several processes
+#
+# Examples:
+#   ./seed_decks.py p2v0s1
+#   ./seed_decks.py --players 3 --variant "No Variant" --first 1 --last 1000000 --output decks.npy
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import re
+import numpy
+import go_rand
+import variant_tables
+
+# Constants
+SEED_REGEX = re.compile(r"^p(\d+)v(\d+)s")
+DEFAULT_BATCH_SIZE = 10000
+# The decks of some seeds, as dealt by the server (from top to bottom)
+GOLDEN_DECKS = {
+    "p2v0s1": (
+        "b5 p4 b3 r4 g1 b3 b1 r1 g2 g4 r2 b2 g2 p1 r2 r1 b1 y3 y4 r1 "
+        "y4 g4 p2 p3 p1 r4 g5 y2 p1 y1 y5 y1 g3 r5 p3 y2 b1 g3 y3 b4 "
+        "y1 r3 b4 r3 g1 b2 g1 p4 p5 p2"
+    ),
+    "p3v40s17": (
+        "g4 p3 y4 y3 g2 p4 y4 y2 g1 y2 p2 t5 r3 tS r4 b5 g5 t4 r2 y3 "
+        "y5 gS rS r2 b3 p3 p2 t3 t4 t2 pS b2 t2 b3 r1 bS p4 p1 r4 g2 "
+        "yS b4 t1 t3 b4 g3 y1 r5 b1 p5 r3 g3 g4 b2"
+    ),
+    "p4v1343s2": (
+        "r2 g4 p4 y3 y1 g4 p2 y2 b3 p3 b4 p5 p3 r3 p4 g1 b2 p1 p5 p2 "
+        "r1 g5 g3 r5 g1 g3 p5 y5 r2 y1 b5 b1 r4 b1 r1 r4 b3 r3 y2 b4 "
+        "g2 b2 g2 y3 b1 y4 y1 g1 r1 y4"
+    ),
+    "p5v3s123456": (
+        "g4 p4 g3 m1 p5 m2 b4 g1 g1 r3 g2 r2 b1 y3 p2 m4 y4 r4 p1 y2 "
+        "r1 m2 b3 p1 r5 b5 p1 m3 y1 b2 g4 y1 b3 m1 m3 p3 m4 g1 y2 r1 "
+        "y3 p4 r3 m1 y5 b4 g3 g2 g5 b2 p2 b1 b1 m5 r4 r2 y4 r1 p3 y1"
+    ),
+}
+
+
+# Returns the card identities of the unshuffled deck, in the same order as "InitDeck()"
+def get_base_deck(variant_name, variant, suits, colors):
+    variant_suits = [
+        variant_tables.get_suit(suit_name, suits, colors)
+        for suit_name in variant["suits"]
+    ]
+    up_or_down = variant_tables.is_up_or_down(variant_name)
+    ranks = (
+        variant_tables.RANKS + [variant_tables.START_CARD_RANK]
+        if up_or_down
+        else variant_tables.RANKS
+    )
+    card_counts = variant_tables.get_card_counts(variant_suits, ranks, up_or_down)
+    return numpy.repeat(
+        numpy.arange(len(variant_suits) * len(ranks), dtype=numpy.int16),
+        numpy.array(card_counts).ravel(),
+    )
+
+
+# Returns the shuffled decks of the seeds, with one row per seed
+def shuffle_decks(seeds, base_deck):
+    num_seeds = len(seeds)
+    rng = go_rand.GoRand(go_rand.get_seed_values(seeds))
+    decks = numpy.tile(base_deck, (num_seeds, 1))
+    rows = numpy.arange(num_seeds)
+    for i in range(len(base_deck)):
+        j = rng.intn(i + 1)
+        card = decks[rows, i].copy()
+        decks[rows, i] = decks[rows, j]
+        decks[rows, j] = card
+    return decks
+
+
+# Returns the shuffled decks of the seeds, split into batches of "batch_size" seeds and spread
+# over "num_workers" processes
+def get_decks(
+    seeds,
+    variant_name,
+    variant,
+    suits,
+    colors,
+    batch_size=DEFAULT_BATCH_SIZE,
+    num_workers=1,
+):
+    base_deck = get_base_deck(variant_name, variant, suits, colors)
+    batches = [seeds[i : i + batch_size] for i in range(0, len(seeds), batch_size)]
+    if len(batches) == 0:
+        return numpy.zeros((0, len(base_deck)), dtype=base_deck.dtype)
+    if num_workers == 1 or len(batches) == 1:
+        return numpy.concatenate([shuffle_decks(batch, base_deck) for batch in batches])
+
+    # The "spawn" start method behaves the same on every platform
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=context
+    ) as executor:
+        results = executor.map(
+            shuffle_decks, batches, [base_deck] * len(batches), chunksize=1
+        )
+        return numpy.concatenate(list(results))
+
+
+# Returns the seeds of the normal games from "first" to "last", like in "command_table_start.go"
+def get_seeds(num_players, variant_id, first, last):
+    seed_prefix = "p" + str(num_players) + "v" + str(variant_id) + "s"
+    return [seed_prefix + str(seed_num) for seed_num in range(first, last + 1)]
+
+
+# Returns the name of the variant from the prefix of the seed (e.g. "p2v5s1")
+def get_variant_name(seed, variants):
+    match = SEED_REGEX.match(seed)
+    if match is None:
+        return None
+    variant_id = int(match.group(2))
+    for [variant_name, variant] in variants.items():
+        if variant["id"] == variant_id:
+            return variant_name
+    return None
+
+
+# Returns the name of a card, like "r3" for a red 3
+# (the abbreviation of the suit follows the same defaults as "suitsInit()")
+def get_card_name(identity, variant_name, variant, suits, colors):
+    ranks = variant_tables.RANKS
+    if variant_tables.is_up_or_down(variant_name):
+        ranks = ranks + [variant_tables.START_CARD_RANK]
+    suit_name = variant["suits"][identity // len(ranks)]
+    if suit_name.endswith(variant_tables.SUIT_REVERSED_SUFFIX):
+        suit_name = suit_name[: -len(variant_tables.SUIT_REVERSED_SUFFIX)]
+    suit = suits[suit_name]
+    abbreviation = suit.get("abbreviation", "")
+    if abbreviation == "":
+        clue_colors = suit.get("clueColors", [suit_name])
+        if len(clue_colors) > 0 and clue_colors[0] in colors:
+            abbreviation = colors[clue_colors[0]].get("abbreviation", "")
+    if abbreviation == "":
+        abbreviation = suit_name[0]
+
+    rank = ranks[identity % len(ranks)]
+    rank_name = "S" if rank == variant_tables.START_CARD_RANK else str(rank)
+    return abbreviation.lower() + rank_name
+
+
+def main():
+    args = parse_args()
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    data_path = os.path.join(dir_path, "..", "..", "data")
+    with open(os.path.join(data_path, "variants.json"), "r") as variants_file:
+        variants = json.load(variants_file)
+    with open(os.path.join(data_path, "suits.json"), "r") as suits_file:
+        suits = json.load(suits_file)
+    with open(os.path.join(data_path, "colors.json"), "r") as colors_file:
+        colors = json.load(colors_file)
+
+    if args.check:
+        check(variants, suits, colors)
+        return
+
+    if len(args.seed) > 0:
+        for seed in args.seed:
+            variant_name = get_variant_name(seed, variants)
+            if variant_name is None:
+                print('The seed of "' + seed + '" does not have a valid variant.')
+                sys.exit(1)
+            variant = variants[variant_name]
+            [deck] = get_decks([seed], variant_name, variant, suits, colors)
+            print(
+                seed
+                + " ("
+                + variant_name
+                + "): "
+                + " ".join(
+                    get_card_name(identity, variant_name, variant, suits, colors)
+                    for identity in deck.tolist()
+                )
+            )
+        return
+
+    if args.variant not in variants:
+        print('The variant of "' + args.variant + '" does not exist.')
+        sys.exit(1)
+    variant = variants[args.variant]
+    seeds = get_seeds(args.players, variant["id"], args.first, args.last)
+    decks = get_decks(
+        seeds,
+        args.variant,
+        variant,
+        suits,
+        colors,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+    )
+    numpy.save(args.output, decks)
+    print(
+        "Wrote the decks of "
+        + str(len(seeds))
+        + " seeds ("
+        + seeds[0]
+        + " to "
+        + seeds[-1]
+        + ') to "'
+        + args.output
+        + '".'
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Reproduce the shuffled decks of seeds like the server does."
+    )
+    parser.add_argument("seed", nargs="*", help='the seeds to print (e.g. "p2v0s1")')
+    parser.add_argument("--players", type=int, help="the number of players")
+    parser.add_argument("--variant", help='the name of the variant (e.g. "No Variant")')
+    parser.add_argument(
+        "--first",
+        type=int,
+        default=1,
+        help="the number of the first seed (default: %(default)s)",
+    )
+    parser.add_argument("--last", type=int, help="the number of the last seed")
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        help='write the decks to PATH as a NumPy ".npy" file',
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="the number of seeds to shuffle at once (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="the number of processes to use (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the decks of some seeds to the decks dealt by the server",
+    )
+    args = parser.parse_args()
+
+    if args.check or len(args.seed) > 0:
+        return args
+    if (
+        args.players is None
+        or args.variant is None
+        or args.last is None
+        or args.output is None
+    ):
+        print(
+            "You must specify the seeds to print, or the --players, --variant, --last, and "
+            + "--output flags."
+        )
+        sys.exit(1)
+    if args.first <= 0 or args.last < args.first:
+        print("The seed numbers must be positive and in order.")
+        sys.exit(1)
+    if args.batch_size <= 0 or args.workers <= 0:
+        print("The batch size and the number of workers must be positive.")
+        sys.exit(1)
+
+    return args
+
+
+# Compare the decks of the seeds in "GOLDEN_DECKS" to the decks that the server dealt
+def check(variants, suits, colors):
+    success = True
+    for [seed, expected_deck] in GOLDEN_DECKS.items():
+        variant_name = get_variant_name(seed, variants)
+        variant = variants[variant_name]
+        [deck] = get_decks([seed], variant_name, variant, suits, colors)
+        card_names = " ".join(
+            get_card_name(identity, variant_name, variant, suits, colors)
+            for identity in deck.tolist()
+        )
+        if card_names == expected_deck:
+            print(seed + ": OK")
+        else:
+            print(seed + ": expected " + expected_deck + ", got " + card_names)
+            success = False
+
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
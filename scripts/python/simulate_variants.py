@@ -0,0 +1,802 @@
+#!/usr/bin/env python3
+
+# This script measures how difficult the variants are by having a simple bot play many games of
+# each variant and player count
+# The rules follow the server (see "game_player.go" and "variants_reversible.go"), including the
+# special suits, reversed suits, "Up or Down", "Throw It in a Hole", "Clue Starved", and
+# "Alternating Clues"; the deck composition and the clue touches come from "variant_tables.py"
+#
+# A batch of games of the same variant and player count is stored as flat NumPy arrays (one row
+# per game), so every game in the batch takes its turn at the same time
+# The bot sees every other hand, and it narrows down the cards in its own hand from the clues that
+# touched them and the clues that did not (and from the cards that are all played or discarded);
+# it follows a few simple conventions, in order of priority:
+# 1. Play a card that was given a play clue, or a card that can only be playable
+# 2. Give a play clue to a playable card that its holder does not know is playable (in the next
+#    player's hand first), unless another copy of it is already known to be playable
+# 3. Give a save clue to the next player's chop card if it is the last copy of a card
+# 4. Discard a card that can only be unplayable forever, or else the chop card (the oldest card
+#    that is not clued)
+# 5. With the maximum number of clues, clue the next player's oldest card; if that is not
+#    possible, blind-play the newest card
+# Each clue is the one that touches the most playable cards and the fewest other new cards
+# The bot does not use the cards in the other hands to narrow down its own cards, and it can not
+# measure the difficulty of the variants that only change how the cards are read (e.g. the
+# reversed suits give the same results as the normal suits)
+# The bot rarely gets the maximum score with 3 or more players, so the average score as a fraction
+# of the maximum score is the best measure of the difficulty of a variant
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import time
+import numpy
+import variant_efficiency
+import variant_tables
+
+# Constants
+# These match the values in "constants.go"
+MAX_CLUE_NUM = 8
+MAX_STRIKE_NUM = 3
+# These match the stack directions in "variants_reversible.go"
+STACK_DIRECTION_UNDECIDED = 0
+STACK_DIRECTION_UP = 1
+STACK_DIRECTION_DOWN = 2
+STACK_DIRECTION_FINISHED = 3
+DEFAULT_NUM_GAMES = 1000
+DEFAULT_BATCH_SIZE = 1000
+BENCHMARK_VARIANT = "No Variant"
+BENCHMARK_NUM_PLAYERS = 3
+BENCHMARK_NUM_GAMES = 20000
+
+
+class GameBatch:
+    def __init__(
+        self, variant_name, variant, suits, colors, num_players, num_games, rng
+    ):
+        tables = variant_tables.get_variant_tables(variant_name, variant, suits, colors)
+        self.num_players = num_players
+        self.num_games = num_games
+        self.hand_size = variant_efficiency.CARDS_PER_HAND[num_players]
+        self.num_suits = len(tables["cardCounts"])
+        self.ranks = numpy.array(tables["ranks"], dtype=numpy.int8)
+        self.num_ranks = len(self.ranks)
+        self.max_score = tables["maxScore"]
+        self.throw_it_in_a_hole = variant_name.startswith("Throw It in a Hole")
+        self.alternating_clues = variant_name.startswith("Alternating Clues")
+        clue_starved = variant_name.startswith("Clue Starved")
+        # In "Clue Starved", each clue costs two clue tokens and a discard gives one
+        self.clue_cost = 2 if clue_starved else 1
+        self.clue_limit = MAX_CLUE_NUM * self.clue_cost
+
+        # Every card identity is "suit index * number of ranks + rank index"
+        # The identity after the last one is a sentinel for an empty hand slot or an empty deck
+        self.num_identities = self.num_suits * self.num_ranks
+        self.no_card = self.num_identities
+        self.card_counts = numpy.append(
+            numpy.array(tables["cardCounts"], dtype=numpy.int16).ravel(), 0
+        )
+        # A bitmask of every clue that touches each card identity
+        # (the color clues are the low bits and the rank clues are the high bits)
+        num_clue_colors = len(tables["clueColors"])
+        num_clue_ranks = len(tables["clueRanks"])
+        self.num_clue_bits = num_clue_colors + num_clue_ranks
+        self.color_clue_bits = (1 << num_clue_colors) - 1
+        self.rank_clue_bits = ((1 << num_clue_ranks) - 1) << num_clue_colors
+        self.clue_touches = numpy.append(
+            numpy.array(tables["colorClueTouches"], dtype=numpy.int64).ravel()
+            | (
+                numpy.array(tables["rankClueTouches"], dtype=numpy.int64).ravel()
+                << num_clue_colors
+            ),
+            0,
+        )
+        # A bitmask of the card identities that each clue touches
+        # (the set of identities that a card could be is stored as a bitmask of identities too)
+        self.identity_bits = numpy.left_shift(
+            1, numpy.arange(self.num_identities, dtype=numpy.int64)
+        )
+        self.clue_identities = numpy.array(
+            [
+                self.identity_bits[
+                    (self.clue_touches[: self.num_identities] & (1 << bit_index)) != 0
+                ].sum()
+                for bit_index in range(self.num_clue_bits)
+            ],
+            dtype=numpy.int64,
+        )
+
+        # Shuffle a deck for every game
+        # The position after the last card of the deck is a sentinel for an empty hand slot
+        base_deck = numpy.repeat(
+            numpy.arange(self.num_identities, dtype=numpy.int16), self.card_counts[:-1]
+        )
+        self.deck_size = len(base_deck)
+        self.empty_slot = self.deck_size
+        self.deck = numpy.full(
+            (num_games, self.deck_size + 1), self.no_card, dtype=numpy.int16
+        )
+        self.deck[:, : self.deck_size] = rng.permuted(
+            numpy.tile(base_deck, (num_games, 1)), axis=1
+        )
+
+        # The state of each card in the deck (by position)
+        # (including the identities that the card could be from the clues that touched it and the
+        # clues that did not, where an empty hand slot can not be any card)
+        self.clued = numpy.zeros((num_games, self.deck_size + 1), dtype=numpy.bool_)
+        self.play_clued = numpy.zeros(
+            (num_games, self.deck_size + 1), dtype=numpy.bool_
+        )
+        self.clue_possible = numpy.full(
+            (num_games, self.deck_size + 1),
+            self.identity_bits.sum(),
+            dtype=numpy.int64,
+        )
+        self.clue_possible[:, self.empty_slot] = 0
+
+        # Deal the cards; slot 0 is the newest card in each hand
+        self.hands = numpy.empty(
+            (num_games, num_players, self.hand_size), dtype=numpy.int16
+        )
+        for player_index in range(num_players):
+            for slot in range(self.hand_size):
+                self.hands[:, player_index, slot] = (
+                    player_index * self.hand_size + self.hand_size - 1 - slot
+                )
+        self.deck_index = numpy.full(
+            num_games, num_players * self.hand_size, dtype=numpy.int16
+        )
+
+        # The play stacks store the rank of the last played card
+        # (normal suits start going up, reversed suits start going down,
+        # and the suits in "Up or Down" start undecided)
+        self.stacks = numpy.zeros((num_games, self.num_suits), dtype=numpy.int8)
+        if variant_tables.is_up_or_down(variant_name):
+            initial_directions = [STACK_DIRECTION_UNDECIDED] * self.num_suits
+        else:
+            initial_directions = [
+                (
+                    STACK_DIRECTION_DOWN
+                    if suit_name.endswith(variant_tables.SUIT_REVERSED_SUFFIX)
+                    else STACK_DIRECTION_UP
+                )
+                for suit_name in variant["suits"]
+            ]
+        self.directions = numpy.tile(
+            numpy.array(initial_directions, dtype=numpy.int8), (num_games, 1)
+        )
+        self.played = numpy.zeros(
+            (num_games, self.num_identities + 1), dtype=numpy.bool_
+        )
+        self.discarded = numpy.zeros(
+            (num_games, self.num_identities + 1), dtype=numpy.int16
+        )
+
+        self.score = numpy.zeros(num_games, dtype=numpy.int16)
+        self.strikes = numpy.zeros(num_games, dtype=numpy.int8)
+        self.clue_tokens = numpy.full(num_games, self.clue_limit, dtype=numpy.int8)
+        # -1 means that no clue has been given yet
+        self.last_clue_type = numpy.full(num_games, -1, dtype=numpy.int8)
+        self.turn = 0
+        self.end_turn = numpy.full(num_games, -1, dtype=numpy.int32)
+        self.done = numpy.zeros(num_games, dtype=numpy.bool_)
+        self.games = numpy.arange(num_games)
+
+    # Play every game to the end and return "[the final scores, whether each game struck out]"
+    # (a strikeout has a score of 0, like on the server)
+    def run(self):
+        while not self.done.all():
+            self.take_turn()
+
+        struck_out = self.strikes >= MAX_STRIKE_NUM
+        scores = self.score.copy()
+        scores[struck_out] = 0
+        return [scores, struck_out]
+
+    # Returns a boolean for every card identity of every game
+    def get_playable(self):
+        tops = self.stacks[:, :, numpy.newaxis]
+        directions = self.directions[:, :, numpy.newaxis]
+        ranks = self.ranks[numpy.newaxis, numpy.newaxis, :]
+        start = variant_tables.START_CARD_RANK
+
+        up = (directions == STACK_DIRECTION_UP) & (ranks == tops + 1)
+        down = (directions == STACK_DIRECTION_DOWN) & (
+            ((tops == 0) & (ranks == 5)) | ((tops != 0) & (ranks == tops - 1))
+        )
+        undecided = (directions == STACK_DIRECTION_UNDECIDED) & (
+            ((tops == 0) & ((ranks == 1) | (ranks == 5) | (ranks == start)))
+            | ((tops == start) & ((ranks == 2) | (ranks == 4)))
+        )
+
+        playable = numpy.zeros(
+            (self.num_games, self.num_identities + 1), dtype=numpy.bool_
+        )
+        playable[:, : self.num_identities] = (up | down | undecided).reshape(
+            self.num_games, self.num_identities
+        )
+        return playable
+
+    def take_turn(self):
+        games = self.games
+        player_index = self.turn % self.num_players
+        hand = self.hands[:, player_index, :]
+        active = ~self.done
+        playable = self.get_playable()
+        can_clue = self.clue_tokens >= self.clue_cost
+
+        # The card identities that their holder already knows to be playable in any hand should
+        # not be clued again
+        all_hands = self.hands.reshape(self.num_games, -1)
+        all_cards = self.deck[games[:, numpy.newaxis], all_hands]
+        possible = self.get_possible()
+        known_playable = self.get_known_playable(possible, playable).reshape(
+            self.num_games, -1
+        )
+        known_playable_identities = numpy.zeros_like(playable)
+        known_playable_identities[
+            numpy.nonzero(known_playable)[0], all_cards[known_playable]
+        ] = True
+        known_playable = known_playable.reshape(self.hands.shape)
+
+        # 1. Play a card that was given a play clue, or a card that can only be playable
+        own_playable = known_playable[:, player_index, :]
+        play = active & own_playable.any(axis=1)
+        play_slot = numpy.argmax(own_playable, axis=1)
+
+        # 2. Give a play clue
+        clue_target = numpy.full(self.num_games, -1, dtype=numpy.int64)
+        clue_focus = numpy.zeros(self.num_games, dtype=numpy.int64)
+        for offset in range(1, self.num_players):
+            target = (player_index + offset) % self.num_players
+            positions = self.hands[:, target, :]
+            cards = self.deck[games[:, numpy.newaxis], positions]
+            candidates = (
+                playable[games[:, numpy.newaxis], cards]
+                & ~known_playable[:, target, :]
+                & ~known_playable_identities[games[:, numpy.newaxis], cards]
+                & (self.get_allowed_clues(cards) != 0)
+            )
+            found = (clue_target == -1) & candidates.any(axis=1)
+            clue_target[found] = target
+            clue_focus[found] = positions[
+                found, numpy.argmax(candidates[found], axis=1)
+            ]
+        play_clue = active & ~play & can_clue & (clue_target != -1)
+
+        # 3. Give a save clue to the next player's chop card
+        next_player_index = (player_index + 1) % self.num_players
+        next_hand = self.hands[:, next_player_index, :]
+        next_chop = next_hand[games, self.get_chop_slots(next_hand)]
+        next_chop_cards = self.deck[games, next_chop]
+        critical = (
+            (
+                self.card_counts[next_chop_cards]
+                - self.discarded[games, next_chop_cards]
+                == 1
+            )
+            & ~self.played[games, next_chop_cards]
+            & ~self.clued[games, next_chop]
+            & (self.get_allowed_clues(next_chop_cards) != 0)
+        )
+        save_clue = active & ~play & ~play_clue & can_clue & critical
+
+        # 4. Discard a card that can only be unplayable forever, or else the chop card
+        discard = (
+            active
+            & ~play
+            & ~play_clue
+            & ~save_clue
+            & (self.clue_tokens < self.clue_limit)
+        )
+        own_trash = (hand != self.empty_slot) & (
+            possible[:, player_index, :]
+            & ~self.get_identity_mask(self.get_trash())[:, numpy.newaxis]
+            == 0
+        )
+        discard_slot = numpy.where(
+            own_trash.any(axis=1),
+            numpy.argmax(own_trash, axis=1),
+            self.get_chop_slots(hand),
+        )
+
+        # 5. Clue the next player's oldest card that can be clued, or blind-play the newest card
+        remaining = active & ~play & ~play_clue & ~save_clue & ~discard
+        next_cards = self.deck[games[:, numpy.newaxis], next_hand]
+        next_touchable = (self.get_allowed_clues(next_cards) != 0) & (
+            next_hand != self.empty_slot
+        )
+        tempo_clue = remaining & can_clue & next_touchable.any(axis=1)
+        oldest_touchable = (
+            self.hand_size - 1 - numpy.argmax(next_touchable[:, ::-1], axis=1)
+        )
+        blind_play = remaining & ~tempo_clue
+
+        # Perform the clues
+        clue_target[save_clue | tempo_clue] = next_player_index
+        clue_focus[save_clue] = next_chop[save_clue]
+        clue_focus[tempo_clue] = next_hand[tempo_clue, oldest_touchable[tempo_clue]]
+        self.give_clues(play_clue, clue_target, clue_focus, True, playable)
+        self.give_clues(
+            save_clue | tempo_clue, clue_target, clue_focus, False, playable
+        )
+
+        # Perform the plays and the discards
+        play_slot[blind_play] = 0
+        self.play_cards(play | blind_play, player_index, play_slot, playable)
+        self.discard_cards(discard, player_index, discard_slot)
+
+        self.end_turn_for_games(active)
+
+    # Returns a boolean for every card identity of every game that can no longer be played
+    # (the card was already played, or the suit is finished)
+    def get_trash(self):
+        finished = numpy.repeat(
+            self.directions == STACK_DIRECTION_FINISHED, self.num_ranks, axis=1
+        )
+        trash = self.played.copy()
+        trash[:, : self.num_identities] |= finished
+        return trash
+
+    # Returns a boolean for every card in the hands that its holder knows to be playable
+    # (because it was given a play clue, or because every identity that it could be is playable)
+    def get_known_playable(self, possible, playable):
+        games = self.games[:, numpy.newaxis, numpy.newaxis]
+        playable_mask = self.get_identity_mask(playable)[
+            :, numpy.newaxis, numpy.newaxis
+        ]
+        return self.play_clued[games, self.hands] | (
+            (self.hands != self.empty_slot) & (possible & ~playable_mask == 0)
+        )
+
+    # Returns the bitmask of the card identities that each card in every hand could be,
+    # from what its holder knows
+    def get_possible(self):
+        # The identities that have every copy played or discarded are public knowledge
+        remaining = self.get_identity_mask(
+            self.card_counts - self.discarded - self.played > 0
+        )
+        games = self.games[:, numpy.newaxis, numpy.newaxis]
+        return (
+            self.clue_possible[games, self.hands]
+            & remaining[:, numpy.newaxis, numpy.newaxis]
+        )
+
+    # Returns the bitmask of the card identities that are true in a boolean array of every card
+    # identity of every game
+    def get_identity_mask(self, identities):
+        return identities[:, : self.num_identities] @ self.identity_bits
+
+    # Returns the bitmask of the clues that touch each card and can be given right now
+    # ("games" are the games of the rows of "cards", which defaults to every game)
+    def get_allowed_clues(self, cards, games=None):
+        touches = self.clue_touches[cards]
+        if not self.alternating_clues:
+            return touches
+
+        # In "Alternating Clues", each clue must be a different type than the previous clue
+        last_clue_type = (
+            self.last_clue_type if games is None else self.last_clue_type[games]
+        )
+        allowed = numpy.full(len(last_clue_type), -1, dtype=numpy.int64)
+        allowed[last_clue_type == 0] = self.rank_clue_bits
+        allowed[last_clue_type == 1] = self.color_clue_bits
+        if touches.ndim > 1:
+            allowed = allowed[:, numpy.newaxis]
+        return touches & allowed
+
+    # The chop is the oldest card that is not clued (or the oldest card if every card is clued)
+    def get_chop_slots(self, hand):
+        valid = hand != self.empty_slot
+        unclued = valid & ~self.clued[self.games[:, numpy.newaxis], hand]
+        last_unclued = self.hand_size - 1 - numpy.argmax(unclued[:, ::-1], axis=1)
+        last_valid = self.hand_size - 1 - numpy.argmax(valid[:, ::-1], axis=1)
+        return numpy.where(unclued.any(axis=1), last_unclued, last_valid)
+
+    # Give one clue that touches the focus card in each of the masked games
+    # (the clue that touches the most playable cards and the fewest other new cards)
+    def give_clues(self, mask, targets, focuses, is_play_clue, playable):
+        games = numpy.nonzero(mask)[0]
+        if len(games) == 0:
+            return
+
+        focus_cards = self.deck[games, focuses[games]]
+        allowed = self.get_allowed_clues(focus_cards, games)
+        target_hands = self.hands[games, targets[games], :]
+        target_cards = self.deck[games[:, numpy.newaxis], target_hands]
+        target_touches = self.clue_touches[target_cards]
+        new_cards = ~self.clued[games[:, numpy.newaxis], target_hands]
+        target_playable = playable[games[:, numpy.newaxis], target_cards]
+        clue_indexes = numpy.zeros(len(games), dtype=numpy.int64)
+        best_values = numpy.full(len(games), -self.hand_size - 1)
+        for bit_index in range(self.num_clue_bits):
+            bit = 1 << bit_index
+            touched = (target_touches & bit) != 0
+            values = (touched & target_playable).sum(axis=1) - (
+                touched & new_cards & ~target_playable
+            ).sum(axis=1)
+            better = ((allowed & bit) != 0) & (values > best_values)
+            clue_indexes[better] = bit_index
+            best_values[better] = values[better]
+        clue_bits = numpy.left_shift(1, clue_indexes)
+        touched = (target_touches & clue_bits[:, numpy.newaxis]) != 0
+        self.clued[
+            numpy.repeat(games, self.hand_size)[touched.ravel()],
+            target_hands.ravel()[touched.ravel()],
+        ] = True
+        if is_play_clue:
+            self.play_clued[games, focuses[games]] = True
+        identities = self.clue_identities[clue_indexes][:, numpy.newaxis]
+        self.clue_possible[games[:, numpy.newaxis], target_hands] &= numpy.where(
+            touched, identities, ~identities
+        )
+
+        self.clue_tokens[games] -= self.clue_cost
+        self.last_clue_type[games] = numpy.where(
+            (clue_bits & self.color_clue_bits) != 0, 0, 1
+        )
+
+    def play_cards(self, mask, player_index, slots, playable):
+        games = numpy.nonzero(mask)[0]
+        if len(games) == 0:
+            return
+
+        positions = self.hands[games, player_index, slots[games]]
+        cards = self.deck[games, positions]
+        success = playable[games, cards]
+
+        # Successful plays
+        played_games = games[success]
+        played_cards = cards[success]
+        suits = played_cards // self.num_ranks
+        ranks = self.ranks[played_cards % self.num_ranks]
+        tops = self.stacks[played_games, suits]
+        directions = self.directions[played_games, suits]
+        start = variant_tables.START_CARD_RANK
+        new_directions = directions.copy()
+        undecided = directions == STACK_DIRECTION_UNDECIDED
+        new_directions[undecided & (tops == 0) & (ranks == 1)] = STACK_DIRECTION_UP
+        new_directions[undecided & (tops == 0) & (ranks == 5)] = STACK_DIRECTION_DOWN
+        new_directions[undecided & (tops == start) & (ranks == 2)] = STACK_DIRECTION_UP
+        new_directions[undecided & (tops == start) & (ranks == 4)] = (
+            STACK_DIRECTION_DOWN
+        )
+        new_directions[(directions == STACK_DIRECTION_UP) & (ranks == 5)] = (
+            STACK_DIRECTION_FINISHED
+        )
+        new_directions[(directions == STACK_DIRECTION_DOWN) & (ranks == 1)] = (
+            STACK_DIRECTION_FINISHED
+        )
+        self.stacks[played_games, suits] = ranks
+        self.directions[played_games, suits] = new_directions
+        self.played[played_games, played_cards] = True
+        self.score[played_games] += 1
+
+        # Give the team a clue if the final card of the suit was played
+        # (but not in "Throw It in a Hole")
+        if not self.throw_it_in_a_hole:
+            extra_clue = played_games[new_directions == STACK_DIRECTION_FINISHED]
+            self.clue_tokens[extra_clue] = numpy.minimum(
+                self.clue_tokens[extra_clue] + 1, self.clue_limit
+            )
+
+        # Failed plays are discarded
+        failed_games = games[~success]
+        self.strikes[failed_games] += 1
+        self.discarded[failed_games, cards[~success]] += 1
+
+        self.remove_cards(games, player_index, slots[games])
+
+    def discard_cards(self, mask, player_index, slots):
+        games = numpy.nonzero(mask)[0]
+        if len(games) == 0:
+            return
+
+        positions = self.hands[games, player_index, slots[games]]
+        self.discarded[games, self.deck[games, positions]] += 1
+        self.clue_tokens[games] += 1
+        self.remove_cards(games, player_index, slots[games])
+
+    # Remove a card from the hand of the player and draw a new card into slot 0
+    # (or, if the deck is empty, leave an empty slot at the end of the hand)
+    def remove_cards(self, games, player_index, slots):
+        hands = self.hands[games, player_index, :]
+        slot_indexes = numpy.arange(self.hand_size)[numpy.newaxis, :]
+        slots = slots[:, numpy.newaxis]
+
+        # The cards before the removed card shift towards the end of the hand when a card is drawn,
+        # and the cards after the removed card shift towards the start of the hand otherwise
+        drawn_hands = numpy.take_along_axis(
+            hands, numpy.maximum(slot_indexes - (slot_indexes <= slots), 0), axis=1
+        )
+        can_draw = self.deck_index[games] < self.deck_size
+        drawn_hands[:, 0] = self.deck_index[games]
+        not_drawn_hands = numpy.take_along_axis(
+            hands,
+            numpy.minimum(slot_indexes + (slot_indexes >= slots), self.hand_size - 1),
+            axis=1,
+        )
+        not_drawn_hands[:, -1] = self.empty_slot
+        self.hands[games, player_index, :] = numpy.where(
+            can_draw[:, numpy.newaxis], drawn_hands, not_drawn_hands
+        )
+        self.deck_index[games] += can_draw
+
+        # The game ends one full round after the final card is drawn
+        final_draw = games[can_draw & (self.deck_index[games] == self.deck_size)]
+        self.end_turn[final_draw] = self.turn + self.num_players + 1
+
+    def end_turn_for_games(self, active):
+        self.turn += 1
+        self.done |= active & (
+            (self.strikes >= MAX_STRIKE_NUM)
+            | (self.score >= self.max_score)
+            | (self.end_turn == self.turn)
+        )
+
+
+def main():
+    args = parse_args()
+    variants, suits, colors = load_data()
+
+    if args.benchmark:
+        benchmark(variants, suits, colors, args)
+        return
+
+    if args.all:
+        variant_names = list(variants.keys())
+    else:
+        variant_names = args.variant
+    for variant_name in variant_names:
+        if variant_name not in variants:
+            print('The variant of "' + variant_name + '" does not exist.')
+            sys.exit(1)
+
+    # Split the games of every variant and player count into batches
+    tasks = []
+    seed_sequence = numpy.random.SeedSequence(args.seed)
+    for variant_name in variant_names:
+        for num_players in args.players:
+            for low in range(0, args.games, args.batch_size):
+                num_games = min(args.batch_size, args.games - low)
+                [child_seed] = seed_sequence.spawn(1)
+                tasks.append([variant_name, num_players, num_games, child_seed])
+
+    start_time = time.monotonic()
+    results = {}
+    for [[variant_name, num_players, _, _], batch_results] in run_tasks(
+        tasks, args.workers
+    ):
+        key = (variant_name, num_players)
+        results.setdefault(key, []).append(batch_results)
+    elapsed = time.monotonic() - start_time
+
+    output_file = None
+    if args.output is not None:
+        output_file = open(args.output, "w", newline="\n")
+    for variant_name in variant_names:
+        max_score = (
+            len(variants[variant_name]["suits"]) * variant_tables.POINTS_PER_SUIT
+        )
+        for num_players in args.players:
+            [scores, struck_out] = zip(*results[(variant_name, num_players)])
+            summary = summarize(
+                numpy.concatenate(scores), numpy.concatenate(struck_out), max_score
+            )
+            summary = dict(
+                [["variant", variant_name], ["num_players", num_players]]
+                + list(summary.items())
+            )
+            print_summary(summary)
+            if output_file is not None:
+                output_file.write(json.dumps(summary) + "\n")
+    if output_file is not None:
+        output_file.close()
+
+    num_games = len(variant_names) * len(args.players) * args.games
+    print(
+        "Played "
+        + str(num_games)
+        + " games in "
+        + "{:.2f}".format(elapsed)
+        + " seconds ("
+        + "{:.0f}".format(num_games / elapsed)
+        + " games/sec with "
+        + str(args.workers)
+        + " workers)"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Simulate games of each variant with a simple bot."
+    )
+    parser.add_argument(
+        "variant", nargs="*", help='the names of the variants (e.g. "No Variant")'
+    )
+    parser.add_argument("--all", action="store_true", help="simulate every variant")
+    parser.add_argument(
+        "--players",
+        type=int,
+        nargs="+",
+        default=variant_efficiency.PLAYER_COUNTS,
+        help="the player counts to simulate (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--games",
+        type=int,
+        default=DEFAULT_NUM_GAMES,
+        help="the number of games per variant and player count (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="the number of games that are played together (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="the number of processes to use (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="the seed of the random decks"
+    )
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        help="write the score distribution of every variant and player count to PATH as JSON "
+        + "lines",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="measure the number of games per second on a single core",
+    )
+    args = parser.parse_args()
+
+    if not args.benchmark and not args.all and len(args.variant) == 0:
+        print("You must specify the variants to simulate or use the --all flag.")
+        sys.exit(1)
+    for player_count in args.players:
+        if player_count not in variant_efficiency.PLAYER_COUNTS:
+            print("The number of players must be between 2 and 6.")
+            sys.exit(1)
+    if args.games <= 0 or args.batch_size <= 0 or args.workers <= 0:
+        print("The number of games, the batch size, and the workers must be positive.")
+        sys.exit(1)
+
+    return args
+
+
+def load_data():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    data_path = os.path.join(dir_path, "..", "..", "data")
+    data = []
+    for file_name in ["variants.json", "suits.json", "colors.json"]:
+        with open(os.path.join(data_path, file_name), "r") as data_file:
+            data.append(json.load(data_file))
+    return data
+
+
+# Yield "(task, results)" for every task as they are finished
+def run_tasks(tasks, num_workers):
+    if num_workers == 1:
+        for task in tasks:
+            yield task, run_task(*task)
+        return
+
+    # The "spawn" start method behaves the same on every platform
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=context
+    ) as executor:
+        futures = {executor.submit(run_task, *task): task for task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+
+# The data files are loaded once per worker process
+worker_data = None
+
+
+def run_task(variant_name, num_players, num_games, seed):
+    global worker_data
+
+    if worker_data is None:
+        worker_data = load_data()
+    [variants, suits, colors] = worker_data
+
+    rng = numpy.random.default_rng(seed)
+    batch = GameBatch(
+        variant_name,
+        variants[variant_name],
+        suits,
+        colors,
+        num_players,
+        num_games,
+        rng,
+    )
+    return batch.run()
+
+
+def summarize(scores, struck_out, max_score):
+    return {
+        "num_games": len(scores),
+        "average_score": round(float(scores.mean()), 3),
+        "average_score_rate": round(float(scores.mean()) / max_score, 4),
+        "max_score_rate": round(float(numpy.mean(scores == max_score)), 4),
+        "strikeout_rate": round(float(numpy.mean(struck_out)), 4),
+        "percentiles": {
+            str(percentile): int(numpy.percentile(scores, percentile))
+            for percentile in [10, 25, 50, 75, 90]
+        },
+        "histogram": numpy.bincount(scores, minlength=max_score + 1).tolist(),
+    }
+
+
+def print_summary(summary):
+    print(
+        summary["variant"]
+        + " ("
+        + str(summary["num_players"])
+        + "p): average "
+        + "{:.2f}".format(summary["average_score"])
+        + " ("
+        + "{:.1%}".format(summary["average_score_rate"])
+        + " of the maximum), max scores "
+        + "{:.1%}".format(summary["max_score_rate"])
+        + ", strikeouts "
+        + "{:.1%}".format(summary["strikeout_rate"])
+        + ", median "
+        + str(summary["percentiles"]["50"])
+    )
+
+
+# Measure the throughput of the engine on a single core, so that it can be tracked over time
+def benchmark(variants, suits, colors, args):
+    rng = numpy.random.default_rng(args.seed)
+    num_games = 0
+    start_time = time.monotonic()
+    while num_games < BENCHMARK_NUM_GAMES:
+        batch = GameBatch(
+            BENCHMARK_VARIANT,
+            variants[BENCHMARK_VARIANT],
+            suits,
+            colors,
+            BENCHMARK_NUM_PLAYERS,
+            args.batch_size,
+            rng,
+        )
+        batch.run()
+        num_games += args.batch_size
+    elapsed = time.monotonic() - start_time
+
+    print(
+        "Played "
+        + str(num_games)
+        + " games of "
+        + BENCHMARK_VARIANT
+        + " ("
+        + str(BENCHMARK_NUM_PLAYERS)
+        + "p) in "
+        + "{:.2f}".format(elapsed)
+        + " seconds: "
+        + "{:.0f}".format(num_games / elapsed)
+        + " games/sec per core"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# This module calculates the minimum efficiency that is required to get the maximum score in a
+# variant, for every player count at once
+# It uses the same formula as the "minEfficiency()" function in the client ("stats.ts"):
+#   (5 * number of suits) /
+#   (8 + floor((starting pace + number of suits - unusable clues) / discards per clue))
+# https://github.com/Zamiell/hanabi-conventions/blob/master/misc/Efficiency.md
+# The "create_variants_json.py" script uses it to reject new variants that would be too difficult;
+# running this module directly prints the most difficult variants in "variants.json"
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import json
+import os
+import numpy
+import variant_tables
+
+# Constants
+PLAYER_COUNTS = [2, 3, 4, 5, 6]
+# These match the values in "constants.ts" and "hand.ts"
+MAX_CLUE_NUM = 8
+CARDS_PER_HAND = {2: 5, 3: 5, 4: 4, 5: 4, 6: 3}
+
+
+# Returns an array of the required efficiency of every variant (one row per variant) for every
+# player count in "PLAYER_COUNTS" (one column per player count)
+# "variants" is a list of "[name, suit names]"
+def get_required_efficiencies(variants, suits, colors):
+    num_variants = len(variants)
+    deck_sizes = numpy.zeros(num_variants, dtype=numpy.int64)
+    num_suits = numpy.zeros(num_variants, dtype=numpy.int64)
+    throw_it_in_a_hole = numpy.zeros(num_variants, dtype=numpy.bool_)
+    clue_starved = numpy.zeros(num_variants, dtype=numpy.bool_)
+    for [i, [variant_name, suit_names]] in enumerate(variants):
+        deck_sizes[i] = variant_tables.get_deck_size(
+            variant_name, suit_names, suits, colors
+        )
+        num_suits[i] = len(suit_names)
+        throw_it_in_a_hole[i] = variant_name.startswith("Throw It in a Hole")
+        clue_starved[i] = variant_name.startswith("Clue Starved")
+
+    # Every array below is broadcast to the shape of (number of variants, number of player counts)
+    num_players = numpy.array(PLAYER_COUNTS, dtype=numpy.int64)[numpy.newaxis, :]
+    cards_per_hand = numpy.array(
+        [CARDS_PER_HAND[player_count] for player_count in PLAYER_COUNTS],
+        dtype=numpy.int64,
+    )[numpy.newaxis, :]
+    deck_sizes = deck_sizes[:, numpy.newaxis]
+    num_suits = num_suits[:, numpy.newaxis]
+    throw_it_in_a_hole = throw_it_in_a_hole[:, numpy.newaxis]
+
+    starting_pace = (
+        deck_sizes
+        - (cards_per_hand - 1) * num_players
+        - variant_tables.POINTS_PER_SUIT * num_suits
+    )
+    # Players do not gain a clue after playing a 5 in "Throw It in a Hole"
+    clues_gained_after_completing_suits = numpy.where(throw_it_in_a_hole, 0, num_suits)
+    unusable_clues = numpy.where(num_players >= 5, 2, 1)
+    unusable_clues = numpy.where(throw_it_in_a_hole, 0, unusable_clues)
+    discards_per_clue = numpy.where(clue_starved, 2, 1)[:, numpy.newaxis]
+
+    numerator = variant_tables.POINTS_PER_SUIT * num_suits
+    denominator = MAX_CLUE_NUM + numpy.floor_divide(
+        starting_pace + clues_gained_after_completing_suits - unusable_clues,
+        discards_per_clue,
+    )
+    # A variant without enough pace to get the maximum score is impossible
+    efficiencies = numpy.full(denominator.shape, numpy.inf)
+    numpy.divide(numerator, denominator, out=efficiencies, where=denominator > 0)
+
+    return efficiencies
+
+
+def main():
+    args = parse_args()
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    data_path = os.path.join(dir_path, "..", "..", "data")
+    with open(os.path.join(data_path, "variants.json"), "r") as variants_file:
+        variants = json.load(variants_file)
+    with open(os.path.join(data_path, "suits.json"), "r") as suits_file:
+        suits = json.load(suits_file)
+    with open(os.path.join(data_path, "colors.json"), "r") as colors_file:
+        colors = json.load(colors_file)
+
+    variant_names = list(variants.keys())
+    efficiencies = get_required_efficiencies(
+        [
+            [variant_name, variants[variant_name]["suits"]]
+            for variant_name in variant_names
+        ],
+        suits,
+        colors,
+    )
+
+    # Sort by the most difficult player count of each variant
+    order = numpy.argsort(-efficiencies.max(axis=1), kind="stable")
+    print(
+        "Required efficiency ("
+        + ", ".join(str(player_count) + "p" for player_count in PLAYER_COUNTS)
+        + "):"
+    )
+    for i in order[: args.top].tolist():
+        print(
+            "  "
+            + variant_names[i]
+            + ": "
+            + ", ".join("{:.2f}".format(value) for value in efficiencies[i].tolist())
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Print the variants that require the most efficiency."
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="the number of variants to print (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
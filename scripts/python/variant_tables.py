@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+# This module precomputes the derived tables of every variant, so that the deck composition and
+# the clue rules do not have to be worked out from the raw flags of the suits and the variant
+# It is used by the "create_variants_json.py" script to write the "variant_tables.json" file
+# The rules mirror the server:
+# - The clue colors of the suits and the variants are derived like in "suitsInit()" and
+#   "variantsInit()"
+# - The number of copies of each card matches "Game.InitDeck()"
+# - The clue touches match "variantIsCardTouched()"
+#
+# For every variant, the tables are:
+# - "ranks": the ranks of the cards of each suit (including the "START" card in "Up or Down")
+# - "clueColors" and "clueRanks": the clues that can be given
+# - "cardCounts": the number of copies of each card, indexed by suit and then by rank index
+# - "deckSize" and "maxScore"
+# - "colorClueTouches" and "rankClueTouches": a bitmask of the clues that touch each card, indexed
+#   by suit and then by rank index, where bit "i" is the "i"th clue color or clue rank
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import json
+
+# Constants
+# These match the values in "constants.go" and "variants_reversible.go"
+SUIT_REVERSED_SUFFIX = " Reversed"
+START_CARD_RANK = 7
+RANKS = [1, 2, 3, 4, 5]
+POINTS_PER_SUIT = 5
+
+
+# Returns the suit with the same defaults as "suitsInit()"
+# (reversed suits are the normal suit with the "reversed" flag set)
+def get_suit(suit_name, suits, colors):
+    reversed_suit = suit_name.endswith(SUIT_REVERSED_SUFFIX)
+    if reversed_suit:
+        suit_name = suit_name[: -len(SUIT_REVERSED_SUFFIX)]
+    if suit_name not in suits:
+        raise ValueError('The suit of "' + suit_name + '" does not exist.')
+    suit = suits[suit_name]
+
+    clue_colors = suit.get("clueColors", [])
+    all_clue_colors = suit.get("allClueColors", False)
+    no_clue_colors = suit.get("noClueColors", False)
+    if len(clue_colors) == 0 and not all_clue_colors and not no_clue_colors:
+        # By default, use the color of the same name
+        if suit_name in colors:
+            clue_colors = [suit_name]
+
+    return {
+        "clueColors": clue_colors,
+        "oneOfEach": suit.get("oneOfEach", False),
+        "reversed": reversed_suit,
+        "allClueColors": all_clue_colors,
+        "allClueRanks": suit.get("allClueRanks", False),
+        "noClueColors": no_clue_colors,
+        "noClueRanks": suit.get("noClueRanks", False),
+    }
+
+
+def is_up_or_down(variant_name):
+    return variant_name.startswith("Up or Down")
+
+
+def get_variant_tables(variant_name, variant, suits, colors):
+    variant_suits = [
+        get_suit(suit_name, suits, colors) for suit_name in variant["suits"]
+    ]
+    up_or_down = is_up_or_down(variant_name)
+    ranks = RANKS + [START_CARD_RANK] if up_or_down else RANKS
+
+    # Derive the clue colors from the suits if they were not specified
+    clue_colors = variant.get("clueColors")
+    if clue_colors is None:
+        clue_colors = []
+        for suit in variant_suits:
+            if suit["allClueColors"]:
+                continue
+            for color in suit["clueColors"]:
+                if color not in clue_colors:
+                    clue_colors.append(color)
+    clue_ranks = variant.get("clueRanks", RANKS)
+
+    card_counts = get_card_counts(variant_suits, ranks, up_or_down)
+    color_clue_touches = []
+    rank_clue_touches = []
+    for suit in variant_suits:
+        color_clue_touches.append(
+            [
+                get_touch_mask(
+                    lambda color: is_touched_by_color(variant, suit, rank, color),
+                    clue_colors,
+                )
+                for rank in ranks
+            ]
+        )
+        rank_clue_touches.append(
+            [
+                get_touch_mask(
+                    lambda clue_rank: is_touched_by_rank(
+                        variant, suit, rank, clue_rank
+                    ),
+                    clue_ranks,
+                )
+                for rank in ranks
+            ]
+        )
+
+    return {
+        "id": variant["id"],
+        "ranks": ranks,
+        "clueColors": clue_colors,
+        "clueRanks": clue_ranks,
+        "cardCounts": card_counts,
+        "deckSize": sum(sum(counts) for counts in card_counts),
+        # We assume that there are 5 points per stack
+        "maxScore": len(variant_suits) * POINTS_PER_SUIT,
+        "colorClueTouches": color_clue_touches,
+        "rankClueTouches": rank_clue_touches,
+    }
+
+
+# Returns the number of copies of each card, indexed by suit and then by rank index
+def get_card_counts(variant_suits, ranks, up_or_down):
+    return [
+        [get_card_count(suit, rank, up_or_down) for rank in ranks]
+        for suit in variant_suits
+    ]
+
+
+def get_deck_size(variant_name, suit_names, suits, colors):
+    variant_suits = [get_suit(suit_name, suits, colors) for suit_name in suit_names]
+    up_or_down = is_up_or_down(variant_name)
+    ranks = RANKS + [START_CARD_RANK] if up_or_down else RANKS
+    card_counts = get_card_counts(variant_suits, ranks, up_or_down)
+    return sum(sum(counts) for counts in card_counts)
+
+
+# In a normal suit, there are three 1's, two 2's, two 3's, two 4's, and one 5
+def get_card_count(suit, rank, up_or_down):
+    if suit["oneOfEach"]:
+        return 1
+    if rank == 1:
+        return 1 if up_or_down or suit["reversed"] else 3
+    if rank == 5:
+        return 3 if suit["reversed"] else 1
+    if rank == START_CARD_RANK:
+        return 1
+    return 2
+
+
+def get_touch_mask(is_touched, clues):
+    mask = 0
+    for [i, clue] in enumerate(clues):
+        if is_touched(clue):
+            mask |= 1 << i
+    return mask
+
+
+def is_touched_by_color(variant, suit, rank, color):
+    if variant.get("colorCluesTouchNothing", False):
+        return False
+    if suit["allClueColors"]:
+        return True
+    if suit["noClueColors"]:
+        return False
+    if variant.get("specialRank") == rank:
+        if variant.get("specialAllClueColors", False):
+            return True
+        if variant.get("specialNoClueColors", False):
+            return False
+    return color in suit["clueColors"]
+
+
+def is_touched_by_rank(variant, suit, rank, clue_rank):
+    if variant.get("rankCluesTouchNothing", False):
+        return False
+    if suit["allClueRanks"]:
+        return True
+    if suit["noClueRanks"]:
+        return False
+    if variant.get("specialRank") == rank:
+        if variant.get("specialAllClueRanks", False):
+            return True
+        if variant.get("specialNoClueRanks", False):
+            return False
+    return clue_rank == rank
+
+
+# Returns the contents of a "variant_tables.json" file, with one variant per line
+def encode_variant_tables(variants, suits, colors):
+    lines = []
+    for [variant_name, variant] in variants.items():
+        tables = get_variant_tables(variant_name, variant, suits, colors)
+        lines.append(
+            "  "
+            + json.dumps(variant_name)
+            + ": "
+            + json.dumps(tables, separators=(",", ":"))
+        )
+
+    return "{\n" + ",\n".join(lines) + "\n}\n"
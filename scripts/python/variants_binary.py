@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+
+# This module writes (and reads) "variants.bin", a compact binary version of "variants.json" that
+# can be memory-mapped at startup instead of parsing the full JSON file
+# It is written by the "create_variants_json.py" script; running this module directly benchmarks
+# loading it against loading "variants.json"
+#
+# File layout (all integers are little-endian):
+# - A 44 byte header: the magic bytes, the format version, the number of variants, the number of
+#   interned strings, the size of the ID index, and the offsets of the other sections
+# - The string data: every variant name and interned string, as UTF-8
+# - The interned string table: an offset and a length for each suit name or clue color
+# - The string list pool: the interned string indexes of the suits and clue colors of every variant
+# - The variant records: one fixed-width record per variant, in "variants.json" order
+# - The name index: the name of every variant (as an offset and a length) and its record index,
+#   sorted by name so that a variant can be found with a binary search
+# - The ID index: the record index of every variant ID (or NO_RECORD for unused IDs)
+#
+# Usage:
+#   variants = VariantsFile("/path/to/variants.bin")
+#   variants.get_by_name("Rainbow (6 Suits)")
+#   variants.get_by_id(3)
+
+# The "dotenv" module does not work in Python 2
+import sys
+
+if sys.version_info < (3, 0):
+    print("This script requires Python 3.x.")
+    sys.exit(1)
+
+# Imports
+import argparse
+import array
+import json
+import mmap
+import os
+import struct
+import subprocess
+import time
+
+# Constants
+MAGIC = b"HLVARNTS"  # cspell:disable-line
+FORMAT_VERSION = 1
+# Magic, version, number of variants, number of strings, ID index size, and the offsets of the
+# string table, the string list pool, the records, the name index, and the ID index
+HEADER_FORMAT = "<8sIIIIIIIII"  # cspell:disable-line
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# The string data directly follows the header, and every string offset is relative to it
+STRING_DATA_OFFSET = HEADER_SIZE
+# The offset and the length of a string in the string data
+STRING_FORMAT = "<IH"
+STRING_SIZE = struct.calcsize(STRING_FORMAT)
+# ID, flags, name offset, name length, suits offset, number of suits, clue colors offset,
+# number of clue colors, clue ranks bitmask, and special rank
+RECORD_FORMAT = "<HHIHIBIBBb"  # cspell:disable-line
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+# Name offset, name length, and record index
+NAME_INDEX_FORMAT = "<IHI"
+NAME_INDEX_SIZE = struct.calcsize(NAME_INDEX_FORMAT)
+NO_RECORD = 0xFFFFFFFF
+# The boolean properties of a variant, in the order of their bits in the flags
+FLAG_PROPERTIES = [
+    "specialAllClueColors",
+    "specialAllClueRanks",
+    "specialNoClueColors",
+    "specialNoClueRanks",
+    "showSuitNames",
+    "colorCluesTouchNothing",
+    "rankCluesTouchNothing",
+]
+# These flags record whether the optional "clueColors" and "clueRanks" lists are present
+FLAG_CLUE_COLORS = 1 << len(FLAG_PROPERTIES)
+FLAG_CLUE_RANKS = 1 << (len(FLAG_PROPERTIES) + 1)
+# The order of the properties in "variants.json" (after "id" and "suits")
+PROPERTY_ORDER = [
+    "specialRank",
+    "specialAllClueColors",
+    "specialAllClueRanks",
+    "specialNoClueColors",
+    "specialNoClueRanks",
+    "clueRanks",
+    "showSuitNames",
+    "colorCluesTouchNothing",
+    "rankCluesTouchNothing",
+    "clueColors",
+]
+
+
+class VariantsFile:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        [
+            magic,
+            version,
+            self.num_variants,
+            self.num_strings,
+            self.id_index_size,
+            self.strings_offset,
+            self.string_lists_offset,
+            self.records_offset,
+            self.name_index_offset,
+            self.id_index_offset,
+        ] = struct.unpack_from(HEADER_FORMAT, self.mmap)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('"' + path + '" is not a valid variants file.')
+
+    def __len__(self):
+        return self.num_variants
+
+    def get_by_id(self, variant_id):
+        if variant_id < 0 or variant_id >= self.id_index_size:
+            return None
+
+        [record_index] = struct.unpack_from(
+            "<I", self.mmap, self.id_index_offset + variant_id * 4
+        )
+        if record_index == NO_RECORD:
+            return None
+        return self.read_record(record_index)[1]
+
+    def get_by_name(self, variant_name):
+        record_index = self.find_name(variant_name)
+        if record_index is None:
+            return None
+        return self.read_record(record_index)[1]
+
+    def get_id(self, variant_name):
+        record_index = self.find_name(variant_name)
+        if record_index is None:
+            return None
+        return struct.unpack_from(
+            "<H", self.mmap, self.records_offset + record_index * RECORD_SIZE
+        )[0]
+
+    # Yield every variant as "[name, variant]", in "variants.json" order
+    def items(self):
+        for record_index in range(self.num_variants):
+            yield self.read_record(record_index)
+
+    # Binary search the name index, comparing the UTF-8 bytes of the names
+    def find_name(self, variant_name):
+        target = variant_name.encode("utf-8")
+        low = 0
+        high = self.num_variants
+        while low < high:
+            middle = (low + high) // 2
+            [name_offset, name_length, record_index] = struct.unpack_from(
+                NAME_INDEX_FORMAT,
+                self.mmap,
+                self.name_index_offset + middle * NAME_INDEX_SIZE,
+            )
+            name = self.read_bytes(name_offset, name_length)
+            if name == target:
+                return record_index
+            if name < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def read_string(self, string_index):
+        [offset, length] = struct.unpack_from(
+            STRING_FORMAT, self.mmap, self.strings_offset + string_index * STRING_SIZE
+        )
+        return self.read_bytes(offset, length).decode("utf-8")
+
+    def read_bytes(self, offset, length):
+        start = STRING_DATA_OFFSET + offset
+        return self.mmap[start : start + length]
+
+    def read_string_list(self, list_offset, length):
+        string_indexes = struct.unpack_from(
+            "<" + str(length) + "H",
+            self.mmap,
+            self.string_lists_offset + list_offset * 2,
+        )
+        return [self.read_string(string_index) for string_index in string_indexes]
+
+    def read_record(self, record_index):
+        [
+            variant_id,
+            flags,
+            name_offset,
+            name_length,
+            suits_offset,
+            num_suits,
+            clue_colors_offset,
+            num_clue_colors,
+            clue_ranks,
+            special_rank,
+        ] = struct.unpack_from(
+            RECORD_FORMAT, self.mmap, self.records_offset + record_index * RECORD_SIZE
+        )
+
+        properties = {}
+        if special_rank != 0:
+            properties["specialRank"] = special_rank
+        for [i, property_name] in enumerate(FLAG_PROPERTIES):
+            if flags & (1 << i):
+                properties[property_name] = True
+        if flags & FLAG_CLUE_COLORS:
+            properties["clueColors"] = self.read_string_list(
+                clue_colors_offset, num_clue_colors
+            )
+        if flags & FLAG_CLUE_RANKS:
+            properties["clueRanks"] = [
+                rank for rank in range(1, 6) if clue_ranks & (1 << (rank - 1))
+            ]
+
+        variant = {
+            "id": variant_id,
+            "suits": self.read_string_list(suits_offset, num_suits),
+        }
+        for property_name in PROPERTY_ORDER:
+            if property_name in properties:
+                variant[property_name] = properties[property_name]
+
+        variant_name = self.read_bytes(name_offset, name_length).decode("utf-8")
+        return [variant_name, variant]
+
+    def close(self):
+        self.file.close()
+        self.mmap.close()
+
+
+# Returns the contents of a "variants.bin" file for a dictionary of variants
+# (in the same format as "variants.json")
+def encode_variants(variants):
+    string_data = bytearray()
+    string_table = bytearray()
+    string_indexes = {}
+    string_lists = array.array("H")
+    records = bytearray()
+    names = []
+
+    def add_string_data(string):
+        encoded = string.encode("utf-8")
+        offset = len(string_data)
+        string_data.extend(encoded)
+        return [offset, len(encoded)]
+
+    def add_string_list(strings):
+        offset = len(string_lists)
+        for string in strings:
+            if string not in string_indexes:
+                string_indexes[string] = len(string_indexes)
+                string_table.extend(
+                    struct.pack(STRING_FORMAT, *add_string_data(string))
+                )
+            string_lists.append(string_indexes[string])
+        return offset
+
+    for [record_index, [variant_name, variant]] in enumerate(variants.items()):
+        unknown_properties = set(variant.keys()) - set(["id", "suits"] + PROPERTY_ORDER)
+        if len(unknown_properties) > 0:
+            raise ValueError(
+                'The variant of "'
+                + variant_name
+                + '" has unknown properties: '
+                + ", ".join(sorted(unknown_properties))
+            )
+
+        flags = 0
+        for [i, property_name] in enumerate(FLAG_PROPERTIES):
+            if variant.get(property_name, False):
+                flags |= 1 << i
+        clue_colors_offset = 0
+        clue_colors = variant.get("clueColors")
+        if clue_colors is not None:
+            flags |= FLAG_CLUE_COLORS
+            clue_colors_offset = add_string_list(clue_colors)
+        clue_ranks = 0
+        if "clueRanks" in variant:
+            flags |= FLAG_CLUE_RANKS
+            for rank in variant["clueRanks"]:
+                clue_ranks |= 1 << (rank - 1)
+
+        [name_offset, name_length] = add_string_data(variant_name)
+        names.append([variant_name.encode("utf-8"), name_offset, name_length])
+        records.extend(
+            struct.pack(
+                RECORD_FORMAT,
+                variant["id"],
+                flags,
+                name_offset,
+                name_length,
+                add_string_list(variant["suits"]),
+                len(variant["suits"]),
+                clue_colors_offset,
+                0 if clue_colors is None else len(clue_colors),
+                clue_ranks,
+                variant.get("specialRank", 0),
+            )
+        )
+        names[-1].append(record_index)
+
+    name_index = bytearray()
+    for [_, name_offset, name_length, record_index] in sorted(names):
+        name_index.extend(
+            struct.pack(NAME_INDEX_FORMAT, name_offset, name_length, record_index)
+        )
+
+    id_index_size = (
+        max([variant["id"] for variant in variants.values()], default=-1) + 1
+    )
+    id_index = array.array("I", [NO_RECORD] * id_index_size)
+    for [record_index, variant] in enumerate(variants.values()):
+        id_index[variant["id"]] = record_index
+    if sys.byteorder != "little":
+        string_lists.byteswap()
+        id_index.byteswap()
+
+    # Lay out the sections after the header
+    sections = [
+        bytes(string_data),
+        bytes(string_table),
+        string_lists.tobytes(),
+        bytes(records),
+        bytes(name_index),
+        id_index.tobytes(),
+    ]
+    offsets = []
+    offset = STRING_DATA_OFFSET
+    for section in sections:
+        # Keep every section aligned to 4 bytes
+        offset += -offset % 4
+        offsets.append(offset)
+        offset += len(section)
+
+    contents = bytearray(
+        struct.pack(
+            HEADER_FORMAT,
+            MAGIC,
+            FORMAT_VERSION,
+            len(variants),
+            len(string_indexes),
+            id_index_size,
+            *offsets[1:],
+        )
+    )
+    for [section, section_offset] in zip(sections, offsets):
+        contents.extend(b"\0" * (section_offset - len(contents)))
+        contents.extend(section)
+
+    return bytes(contents)
+
+
+def main():
+    args = parse_args()
+    if args.measure is not None:
+        measure(args)
+        return
+
+    print("Loading " + args.json_path + " " + str(args.iterations) + " times:")
+    json_result = benchmark("json", args)
+    print_result("JSON", json_result)
+
+    print("Loading " + args.binary_path + " " + str(args.iterations) + " times:")
+    binary_result = benchmark("binary", args)
+    print_result("Binary", binary_result)
+
+    print(
+        "File sizes: "
+        + str(os.path.getsize(args.json_path))
+        + " bytes (JSON), "
+        + str(os.path.getsize(args.binary_path))
+        + " bytes (binary)"
+    )
+    if binary_result["elapsed"] > 0:
+        print(
+            "Speedup: "
+            + "{:.1f}".format(json_result["elapsed"] / binary_result["elapsed"])
+            + "x"
+        )
+
+
+def parse_args():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    data_path = os.path.join(dir_path, "..", "..", "data")
+    parser = argparse.ArgumentParser(
+        description='Benchmark loading "variants.bin" against "variants.json".'
+    )
+    parser.add_argument(
+        "--json-path",
+        default=os.path.join(data_path, "variants.json"),
+        help="the path of the JSON file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--binary-path",
+        default=os.path.join(data_path, "variants.bin"),
+        help="the path of the binary file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=20,
+        help="the number of times to load each file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=100,
+        help="the number of variants to look up after each load (default: %(default)s)",
+    )
+    # Used by "benchmark()" to measure a loader in a process of its own
+    parser.add_argument(
+        "--measure", choices=sorted(LOADERS.keys()), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+    if args.iterations <= 0 or args.lookups < 0:
+        print("The number of iterations and lookups must be positive numbers.")
+        sys.exit(1)
+
+    return args
+
+
+# The JSON loader builds the same lookup maps as the server does at startup
+class JSONVariants:
+    def __init__(self, path):
+        with open(path, "r") as variants_file:
+            self.variants = json.load(variants_file)
+        self.variants_by_id = {}
+        for [variant_name, variant] in self.variants.items():
+            self.variants_by_id[variant["id"]] = [variant_name, variant]
+
+    def get_by_id(self, variant_id):
+        entry = self.variants_by_id.get(variant_id)
+        return None if entry is None else entry[1]
+
+    def get_by_name(self, variant_name):
+        return self.variants.get(variant_name)
+
+    def close(self):
+        pass
+
+
+LOADERS = {
+    "json": lambda args: JSONVariants(args.json_path),
+    "binary": lambda args: VariantsFile(args.binary_path),
+}
+
+
+# Measure a loader in a new process, so that the memory of one loader is not counted in the other
+# (the peak RSS of a process never goes down)
+# Returns the average time of a load plus the lookups, the RSS of the process before the first load,
+# and the peak RSS after it (in bytes)
+def benchmark(loader, args):
+    output = subprocess.run(
+        [
+            sys.executable,
+            os.path.realpath(__file__),
+            "--measure",
+            loader,
+            "--json-path",
+            args.json_path,
+            "--binary-path",
+            args.binary_path,
+            "--iterations",
+            str(args.iterations),
+            "--lookups",
+            str(args.lookups),
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+
+    return json.loads(output)
+
+
+# The RSS includes the pages of the binary file that were read through the memory map, but unlike
+# the parsed JSON, they can be shared with other processes and dropped by the kernel
+def measure(args):
+    # The "resource" module only exists on Unix, and this module is also imported by
+    # "create_variants_json.py"
+    import resource
+
+    # "ru_maxrss" is in kilobytes on Linux but in bytes on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    load = LOADERS[args.measure]
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+    variants = load(args)
+    lookup(variants, args.lookups)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+    variants.close()
+
+    start_time = time.perf_counter()
+    for _ in range(args.iterations):
+        variants = load(args)
+        lookup(variants, args.lookups)
+        variants.close()
+    elapsed = (time.perf_counter() - start_time) / args.iterations
+
+    print(json.dumps({"elapsed": elapsed, "base_rss": base_rss, "peak_rss": peak_rss}))
+
+
+def lookup(variants, num_lookups):
+    for variant_id in range(num_lookups):
+        variants.get_by_id(variant_id)
+    variants.get_by_name("No Variant")
+
+
+def print_result(label, result):
+    print(
+        "  "
+        + label
+        + ": "
+        + "{:.3f}".format(result["elapsed"] * 1000)
+        + " ms per load, "
+        + "{:.1f}".format(result["peak_rss"] / 1024)
+        + " KiB peak RSS ("
+        + "{:.1f}".format((result["peak_rss"] - result["base_rss"]) / 1024)
+        + " KiB for the first load)"
+    )
+
+
+if __name__ == "__main__":
+    main()
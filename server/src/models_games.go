@@ -139,7 +139,17 @@ type GameHistory struct {
 func (*Games) GetHistory(gameIDs []int) ([]*GameHistory, error) {
 	// We rename "games" to "games1" so that the subquery can access their values
 	// (otherwise, the table names would conflict)
+	// The number of games on each seed comes from the "seed_stats" rollup table (which is
+	// maintained by the "scripts/python/rollup_stats.py" script), plus the games that were played
+	// after the rollup was last updated, so only the newest games of the seed are counted
 	SQLString := `
+		WITH rollup_watermark AS (
+			SELECT COALESCE((
+				SELECT (value::JSON->>'id')::INTEGER
+				FROM metadata
+				WHERE name = 'watermark_rollup_stats'
+			), 0) AS last_game_id
+		)
 		SELECT
 			games1.id,
 			games1.num_players,
@@ -162,9 +172,14 @@ func (*Games) GetHistory(gameIDs []int) ([]*GameHistory, error) {
 			games1.datetime_started,
 			games1.datetime_finished,
 			(
+				SELECT COALESCE(MAX(seed_stats.num_games), 0)
+				FROM seed_stats
+				WHERE seed_stats.seed = games1.seed
+			) + (
 				SELECT COUNT(games2.id)
 				FROM games AS games2
 				WHERE games2.seed = games1.seed
+					AND games2.id > (SELECT last_game_id FROM rollup_watermark)
 			) AS num_games_on_this_seed,
 			(
 				SELECT STRING_AGG(users.username, ', ')
@@ -21,6 +21,7 @@ FILES=$(find "$DIR" -type f \
   -not -path "$DIR/data/specific_deals/*" \
   -not -path "$DIR/data/emojis.json" \
   -not -path "$DIR/data/emotes.json" \
+  -not -path "$DIR/data/emotes_atlas.json" \
   -not -path "$DIR/data/word_list.txt" \
   -not -path "$DIR/logs/*" \
   -not -path "$DIR/maintenance/go.mod" \